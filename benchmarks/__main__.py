@@ -0,0 +1,50 @@
+"""Runs the middleware, fan-out, admin rendering and delete_old_tasks
+benchmarks against SQLite and the StubBroker, and emits their results
+as a single JSON document.
+
+    python -m benchmarks --rows 1000000 --output results.json
+"""
+import argparse
+
+from benchmarks import admin_rendering, delete_old_tasks, fanout, middleware
+from benchmarks.utils import report, setup_django
+
+#: The benchmarks, in the order they run.  Deleting old tasks comes
+#: last since the other benchmarks reuse the populated Task table.
+BENCHMARKS = ["middleware", "fanout", "admin_rendering", "delete_old_tasks"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "benchmarks", nargs="*",
+        help="The benchmarks to run, among %s.  Defaults to all of them." % ", ".join(BENCHMARKS),
+    )
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="The file to write the results to, instead of stdout.")
+    args = parser.parse_args(argv)
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error("unknown benchmarks: %s" % ", ".join(sorted(unknown)))
+
+    setup_django()
+
+    runners = {
+        "middleware": lambda: middleware.run(args.messages, args.repeat),
+        "fanout": lambda: fanout.run(args.messages * 10, args.repeat),
+        "admin_rendering": lambda: admin_rendering.run(args.rows, args.repeat),
+        "delete_old_tasks": lambda: delete_old_tasks.run(args.rows, 1, batch_size=10000),
+    }
+    results = {name: runners[name]() for name in BENCHMARKS if name in (args.benchmarks or BENCHMARKS)}
+
+    if args.output:
+        with open(args.output, "w") as stream:
+            report("suite", results, stream)
+    else:
+        report("suite", results)
+
+
+if __name__ == "__main__":
+    main()
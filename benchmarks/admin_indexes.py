@@ -0,0 +1,75 @@
+"""Times the queries behind the Task admin changelist with and without
+the composite indexes added in migration 0006.
+
+    python -m benchmarks.admin_indexes --rows 1000000
+"""
+import argparse
+
+from benchmarks.utils import measure, populate_tasks, report, setup_django
+
+#: Changelist query shapes, as (name, filters) pairs.
+QUERIES = [
+    ("unfiltered", {}),
+    ("status", {"status": "done"}),
+    ("queue_name", {"queue_name": "queue_1"}),
+    ("actor_name", {"actor_name": "actor_7"}),
+    ("rare_actor_name", {"actor_name": "rare_actor"}),
+    ("worker_hostname", {"worker_hostname": "host_3"}),
+]
+
+
+def run_queries(repeat):
+    from django_dramatiq.models import Task
+
+    results = {}
+    for name, filters in QUERIES:
+        queryset = Task.tasks.filter(**filters).defer("message_data").order_by("-updated_at")
+        results[name] = {
+            "page": measure(lambda: list(queryset[:100]), repeat=repeat),
+            "count": measure(queryset.count, repeat=repeat),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    setup_django()
+
+    from django.db import connection
+
+    from django_dramatiq.models import Task
+
+    populate_tasks(args.rows)
+    indexed = run_queries(args.repeat)
+
+    indexes = [index for index in Task._meta.indexes]
+    with connection.schema_editor() as schema_editor:
+        for index in indexes:
+            schema_editor.remove_index(Task, index)
+    try:
+        unindexed = run_queries(args.repeat)
+    finally:
+        with connection.schema_editor() as schema_editor:
+            for index in indexes:
+                schema_editor.add_index(Task, index)
+
+    report("admin_indexes", {
+        "rows": args.rows,
+        "with_indexes": indexed,
+        "without_indexes": unindexed,
+        "speedup": {
+            name: {
+                timing: unindexed[name][timing]["mean"] / indexed[name][timing]["mean"]
+                for timing in ("page", "count")
+            }
+            for name, _ in QUERIES
+        },
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Times rendering the Task admin changelist, filtered and searched,
+and a Task's detail page over a large synthetic Task table.
+
+    python -m benchmarks.admin_rendering --rows 1000000
+"""
+import argparse
+import math
+
+from benchmarks.utils import measure, populate_tasks, report, setup_django
+
+#: Changelist pages, as (name, query string) pairs.
+CHANGELISTS = [
+    ("unfiltered", ""),
+    ("status", "?status__exact=done"),
+    ("actor_name", "?actor_name=actor_7"),
+    ("rare_actor_name", "?actor_name=rare_actor"),
+    ("search", "?q=rare_actor"),
+]
+
+#: The actor of the Task whose detail page is rendered.
+ACTOR_NAME = "benchmark_admin_rendering"
+
+
+def make_detail_task():
+    """Store a finished Task that looks like one recorded by the admin
+    middleware, with a few arguments and a result preview.
+    """
+    import dramatiq
+
+    from django_dramatiq.models import Task
+
+    message = dramatiq.Message(
+        queue_name="default", actor_name=ACTOR_NAME,
+        args=[list(range(100))], kwargs={"name": "x" * 100}, options={},
+    )
+    Task.tasks.create_or_update_from_message(
+        message, status=Task.STATUS_DONE, actor_name=ACTOR_NAME, queue_name="default",
+        result_preview=repr(list(range(500))), runtime=1.5,
+    )
+    return Task.tasks.get(pk=message.message_id)
+
+
+def run(rows, repeat):
+    from django.contrib import admin
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.urls import reverse
+
+    from django_dramatiq.models import Task
+
+    populate_tasks(rows)
+    user, _ = User.objects.get_or_create(username="benchmark", defaults={"is_staff": True, "is_superuser": True})
+    client = Client()
+    client.force_login(user)
+
+    def render(url):
+        def get():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError("GET %s returned %d" % (url, response.status_code))
+        return get
+
+    # Pages are numbered from 0 in the changelist's query string.
+    last_page = max(math.ceil(rows / admin.site._registry[Task].list_per_page) - 1, 0)
+    changelists = CHANGELISTS + [("last_page", "?p=%d" % last_page)]
+
+    changelist_url = reverse("admin:django_dramatiq_task_changelist")
+    results = {"changelist": {}}
+    for name, query in changelists:
+        results["changelist"][name] = measure(render(changelist_url + query), repeat=repeat)
+
+    task = make_detail_task()
+    try:
+        results["detail"] = measure(render(reverse("admin:django_dramatiq_task_change", args=[task.pk])), repeat=repeat)
+    finally:
+        Task.tasks.filter(actor_name=ACTOR_NAME).delete()
+
+    results["rows"] = rows
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    report("admin_rendering", run(args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Times delete_old_tasks deleting the older half of a large Task
+table.  The table is filled again before every round.
+
+    python -m benchmarks.delete_old_tasks --rows 1000000
+"""
+import argparse
+
+from benchmarks.utils import populate_tasks, report, setup_django
+
+#: Synthetic Tasks are spread over 30 days, so this deletes half of them.
+MAX_TASK_AGE = 15 * 24 * 3600
+
+
+def run(rows, repeat, batch_size):
+    from django_dramatiq.models import Task
+
+    rounds = []
+    for _ in range(repeat):
+        populate_tasks(rows)
+        rounds.append(Task.tasks.delete_old_tasks(max_task_age=MAX_TASK_AGE, batch_size=batch_size))
+
+    seconds = [result["elapsed"] for result in rounds]
+    return {
+        "rows": rows,
+        "batch_size": batch_size,
+        "deleted": rounds[-1]["deleted"],
+        "seconds": {"min": min(seconds), "mean": sum(seconds) / len(seconds), "max": max(seconds)},
+        "deleted_per_second": sum(result["deleted"] for result in rounds) / sum(seconds),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    report("delete_old_tasks", run(args.rows, args.repeat, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
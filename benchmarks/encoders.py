@@ -0,0 +1,82 @@
+"""Times the message encoders that can be selected with DRAMATIQ_ENCODER
+and the serialization of arguments for the Task args/kwargs columns.
+
+    python -m benchmarks.encoders --number 10000
+"""
+import argparse
+import datetime
+import json
+from decimal import Decimal
+
+import dramatiq
+from dramatiq.encoder import JSONEncoder
+
+from benchmarks.utils import measure, report, setup_django
+
+#: Argument shapes, as (name, args, kwargs) triples.
+PAYLOADS = [
+    ("small", (1, "a"), {}),
+    ("typed", (Decimal("12.50"), datetime.date(2020, 1, 2)), {
+        "when": datetime.datetime(2020, 1, 1, 12, tzinfo=datetime.timezone.utc),
+    }),
+    ("large", ([{"id": i, "name": "item %d" % i, "tags": ["a", "b"]} for i in range(500)],), {"flag": True}),
+]
+
+
+def encoders():
+    from django_dramatiq.utils import MsgPackEncoder, ORJSONEncoder, msgpack, orjson
+
+    yield "json", JSONEncoder()
+    if orjson is not None:
+        yield "orjson", ORJSONEncoder()
+    if msgpack is not None:
+        yield "msgpack", MsgPackEncoder()
+
+
+def argument_serializers():
+    from django_dramatiq.utils import DateDecimalJSONEncoder, dumps_arguments, orjson
+
+    yield "json", lambda value: json.dumps(value, cls=DateDecimalJSONEncoder, separators=(",", ":"))
+    if orjson is not None:
+        yield "orjson", dumps_arguments
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    setup_django()
+
+    results = {"encode": {}, "decode": {}, "size": {}, "arguments": {}}
+    for payload, message_args, message_kwargs in PAYLOADS:
+        # The stdlib encoder can't encode decimals and dates, so every
+        # encoder gets what it would end up decoding.
+        message = dramatiq.Message(
+            queue_name="default", actor_name="do_work",
+            args=json.loads(json.dumps(message_args, default=str)),
+            kwargs=json.loads(json.dumps(message_kwargs, default=str)),
+            options={},
+        )
+        data = message._asdict()
+        for name, encoder in encoders():
+            encoded = encoder.encode(data)
+            results["encode"].setdefault(payload, {})[name] = measure(
+                lambda: encoder.encode(data), repeat=args.repeat, number=args.number,
+            )
+            results["decode"].setdefault(payload, {})[name] = measure(
+                lambda: encoder.decode(encoded), repeat=args.repeat, number=args.number,
+            )
+            results["size"].setdefault(payload, {})[name] = len(encoded)
+
+        for name, serialize in argument_serializers():
+            results["arguments"].setdefault(payload, {})[name] = measure(
+                lambda: (serialize(message_args), serialize(message_kwargs)), repeat=args.repeat, number=args.number,
+            )
+
+    report("encoders", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Measures how many messages per second a fan-out can enqueue while
+the AdminMiddleware records their Tasks, one at a time, buffered or
+in bulk with send_many, compared with no middleware at all.
+
+    python -m benchmarks.fanout --messages 10000
+"""
+import argparse
+
+from benchmarks.utils import measure, report, setup_django
+
+#: The actor the messages are sent to, so its Tasks can be cleaned up.
+ACTOR_NAME = "benchmark_fanout"
+
+
+def strategies():
+    """Yield (name, middleware, send) triples, where `send` enqueues
+    the messages of a fan-out and waits for their Tasks to be stored.
+    """
+    from django_dramatiq.bulk import send_many
+    from django_dramatiq.middleware import AdminMiddleware
+
+    def send_each(broker, messages):
+        for message in messages:
+            broker.enqueue(message)
+
+    def send_buffered(broker, messages):
+        send_each(broker, messages)
+        broker.middleware[0].writer.flush()
+
+    def send_bulk(broker, messages):
+        send_many(messages, broker=broker)
+
+    yield "none", [], send_each
+    yield "admin", [AdminMiddleware()], send_each
+    yield "admin_buffered", [AdminMiddleware(buffered=True)], send_buffered
+    yield "admin_send_many", [AdminMiddleware()], send_bulk
+
+
+def run(messages, repeat):
+    import dramatiq
+    from dramatiq.brokers.stub import StubBroker
+
+    from django_dramatiq.models import Task
+
+    results = {}
+    for name, middleware, send in strategies():
+        broker = StubBroker(middleware=middleware)
+
+        @dramatiq.actor(broker=broker, actor_name=ACTOR_NAME)
+        def do_work(x):
+            return x
+
+        def fan_out():
+            send(broker, [do_work.message(i) for i in range(messages)])
+            broker.flush_all()
+
+        timings = measure(fan_out, repeat=repeat)
+        results[name] = {
+            "messages_per_second": messages / timings["mean"],
+            "seconds_per_message": {timing: value / messages for timing, value in timings.items()},
+        }
+        broker.close()
+
+    Task.tasks.filter(actor_name=ACTOR_NAME).delete()
+
+    baseline = results["none"]["messages_per_second"]
+    for result in results.values():
+        result["relative_throughput"] = result["messages_per_second"] / baseline
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    report("fanout", run(args.messages, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
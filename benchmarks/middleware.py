@@ -0,0 +1,72 @@
+"""Measures how many messages per second can be enqueued and
+processed through the AdminMiddleware and DbConnectionsMiddleware,
+compared with no middleware at all.
+
+    python -m benchmarks.middleware --messages 1000
+"""
+import argparse
+
+from benchmarks.utils import measure, report, setup_django
+
+#: The actor the messages are sent to, so its Tasks can be cleaned up.
+ACTOR_NAME = "benchmark_middleware"
+
+
+def middleware_stacks():
+    from django_dramatiq.middleware import AdminMiddleware, DbConnectionsMiddleware
+
+    yield "none", []
+    yield "admin", [AdminMiddleware()]
+    yield "db_connections", [DbConnectionsMiddleware()]
+    yield "admin_db_connections", [AdminMiddleware(), DbConnectionsMiddleware()]
+
+
+def run(messages, repeat):
+    import dramatiq
+    from dramatiq.brokers.stub import StubBroker
+
+    from django_dramatiq.models import Task
+    from django_dramatiq.test import process_message
+
+    results = {}
+    for name, middleware in middleware_stacks():
+        broker = StubBroker(middleware=middleware)
+
+        @dramatiq.actor(broker=broker, actor_name=ACTOR_NAME)
+        def do_work(x):
+            return x
+
+        def send_and_process():
+            # Process messages in this thread, the way a worker thread
+            # would, to leave scheduling out of the measurement.
+            for i in range(messages):
+                process_message(broker, do_work.send(i))
+            broker.flush_all()
+
+        timings = measure(send_and_process, repeat=repeat)
+        results[name] = {
+            "messages_per_second": messages / timings["mean"],
+            "seconds_per_message": {timing: value / messages for timing, value in timings.items()},
+        }
+        broker.close()
+
+    Task.tasks.filter(actor_name=ACTOR_NAME).delete()
+
+    baseline = results["none"]["messages_per_second"]
+    for result in results.values():
+        result["relative_throughput"] = result["messages_per_second"] / baseline
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    report("middleware", run(args.messages, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
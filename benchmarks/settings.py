@@ -0,0 +1,33 @@
+import os
+
+from tests.settings import *  # noqa
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("BENCHMARK_DATABASE", "benchmark.sqlite3"),
+    }
+}
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.request",
+                "django.contrib.auth.context_processors.auth",
+                "django.contrib.messages.context_processors.messages",
+            ],
+        },
+    },
+]
+
+DEBUG = False
+
+DRAMATIQ_LAZY_BROKER = os.environ.get("BENCHMARK_LAZY_BROKER") == "1"
+
+# The admin is rendered with the test client.
+ALLOWED_HOSTS = ["testserver"]
+STATIC_URL = "/static/"
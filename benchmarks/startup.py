@@ -0,0 +1,62 @@
+"""Times how long Django takes to start up in a fresh process with the
+broker built eagerly and lazily (DRAMATIQ_LAZY_BROKER), and how long
+a lazy broker then takes to be built on first use.
+
+    python -m benchmarks.startup --repeat 10
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+from benchmarks.utils import report
+
+STARTUP_SCRIPT = """\
+import time
+started_at = time.perf_counter()
+import django
+django.setup()
+print(time.perf_counter() - started_at)
+"""
+
+FIRST_USE_SCRIPT = """\
+import time
+import django
+django.setup()
+import dramatiq
+started_at = time.perf_counter()
+dramatiq.get_broker().resolve()
+print(time.perf_counter() - started_at)
+"""
+
+
+def time_script(script, lazy, repeat):
+    """Run `script` in `repeat` fresh processes and summarize the
+    timings they print.
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="benchmarks.settings", BENCHMARK_LAZY_BROKER="1" if lazy else "")
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, "-c", script], env=env)
+        timings.append(float(output))
+
+    return {"min": min(timings), "mean": sum(timings) / len(timings), "max": max(timings)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    results = {
+        "startup": {
+            "eager": time_script(STARTUP_SCRIPT, False, args.repeat),
+            "lazy": time_script(STARTUP_SCRIPT, True, args.repeat),
+        },
+        "first_use": time_script(FIRST_USE_SCRIPT, True, args.repeat),
+    }
+    report("startup", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Times a suite of actor tests run with the worker-based
+DramatiqTestCase and with the eager EagerDramatiqTestCase.
+
+    python -m benchmarks.test_harness --tests 50
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import unittest
+
+from benchmarks.utils import report, setup_django
+
+
+def make_suite(base, tests):
+    """Build a suite of `tests` tests, each sending a message to an
+    actor and checking that its Task finished.
+    """
+    import dramatiq
+
+    from django_dramatiq.models import Task
+
+    @dramatiq.actor(max_retries=0)
+    def do_work(x):
+        return x
+
+    def test(self):
+        message = do_work.send(1)
+        if not self.eager:
+            self.broker.join(do_work.queue_name)
+            self.worker.join()
+
+        self.assertEqual(Task.tasks.get(pk=message.message_id).status, Task.STATUS_DONE)
+
+    attrs = {"test_%d" % i: test for i in range(tests)}
+    case = type("Benchmark%s" % base.__name__, (base,), attrs)
+    return unittest.defaultTestLoader.loadTestsFromTestCase(case)
+
+
+def time_suite(suite):
+    started_at = time.perf_counter()
+    result = unittest.TextTestRunner(stream=io.StringIO()).run(suite)
+    elapsed = time.perf_counter() - started_at
+    if not result.wasSuccessful():
+        raise RuntimeError("Benchmark tests failed: %s" % (result.failures + result.errors))
+
+    return {"total": elapsed, "per_test": elapsed / result.testsRun}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tests", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    # Test cases flush the database, so never run them against the
+    # benchmark one.
+    with tempfile.TemporaryDirectory() as path:
+        os.environ["BENCHMARK_DATABASE"] = os.path.join(path, "test_harness.sqlite3")
+        setup_django()
+
+        from django_dramatiq.test import DramatiqTestCase, EagerDramatiqTestCase
+
+        results = {
+            "worker": time_suite(make_suite(DramatiqTestCase, args.tests)),
+            "eager": time_suite(make_suite(EagerDramatiqTestCase, args.tests)),
+        }
+        results["speedup"] = results["worker"]["per_test"] / results["eager"]["per_test"]
+        report("test_harness", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+from datetime import timedelta
+
+
+def setup_django():
+    """Set up Django against the benchmark database and migrate it.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0)
+
+
+def measure(fn, *, repeat=5, number=1):
+    """Call `fn` `number` times per round for `repeat` rounds and
+    return the best, mean and worst time per call, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started_at) / number)
+
+    return {"min": min(timings), "mean": sum(timings) / len(timings), "max": max(timings)}
+
+
+def populate_tasks(count, *, batch_size=10000):
+    """Fill the Task table with `count` synthetic rows spread over the
+    last 30 days, unless it already holds that many.  One in every
+    thousand rows belongs to "rare_actor".
+    """
+    from django.db import connection, transaction
+    from django.utils.timezone import now
+
+    from django_dramatiq.models import Task
+
+    if Task.tasks.count() == count:
+        return
+
+    Task.tasks.all().delete()
+    statuses = [status for status, _ in Task.STATUSES]
+    fields = [Task._meta.get_field(name) for name in (
+        "id", "status", "created_at", "updated_at", "message_data", "actor_name", "queue_name",
+        "runtime", "worker_hostname", "args", "kwargs",
+    )]
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        Task._meta.db_table,
+        ", ".join(field.column for field in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+
+    current_time = now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(0, count, batch_size):
+            rows = []
+            for i in range(offset, min(offset + batch_size, count)):
+                created_at = current_time - timedelta(seconds=i * 2592000 // count)
+                values = (
+                    uuid.uuid4(), statuses[i % len(statuses)], created_at, created_at + timedelta(seconds=1),
+                    b'{"args":[],"kwargs":{},"options":{}}',
+                    "rare_actor" if i % 1000 == 0 else "actor_%d" % (i % 50), "queue_%d" % (i % 5),
+                    (i % 1000) / 100, "host_%d" % (i % 10), "[%d]" % i, None,
+                )
+                rows.append([field.get_db_prep_save(value, connection) for field, value in zip(fields, values)])
+            cursor.executemany(sql, rows)
+
+
+def environment():
+    """Describe the versions the benchmarks ran against, so that runs
+    can be compared across versions.
+    """
+    import sqlite3
+
+    import django
+    import dramatiq
+
+    import django_dramatiq
+
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "dramatiq": dramatiq.__version__,
+        "django_dramatiq": django_dramatiq.__version__,
+        "sqlite": sqlite3.sqlite_version,
+    }
+
+
+def report(name, results, stream=None):
+    """Emit the results of a benchmark as JSON.
+    """
+    json.dump(
+        {"benchmark": name, "environment": environment(), "results": results},
+        stream or sys.stdout, indent=2, sort_keys=True,
+    )
+    (stream or sys.stdout).write("\n")
@@ -1,23 +1,87 @@
 import decimal
 import json
 import math
-from datetime import datetime
+from datetime import timedelta
 
-from django.conf import settings
+from django.conf.urls import url
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.template.defaultfilters import filesizeformat
+from django.template.response import TemplateResponse
+from django.urls import reverse
 from django.utils import timezone
-from django.utils.html import escape
+from django.utils.html import escape, format_html_join
 from django.utils.safestring import mark_safe
 
+from django_dramatiq import search
 from django_dramatiq.humanize import naturaldate
-from django_dramatiq.utils import DateDecimalJSONEncoder
-from .models import Task
+from django_dramatiq.paginator import EstimatedCountPaginator
+from django_dramatiq.rollups import bucket_start
+from django_dramatiq.utils import DateDecimalJSONEncoder, datetime_from_timestamp
+from .models import DATABASE_LABEL, Task, TaskFilterChoice, TaskRollup, WorkerHeartbeat
+
+
+def seconds_display(seconds):
+    if seconds is None:
+        return None
+    precision = None
+    if seconds < 1:
+        if not seconds:
+            return '0 sec'
+        # Display last digit after decimal point
+        return '%s sec' % round(decimal.Decimal(seconds), abs(int(math.log10(abs(seconds)))) + 1)
+    elif seconds < 10:
+        precision = 1
+    return '%s sec' % round(seconds, precision)
+
+
+class TaskChangeList(ChangeList):
+    def get_queryset(self, request):
+        # Nothing in the list needs the encoded message, and it can be large.
+        return super().get_queryset(request).defer("message_data")
+
+
+class TaskFilterChoiceListFilter(admin.SimpleListFilter):
+    """Filters Tasks by a column whose choices are read from the
+    TaskFilterChoice registry rather than the Task table.
+    """
+
+    def lookups(self, request, model_admin):
+        values = (
+            TaskFilterChoice.objects.using(DATABASE_LABEL)
+            .filter(kind=self.parameter_name)
+            .values_list("value", flat=True)
+        )
+        return [(value, value) for value in values]
+
+    def queryset(self, request, queryset):
+        if self.value() is not None:
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class QueueNameListFilter(TaskFilterChoiceListFilter):
+    title = "queue name"
+    parameter_name = TaskFilterChoice.KIND_QUEUE_NAME
+
+
+class ActorNameListFilter(TaskFilterChoiceListFilter):
+    title = "actor name"
+    parameter_name = TaskFilterChoice.KIND_ACTOR_NAME
+
+
+class WorkerHostnameListFilter(TaskFilterChoiceListFilter):
+    title = "worker hostname"
+    parameter_name = TaskFilterChoice.KIND_WORKER_HOSTNAME
 
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
-    exclude = ("message_data", "runtime")
-    readonly_fields = ("message_details", "traceback", "status", "queue_name", "actor_name", "runtime_display", "worker_hostname", "result", "args", "kwargs")
+    exclude = ("message_data", "runtime", "queue_wait", "result_preview")
+    readonly_fields = ("message_details", "traceback", "status", "queue_name", "actor_name", "runtime_display", "worker_hostname", "result", "args", "kwargs",
+                       "enqueued_at", "started_at", "finished_at", "queue_wait_display")
     list_display = (
         "__str__",
         "status",
@@ -26,20 +90,123 @@ class TaskAdmin(admin.ModelAdmin):
         "updated_at",
         "queue_name",
         "actor_name",
+        "queue_wait_display",
         "runtime_display",
         "worker_hostname",
     )
-    list_filter = ("status", "created_at", "queue_name", "actor_name", "worker_hostname")
+    list_filter = ("status", "created_at", QueueNameListFilter, ActorNameListFilter, WorkerHostnameListFilter)
     search_fields = ("actor_name", "args", "kwargs")
+    # Counting every Task on each page load gets slow on large tables.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
-    def eta(self, instance):
-        timestamp = (
-                instance.message.options.get("eta", instance.message.message_timestamp) / 1000
+    #: The periods, in hours, the dashboard can show.
+    dashboard_periods = (1, 6, 24, 24 * 7)
+
+    def get_changelist(self, request, **kwargs):
+        return TaskChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the search indexes when they're installed, rather than
+        # scanning the arguments of every Task.
+        connection = connections[queryset.db]
+        if not search.is_enabled() or not search.is_installed(connection, queryset.model._meta.db_table):
+            return super().get_search_results(request, queryset, search_term)
+
+        for term in search_term.split():
+            queryset = search.search(queryset, term)
+        return queryset, False
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            url(r"^dashboard/$", self.admin_site.admin_view(self.dashboard_view), name="%s_%s_dashboard" % info),
+        ] + super().get_urls()
+
+    def dashboard_view(self, request):
+        """Show execution counts, failures and runtime percentiles per
+        actor, along with throughput over time, from the TaskRollups
+        accumulated by the admin middleware.
+        """
+        has_view_permission = getattr(self, "has_view_permission", self.has_module_permission)
+        if not has_view_permission(request):
+            raise PermissionDenied
+
+        try:
+            hours = int(request.GET.get("hours", self.dashboard_periods[0]))
+        except ValueError:
+            hours = self.dashboard_periods[0]
+        hours = min(max(hours, 1), self.dashboard_periods[-1])
+
+        # Throughput is shown in at most 120 steps.
+        step = max(hours * 60 // 120, 1)
+        since = bucket_start(timezone.now()) - timedelta(hours=hours)
+        rollups = (
+            TaskRollup.objects.using(DATABASE_LABEL)
+            .filter(bucket__gt=since)
+            .order_by()
+            .iterator()
+        )
+
+        by_actor, by_time = {}, {}
+        for rollup in rollups:
+            stats = rollup.stats
+            key = (rollup.actor_name, rollup.queue_name)
+            if key in by_actor:
+                by_actor[key].merge(stats)
+            else:
+                by_actor[key] = stats
+
+            offset = (rollup.bucket - since) // timedelta(minutes=step)
+            moment = since + timedelta(minutes=offset * step)
+            count, failures = by_time.get(moment, (0, 0))
+            by_time[moment] = (count + rollup.count, failures + rollup.failures)
+
+        actors = [{
+            "actor_name": actor_name,
+            "queue_name": queue_name,
+            "count": stats.count,
+            "failures": stats.failures,
+            "failure_rate": 100 * stats.failures / stats.count if stats.count else 0,
+            "runtime_avg": stats.runtime_avg,
+            "runtime_min": stats.runtime_min,
+            "runtime_p50": stats.percentile(0.5),
+            "runtime_p95": stats.percentile(0.95),
+            "runtime_p99": stats.percentile(0.99),
+            "runtime_max": stats.runtime_max,
+        } for (actor_name, queue_name), stats in sorted(by_actor.items(), key=lambda item: -item[1].count)]
+
+        peak = max([count for count, _ in by_time.values()] or [0])
+        throughput = [{
+            "moment": moment,
+            "count": count,
+            "failures": failures,
+            "width": 100 * count // peak if peak else 0,
+        } for moment, (count, failures) in sorted(by_time.items())]
+
+        context = dict(
+            self.admin_site.each_context(request),
+            title="Task dashboard",
+            opts=self.model._meta,
+            hours=hours,
+            step=step,
+            periods=self.dashboard_periods,
+            actors=actors,
+            throughput=throughput,
         )
+        return TemplateResponse(request, "admin/django_dramatiq/task/dashboard.html", context)
 
-        # Django expects a timezone-aware datetime if USE_TZ is True, and a naive datetime in localtime otherwise.
-        tz = timezone.utc if settings.USE_TZ else None
-        return naturaldate(datetime.fromtimestamp(timestamp, tz=tz))
+    def eta(self, instance):
+        eta = instance.eta or instance.enqueued_at
+        if eta is None:
+            # Tasks stored before these columns existed.
+            if "message_data" in instance.get_deferred_fields():
+                return None
+            eta = datetime_from_timestamp(
+                instance.message.options.get("eta", instance.message.message_timestamp)
+            )
+        return naturaldate(eta)
+    eta.admin_order_field = "eta"
 
     def message_details(self, instance):
         try:
@@ -55,6 +222,9 @@ class TaskAdmin(admin.ModelAdmin):
         return None
 
     def result(self, instance):
+        if instance.result_preview is not None:
+            # Stored by AdminMiddleware(result_previews=True).
+            return mark_safe("<pre>%s</pre>" % escape(instance.result_preview))
         if instance.status == Task.STATUS_DONE:
             try:
                 result = instance.message.get_result(timeout=50)  # timeout in ms
@@ -64,15 +234,12 @@ class TaskAdmin(admin.ModelAdmin):
         return ''
 
     def runtime_display(self, instance):
-        if instance.runtime is None:
-            return None
-        precision = None
-        if instance.runtime < 1:
-            # Display last digit after decimal point
-            return '%s sec' % round(decimal.Decimal(instance.runtime), abs(int(math.log10(abs(instance.runtime)))) + 1)
-        elif instance.runtime < 10:
-            precision = 1
-        return '%s sec' % round(instance.runtime, precision)
+        return seconds_display(instance.runtime)
+
+    def queue_wait_display(self, instance):
+        return seconds_display(instance.queue_wait)
+    queue_wait_display.short_description = "queue wait"
+    queue_wait_display.admin_order_field = "queue_wait"
 
     def has_add_permission(self, request):
         return False
@@ -82,3 +249,61 @@ class TaskAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, task=None):
         return False
+
+
+@admin.register(WorkerHeartbeat)
+class WorkerHeartbeatAdmin(admin.ModelAdmin):
+    list_display = (
+        "__str__",
+        "hostname",
+        "pid",
+        "is_alive",
+        "busy_display",
+        "processed",
+        "failed",
+        "rss_display",
+        "started_at",
+        "last_seen",
+    )
+    list_filter = ("hostname",)
+    readonly_fields = (
+        "hostname", "pid", "started_at", "last_seen", "threads", "in_flight_display", "processed", "failed",
+        "rss_display",
+    )
+    exclude = ("in_flight", "rss")
+
+    #: The amount of time, in seconds, after which a worker that
+    #: stopped publishing heartbeats is considered dead.
+    stale_after = 60
+
+    def is_alive(self, instance):
+        return instance.last_seen >= timezone.now() - timedelta(seconds=self.stale_after)
+    is_alive.boolean = True
+    is_alive.short_description = "alive"
+
+    def busy_display(self, instance):
+        return "%d / %d" % (len(instance.in_flight_message_ids), instance.threads)
+    busy_display.short_description = "busy threads"
+
+    def in_flight_display(self, instance):
+        info = Task._meta.app_label, Task._meta.model_name
+        return format_html_join(
+            mark_safe("<br>"), '<a href="{}">{}</a>',
+            ((reverse("admin:%s_%s_change" % info, args=(message_id,)), message_id)
+             for message_id in instance.in_flight_message_ids),
+        )
+    in_flight_display.short_description = "in flight"
+
+    def rss_display(self, instance):
+        return filesizeformat(instance.rss) if instance.rss is not None else None
+    rss_display.short_description = "memory"
+    rss_display.admin_order_field = "rss"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, heartbeat=None):
+        return False
+
+    def has_delete_permission(self, request, heartbeat=None):
+        return False
@@ -1,8 +1,10 @@
 import dramatiq
 from django.apps import AppConfig
 from django.conf import settings
+from django.db.models.signals import post_migrate
 from dramatiq.results import Results
 
+from .brokers import LazyBroker
 from .utils import load_class, load_middleware
 
 DEFAULT_ENCODER = "dramatiq.encoder.JSONEncoder"
@@ -36,10 +38,22 @@ class DjangoDramatiqConfig(AppConfig):
 
     @classmethod
     def initialize(cls):
-        global RATE_LIMITER_BACKEND
-
+        # The encoder is cheap to build and is needed to decode messages
+        # even by processes that never use the broker.
         dramatiq.set_encoder(cls.select_encoder())
 
+        if cls.lazy_broker():
+            dramatiq.set_broker(LazyBroker(cls.build_broker))
+        else:
+            dramatiq.set_broker(cls.build_broker())
+
+    @classmethod
+    def build_broker(cls):
+        """Build the broker along with its middleware, result backend
+        and rate limiter backend.
+        """
+        global RATE_LIMITER_BACKEND
+
         result_backend_settings = cls.result_backend_settings()
         if result_backend_settings:
             result_backend_path = result_backend_settings.get("BACKEND", "dramatiq.results.backends.StubBackend")
@@ -71,17 +85,30 @@ class DjangoDramatiqConfig(AppConfig):
         if result_backend is not None:
             middleware.append(results_middleware)
 
-        broker = broker_class(middleware=middleware, **broker_options)
-        dramatiq.set_broker(broker)
+        return broker_class(middleware=middleware, **broker_options)
+
+    def ready(self):
+        from .search import reinstall
+
+        post_migrate.connect(reinstall, sender=self)
 
     @property
     def rate_limiter_backend(self):
         global RATE_LIMITER_BACKEND
+        broker = dramatiq.get_broker()
+        if isinstance(broker, LazyBroker):
+            # The rate limiter backend is built along with the broker.
+            broker.resolve()
+
         if RATE_LIMITER_BACKEND is None:
             raise RuntimeError("The rate limiter backend has not been configured.")
 
         return RATE_LIMITER_BACKEND
 
+    @classmethod
+    def lazy_broker(cls):
+        return getattr(settings, "DRAMATIQ_LAZY_BROKER", False)
+
     @classmethod
     def broker_settings(cls):
         return getattr(settings, "DRAMATIQ_BROKER", DEFAULT_BROKER_SETTINGS)
@@ -98,6 +125,22 @@ class DjangoDramatiqConfig(AppConfig):
     def tasks_database(cls):
         return getattr(settings, "DRAMATIQ_TASKS_DATABASE", "default")
 
+    @classmethod
+    def tasks_partitioning_settings(cls):
+        return getattr(settings, "DRAMATIQ_TASKS_PARTITIONING", {})
+
+    @classmethod
+    def tasks_search_settings(cls):
+        return getattr(settings, "DRAMATIQ_TASKS_SEARCH", {})
+
+    @classmethod
+    def tasks_storage_settings(cls):
+        return getattr(settings, "DRAMATIQ_TASKS_STORAGE", {})
+
+    @classmethod
+    def tasks_tracking_settings(cls):
+        return getattr(settings, "DRAMATIQ_TASKS_TRACKING", {})
+
     @classmethod
     def select_encoder(cls):
         encoder = getattr(settings, "DRAMATIQ_ENCODER", DEFAULT_ENCODER)
@@ -0,0 +1,90 @@
+import threading
+
+import dramatiq
+
+
+class _DeferredActorOptions(set):
+    """Stands in for the options actors may be declared with until the
+    middleware that defines them is loaded.  Every option is allowed
+    and actors are validated once the broker is built.
+    """
+
+    def __rsub__(self, other):
+        return set()
+
+
+class LazyBroker:
+    """Stands in for the global broker until it's first used, so that
+    processes that never enqueue or process messages don't pay for
+    building it along with its middleware and backends.
+
+    Actors declared in the meantime are declared on the broker once
+    it's built, after which it replaces this object as the global
+    broker.
+
+    Parameters:
+      factory(callable): Builds the broker.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._broker = None
+        self._declared_actors = []
+        self._lock = threading.Lock()
+
+    @property
+    def actor_options(self):
+        if self._broker is None:
+            return _DeferredActorOptions()
+        return self._broker.actor_options
+
+    def declare_actor(self, actor):
+        if self._broker is None:
+            with self._lock:
+                if self._broker is None:
+                    self._declared_actors.append(actor)
+                    return
+
+        self._broker.declare_actor(actor)
+
+    def resolve(self):
+        """Build the broker, unless that's already been done.
+
+        Raises:
+          ValueError: If an actor was declared with options that none
+            of the broker's middleware defines.
+
+        Returns:
+          Broker: The broker.
+        """
+        if self._broker is not None:
+            return self._broker
+
+        with self._lock:
+            if self._broker is None:
+                broker = self._factory()
+                for actor in self._declared_actors:
+                    invalid_options = set(actor.options) - broker.actor_options
+                    if invalid_options:
+                        invalid_options_list = ", ".join(invalid_options)
+                        raise ValueError((
+                            "The following actor options are undefined: %s. "
+                            "Did you forget to add a middleware to your Broker?"
+                        ) % invalid_options_list)
+
+                    broker.declare_actor(actor)
+
+                self._declared_actors = []
+                self._broker = broker
+                if dramatiq.get_broker() is self:
+                    dramatiq.set_broker(broker)
+
+        return self._broker
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __repr__(self):
+        return "<LazyBroker of %r>" % self._broker if self._broker is not None else "<LazyBroker>"
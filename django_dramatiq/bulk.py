@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+
+import dramatiq
+
+from .middleware import AdminMiddleware, _bulk_enqueue
+
+
+def send_many(messages, *, delay=None, chunk_size=1000, broker=None):
+    """Enqueue many messages, recording their Tasks in bulk.
+
+    The Tasks for every chunk of messages are stored with a single
+    upsert once the chunk is published, rather than one at a time by
+    the admin middleware.  If publishing fails partway through a
+    chunk, the Tasks of the messages that were published are still
+    stored before the error is raised.
+
+    Parameters:
+      messages(iterable[Message]): The messages to enqueue, as built
+        by ``actor.message(...)``.
+      delay(int): The minimum amount of time, in milliseconds, each
+        message should be delayed by.
+      chunk_size(int): The number of messages per bulk upsert.
+      broker(Broker): The broker to enqueue the messages on.
+        Defaults to the global broker.
+
+    Returns:
+      list[Message]: The enqueued messages.
+    """
+    broker = broker or dramatiq.get_broker()
+    admin = next((m for m in broker.middleware if isinstance(m, AdminMiddleware)), None)
+
+    enqueued, chunk = [], []
+    for message in messages:
+        chunk.append(message)
+        if len(chunk) >= chunk_size:
+            enqueued.extend(_send_chunk(broker, admin, chunk, delay))
+            chunk = []
+
+    if chunk:
+        enqueued.extend(_send_chunk(broker, admin, chunk, delay))
+
+    return enqueued
+
+
+def _send_chunk(broker, admin, messages, delay):
+    if admin is None:
+        return [broker.enqueue(message, delay=delay) for message in messages]
+
+    # Brokers return delayed messages with their delay queue and eta,
+    # so the Tasks look the same as the ones the admin middleware
+    # would store.
+    enqueued = []
+    try:
+        with _recorded_in_bulk():
+            for message in messages:
+                enqueued.append(broker.enqueue(message, delay=delay))
+    finally:
+        if enqueued:
+            admin.record_enqueued(enqueued, delay)
+
+    return enqueued
+
+
+@contextmanager
+def _recorded_in_bulk():
+    active = getattr(_bulk_enqueue, "active", False)
+    _bulk_enqueue.active = True
+    try:
+        yield
+    finally:
+        _bulk_enqueue.active = active
@@ -0,0 +1,68 @@
+import struct
+import zlib
+
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+#: The prefix of compressed message data.  Encoded messages never
+#: start with a NUL byte, so data without it is stored as is.
+MAGIC = b"\x00DDQ"
+
+#: The version of the header format.
+VERSION = 1
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {
+    "zlib": CODEC_ZLIB,
+    "zstd": CODEC_ZSTD,
+}
+
+_HEADER = struct.Struct("!4sBB")
+
+
+def compress(data, codec="zlib", level=None):
+    """Compress encoded message data and prefix it with a header
+    recording the format version and codec.
+    """
+    try:
+        codec_id = CODECS[codec]
+    except KeyError:
+        raise ImproperlyConfigured("Unknown message data compression %r, expected one of %s." % (
+            codec, ", ".join(CODECS),
+        ))
+
+    if codec_id == CODEC_ZSTD:
+        if zstandard is None:
+            raise ImproperlyConfigured("zstd message data compression requires the zstandard package.")
+        payload = zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+    else:
+        payload = zlib.compress(data, -1 if level is None else level)
+
+    return _HEADER.pack(MAGIC, VERSION, codec_id) + payload
+
+
+def decompress(data):
+    """Get the encoded message back out of stored message data,
+    whether it was compressed or not.
+    """
+    data = bytes(data)
+    if not data.startswith(MAGIC):
+        return data
+
+    _, version, codec_id = _HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError("Unsupported message data version %d." % version)
+
+    payload = data[_HEADER.size:]
+    if codec_id == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    if codec_id == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Decompressing zstd message data requires the zstandard package.")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError("Unknown message data codec %d." % codec_id)
@@ -0,0 +1,207 @@
+import logging
+import os
+import random
+import signal
+import threading
+import time
+
+from django import db
+from dramatiq import Worker
+from dramatiq.middleware import Middleware
+
+from django_dramatiq.utils import current_rss
+
+LOGGER = logging.getLogger("django_dramatiq.launcher")
+
+#: The exit code of worker processes that stopped to be replaced.
+RET_RECYCLE = 3
+
+#: The signals that stop the launcher and its worker processes.
+STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM, signal.SIGHUP)
+
+
+class RecycleMiddleware(Middleware):
+    """Asks for the worker process to be replaced once it has processed
+    `max_messages` messages, or once its RSS exceeds `max_memory`.
+
+    Parameters:
+      max_messages(int): The number of messages after which the
+        process is recycled.
+      max_memory(int): The RSS, in bytes, above which the process is
+        recycled.
+    """
+
+    def __init__(self, *, max_messages=None, max_memory=None):
+        self.max_messages = max_messages
+        self.max_memory = max_memory
+        self.messages_processed = 0
+        self.recycle = threading.Event()
+        self._lock = threading.Lock()
+
+    def after_process_message(self, broker, message, *, result=None, exception=None):
+        with self._lock:
+            self.messages_processed += 1
+            messages_processed = self.messages_processed
+
+        if self.max_messages is not None and messages_processed >= self.max_messages:
+            LOGGER.info("Recycling worker process %d after %d messages.", os.getpid(), messages_processed)
+            self.recycle.set()
+        elif self.max_memory is not None and current_rss() > self.max_memory:
+            LOGGER.info("Recycling worker process %d using more than %d bytes.", os.getpid(), self.max_memory)
+            self.recycle.set()
+
+    after_skip_message = after_process_message
+
+
+class PreforkLauncher:
+    """Runs dramatiq workers in processes forked from the current one,
+    which already set up Django and imported every actor, so that the
+    workers start right away and share that memory copy-on-write.
+
+    Worker processes that exit, including those recycled after
+    `max_messages` messages or once they use more than `max_memory`
+    bytes, are replaced until the launcher is asked to stop by SIGINT,
+    SIGTERM or SIGHUP.  Middleware forks, like the Prometheus exposition
+    server, aren't started.
+
+    Parameters:
+      broker(Broker): The broker the workers consume from.
+      processes(int): The number of worker processes.
+      threads(int): The number of worker threads per process.
+      queues(list[str]): The queues to consume, or None for all of them.
+      max_messages(int): Recycle worker processes after this many messages.
+      max_memory(int): Recycle worker processes whose RSS exceeds this
+        many bytes.
+      worker_timeout(int): The amount of time, in milliseconds, worker
+        threads wait for messages, and so take to notice they should stop.
+    """
+
+    def __init__(self, broker, *, processes, threads, queues=None, max_messages=None, max_memory=None,
+                 worker_timeout=1000):
+        self.broker = broker
+        self.processes = processes
+        self.threads = threads
+        self.queues = queues
+        self.max_messages = max_messages
+        self.max_memory = max_memory
+        self.worker_timeout = worker_timeout
+
+        self.running = False
+        self.children = {}
+
+    def run(self):
+        """Fork the worker processes and keep them running until the
+        launcher receives a stop signal.
+
+        Returns:
+          int: The exit code.
+        """
+        # Connections can't be shared with the children.
+        db.connections.close_all()
+
+        self.running = True
+        for signum in STOP_SIGNALS:
+            signal.signal(signum, self._handle_stop)
+
+        for worker_id in range(self.processes):
+            self._spawn(worker_id)
+
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            worker_id = self.children.pop(pid, None)
+            if worker_id is None:
+                continue
+
+            exit_code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+            if not self.running:
+                continue
+
+            if exit_code != RET_RECYCLE:
+                LOGGER.warning("Worker process %d exited with code %d, replacing it.", pid, exit_code)
+                # Don't spin if the workers can't start.
+                time.sleep(1)
+            self._spawn(worker_id)
+
+        return 0
+
+    def stop(self):
+        self.running = False
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _handle_stop(self, signum, frame):
+        if self.running:
+            LOGGER.info("Stopping worker processes...")
+            self.stop()
+
+    def _spawn(self, worker_id):
+        # Stop signals are held until both processes are ready for
+        # them.  Otherwise, a child could run the launcher's handler
+        # and stop its siblings, or the launcher could miss the child.
+        mask = signal.pthread_sigmask(signal.SIG_BLOCK, STOP_SIGNALS)
+        try:
+            pid = os.fork()
+        except BaseException:
+            signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+            raise
+
+        if pid:
+            self.children[pid] = worker_id
+            signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+            return
+
+        self.children = {}
+        stopped = threading.Event()
+        for signum in STOP_SIGNALS:
+            signal.signal(signum, lambda signum, frame: stopped.set())
+        signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+
+        exit_code = 1
+        try:
+            exit_code = self.run_worker(stopped)
+        except BaseException:
+            LOGGER.exception("Worker process %d failed.", os.getpid())
+        finally:
+            logging.shutdown()
+            os._exit(exit_code)
+
+    def run_worker(self, stopped):
+        """Run a worker in the current process until `stopped` is set
+        or the process should be recycled.
+
+        Parameters:
+          stopped(threading.Event): Set when the worker should stop.
+
+        Returns:
+          int: The exit code.
+        """
+        # Children shouldn't all follow the same random sequence.
+        random.seed()
+
+        recycler = None
+        if self.max_messages is not None or self.max_memory is not None:
+            recycler = RecycleMiddleware(max_messages=self.max_messages, max_memory=self.max_memory)
+            self.broker.add_middleware(recycler)
+
+        self.broker.emit_after("process_boot")
+        worker = Worker(self.broker, queues=self.queues, worker_timeout=self.worker_timeout,
+                        worker_threads=self.threads)
+        worker.start()
+        LOGGER.info("Worker process %d is ready for action.", os.getpid())
+
+        while not stopped.wait(0.1):
+            if recycler is not None and recycler.recycle.is_set():
+                break
+
+        worker.stop()
+        self.broker.close()
+        return 0 if stopped.is_set() else RET_RECYCLE
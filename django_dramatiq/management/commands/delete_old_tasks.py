@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_dramatiq.models import Task
+
+
+def _max_age(value):
+    name, sep, age = value.rpartition("=")
+    if not sep or not name:
+        raise CommandError("Expected NAME=SECONDS, got %r." % value)
+    try:
+        return name, int(age)
+    except ValueError:
+        raise CommandError("Expected NAME=SECONDS, got %r." % value)
+
+
+class Command(BaseCommand):
+    help = "Deletes old Dramatiq tasks from the database in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-task-age",
+            default=86400,
+            type=int,
+            help="The maximum age of tasks, in seconds (default: 86400).",
+        )
+        parser.add_argument(
+            "--status-max-age",
+            action="append",
+            default=[],
+            metavar="STATUS=SECONDS",
+            help="The maximum age of tasks with a given status.  Can be repeated.",
+        )
+        parser.add_argument(
+            "--queue-max-age",
+            action="append",
+            default=[],
+            metavar="QUEUE=SECONDS",
+            help="The maximum age of tasks on a given queue.  Takes precedence over --status-max-age.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            default=10000,
+            type=int,
+            help="The number of tasks deleted per statement (default: 10000).",
+        )
+        parser.add_argument(
+            "--sleep",
+            default=0,
+            type=float,
+            help="The number of seconds to sleep in between batches (default: 0).",
+        )
+
+    def handle(self, max_task_age, status_max_age, queue_max_age, batch_size, sleep, **options):
+        stats = Task.tasks.delete_old_tasks(
+            max_task_age,
+            max_task_age_by_status=dict(_max_age(value) for value in status_max_age),
+            max_task_age_by_queue=dict(_max_age(value) for value in queue_max_age),
+            batch_size=batch_size,
+            sleep=sleep,
+        )
+        self.stdout.write(" * Deleted %(deleted)d tasks in %(elapsed).2f seconds (%(rate).1f tasks/s)." % stats)
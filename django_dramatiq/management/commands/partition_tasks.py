@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from django_dramatiq import partitioning
+from django_dramatiq.apps import DjangoDramatiqConfig
+from django_dramatiq.models import DATABASE_LABEL, Task
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates upcoming partitions of the Dramatiq Task table and drops expired ones. "
+        "Requires PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        partitioning_settings = DjangoDramatiqConfig.tasks_partitioning_settings()
+        parser.add_argument(
+            "--setup",
+            action="store_true",
+            help="Convert the Task table into a partitioned table first.",
+        )
+        parser.add_argument(
+            "--period",
+            choices=sorted(partitioning.PERIODS),
+            default=partitioning_settings.get("PERIOD", partitioning.PERIOD_DAILY),
+            help="The range covered by each partition (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--premake",
+            type=int,
+            default=partitioning_settings.get("PREMAKE", 7),
+            help="The number of future partitions to create ahead of time (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--max-task-age",
+            type=int,
+            default=partitioning_settings.get("MAX_TASK_AGE"),
+            help="Drop partitions whose tasks are all older than this many seconds (default: keep everything).",
+        )
+        parser.add_argument(
+            "--detach-only",
+            action="store_true",
+            help="Detach expired partitions instead of dropping them.",
+        )
+
+    def handle(self, setup, period, premake, max_task_age, detach_only, **options):
+        connection = connections[DATABASE_LABEL]
+        if connection.vendor != "postgresql":
+            raise CommandError("Task table partitioning requires PostgreSQL.")
+
+        table = Task._meta.db_table
+        with transaction.atomic(using=DATABASE_LABEL):
+            if setup:
+                partitioning.convert_to_partitioned(connection, table, period, premake=premake)
+                self.stdout.write(" * Partitioned table %r by %s ranges of created_at." % (table, period))
+            elif not partitioning.is_partitioned(connection, table):
+                raise CommandError("Table %r isn't partitioned, run this command with --setup first." % table)
+
+            for name in partitioning.create_partitions(connection, table, period, premake=premake):
+                self.stdout.write(" * Created partition: %r" % name)
+
+            if max_task_age is not None:
+                removed = partitioning.drop_old_partitions(connection, table, max_task_age, detach_only=detach_only)
+                for name in removed:
+                    self.stdout.write(" * %s partition: %r" % ("Detached" if detach_only else "Dropped", name))
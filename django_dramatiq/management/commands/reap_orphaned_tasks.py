@@ -0,0 +1,71 @@
+import importlib
+from io import StringIO
+
+import dramatiq
+from django.core.management.base import BaseCommand
+
+from django_dramatiq.management.commands.rundramatiq import Command as RunDramatiqCommand
+from django_dramatiq.models import Task
+from django_dramatiq.utils import actor_time_limits
+
+
+class Command(BaseCommand):
+    help = "Marks Dramatiq tasks whose worker died while running them as lost."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--heartbeat-timeout",
+            default=60,
+            type=int,
+            help=(
+                "The number of seconds after which workers that stopped publishing heartbeats "
+                "are considered dead (default: 60)."
+            ),
+        )
+        parser.add_argument(
+            "--time-limit",
+            type=int,
+            help=(
+                "The time limit, in milliseconds, of actors that aren't declared by any tasks module "
+                "(default: none, their tasks are only lost when their worker is)."
+            ),
+        )
+        parser.add_argument(
+            "--requeue",
+            action="store_true",
+            help="Enqueue the messages of lost tasks again.",
+        )
+        parser.add_argument(
+            "--requeue-after",
+            default=600,
+            type=int,
+            help=(
+                "The number of seconds tasks must have been lost for before they're requeued, since stalled "
+                "workers look just like dead ones.  Until then, they're left running (default: 600)."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            default=1000,
+            type=int,
+            help="The number of tasks marked per statement (default: 1000).",
+        )
+
+    def handle(self, heartbeat_timeout, time_limit, requeue, requeue_after, batch_size, **options):
+        self.import_tasks_modules()
+        stats = Task.tasks.reap_orphaned_tasks(
+            heartbeat_timeout=heartbeat_timeout,
+            time_limits=actor_time_limits(dramatiq.get_broker()),
+            default_time_limit=time_limit,
+            requeue=requeue,
+            requeue_after=requeue_after,
+            batch_size=batch_size,
+        )
+        self.stdout.write(" * Found %(lost)d lost tasks and requeued %(requeued)d of them." % stats)
+
+    def import_tasks_modules(self):
+        """Import the tasks modules rundramatiq passes to the workers,
+        so that the time limits of their actors are known.
+        """
+        for module in RunDramatiqCommand(stdout=StringIO()).discover_tasks_modules(verbosity=0):
+            importlib.import_module(module)
@@ -1,17 +1,24 @@
-import importlib
+import importlib.util
+import json
+import logging
 import multiprocessing
 import os
 import pkgutil
 import sys
+import tempfile
+import time
 
 from django.apps import apps
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils.module_loading import module_has_submodule
 
 #: The number of available CPUs.
 CPU_COUNT = multiprocessing.cpu_count()
 
+#: The version of the tasks module manifest format.
+MANIFEST_VERSION = 1
+
 
 class Command(BaseCommand):
     help = "Runs Dramatiq workers."
@@ -72,9 +79,35 @@ class Command(BaseCommand):
             type=str,
             help="write all logs to a file (default: sys.stderr)",
         )
+        parser.add_argument(
+            "--manifest",
+            type=str,
+            help=(
+                "cache the discovered tasks modules in a file, which is reused until a "
+                "directory they were discovered in changes (default: no manifest)"
+            ),
+        )
+        parser.add_argument(
+            "--prefork",
+            action="store_true",
+            help=(
+                "import the tasks modules once and fork the worker processes from this one "
+                "instead of running dramatiq"
+            ),
+        )
+        parser.add_argument(
+            "--max-messages",
+            type=int,
+            help="with --prefork, replace worker processes after they processed this many messages",
+        )
+        parser.add_argument(
+            "--max-memory",
+            type=int,
+            help="with --prefork, replace worker processes whose RSS exceeds this many megabytes",
+        )
 
     def handle(self, use_watcher, use_polling_watcher, use_gevent, path, processes, threads, verbosity, queues,
-               pid_file, log_file, **options):
+               pid_file, log_file, manifest=None, prefork=False, max_messages=None, max_memory=None, **options):
         executable_name = "dramatiq-gevent" if use_gevent else "dramatiq"
         executable_path = self._resolve_executable(executable_name)
         watch_args = ["--watch", "."] if use_watcher else []
@@ -82,7 +115,19 @@ class Command(BaseCommand):
             watch_args.append("--watch-use-polling")
 
         verbosity_args = ["-v"] * (verbosity - 1)
-        tasks_modules = self.discover_tasks_modules()
+        tasks_modules = self.discover_tasks_modules(manifest=manifest, verbosity=verbosity)
+        if prefork:
+            if use_watcher or use_gevent:
+                raise CommandError("--prefork can't be combined with --reload or --use-gevent.")
+
+            return self.run_prefork(
+                tasks_modules, processes=processes, threads=threads, verbosity=verbosity, queues=queues,
+                pid_file=pid_file, log_file=log_file, max_messages=max_messages,
+                max_memory=max_memory * 1024 * 1024 if max_memory else None,
+            )
+        elif max_messages or max_memory:
+            raise CommandError("--max-messages and --max-memory require --prefork.")
+
         process_args = [
             executable_name,
             "--path", *path,
@@ -111,23 +156,77 @@ class Command(BaseCommand):
         self.stdout.write(' * Running dramatiq: "%s"\n\n' % " ".join(process_args))
         os.execvp(executable_path, process_args)
 
-    def discover_tasks_modules(self):
+    def run_prefork(self, tasks_modules, *, processes, threads, verbosity, queues, pid_file, log_file,
+                    max_messages, max_memory):
+        """Import the tasks modules and fork the worker processes from
+        this process.
+        """
+        import dramatiq
+
+        from django_dramatiq.launcher import PreforkLauncher
+
+        logging.basicConfig(
+            filename=log_file,
+            level=logging.DEBUG if verbosity > 1 else logging.INFO,
+            format="[%(asctime)s] [PID %(process)d] [%(threadName)s] [%(name)s] [%(levelname)s] %(message)s",
+        )
+
+        started_at = time.monotonic()
+        for module in tasks_modules:
+            importlib.import_module(module)
+        self._write_timing(verbosity, "Imported tasks modules", started_at)
+
+        if pid_file:
+            with open(pid_file, "w") as f:
+                f.write(str(os.getpid()))
+
+        self.stdout.write(" * Running %d prefork worker processes\n\n" % processes)
+        launcher = PreforkLauncher(
+            dramatiq.get_broker(),
+            processes=processes,
+            threads=threads,
+            queues=queues,
+            max_messages=max_messages,
+            max_memory=max_memory,
+        )
+        try:
+            launcher.run()
+        finally:
+            if pid_file:
+                os.unlink(pid_file)
+
+    def discover_tasks_modules(self, manifest=None, verbosity=1):
+        """Find the tasks modules of every installed app and the
+        modules in tasks packages, without importing them.  Workers
+        import them anyway, so importing them here would only delay
+        their startup.
+        """
         ignored_modules = set(getattr(settings, "DRAMATIQ_IGNORED_MODULES", []))
-        app_configs = (c for c in apps.get_app_configs() if module_has_submodule(c.module, "tasks"))
-        tasks_modules = ["django_dramatiq.setup"]
+        found = None
+        if manifest:
+            started_at = time.monotonic()
+            found = self._load_manifest(manifest)
+            if found is not None:
+                self._write_timing(verbosity, "Loaded tasks modules from %r" % manifest, started_at)
 
-        for conf in app_configs:
-            module = conf.name + ".tasks"
-            imported_module = importlib.import_module(module)
+        if found is None:
+            started_at = time.monotonic()
+            found, directories = self._find_tasks_modules()
+            self._write_timing(verbosity, "Discovered tasks modules", started_at)
 
+            if manifest:
+                started_at = time.monotonic()
+                self._save_manifest(manifest, found, directories)
+                self._write_timing(verbosity, "Wrote tasks modules to %r" % manifest, started_at)
+
+        tasks_modules = ["django_dramatiq.setup"]
+        for module, submodules in found:
             if module in ignored_modules:
                 self.stdout.write(" * Ignored tasks module: %r" % module)
-            elif not self._is_package(imported_module):
+            elif submodules is None:
                 self.stdout.write(" * Discovered tasks module: %r" % module)
                 tasks_modules.append(module)
             else:
-                submodules = self._get_submodules(imported_module)
-
                 for submodule in submodules:
                     if submodule in ignored_modules:
                         self.stdout.write(" * Ignored tasks module: %r" % submodule)
@@ -137,25 +236,97 @@ class Command(BaseCommand):
 
         return tasks_modules
 
-    def _is_package(self, module):
-        module_path = getattr(module, "__path__", None)
-        return module_path and os.path.isdir(module_path[0])
+    def _find_tasks_modules(self):
+        """Find the tasks modules of every installed app.
 
-    def _get_submodules(self, package):
+        Returns:
+          tuple[list, list[str]]: The name of each app's tasks module
+          along with the names of its submodules, or None if it isn't a
+          package, and the directories that were looked at.
+        """
+        found, directories = [], []
+        for conf in apps.get_app_configs():
+            if conf.path:
+                directories.append(conf.path)
+            if not module_has_submodule(conf.module, "tasks"):
+                continue
+
+            module = conf.name + ".tasks"
+            # Only the app's package is imported to find the spec.
+            spec = importlib.util.find_spec(module)
+            if spec.submodule_search_locations is None:
+                found.append((module, None))
+            else:
+                submodules = self._find_submodules(module, list(spec.submodule_search_locations), directories)
+                found.append((module, submodules))
+
+        return found, directories
+
+    def _find_submodules(self, package_name, package_path, directories):
         submodules = []
+        directories.extend(package_path)
 
-        package_path = package.__path__
-        prefix = package.__name__ + "."
+        for finder, module_name, is_pkg in pkgutil.iter_modules(package_path, package_name + "."):
+            if not is_pkg:
+                submodules.append(module_name)
+                continue
 
-        for _, module_name, is_pkg in pkgutil.walk_packages(package_path, prefix):
-            if is_pkg:
-                sub_submodules = self._get_submodules(importlib.import_module(module_name))
-                submodules.extend(sub_submodules)
+            finder_path = getattr(finder, "path", None)
+            if finder_path is not None:
+                subpackage_path = [os.path.join(finder_path, module_name.rpartition(".")[2])]
             else:
-                submodules.append(module_name)
+                # Packages that aren't on the filesystem have to be imported to be walked.
+                subpackage_path = list(importlib.import_module(module_name).__path__)
+            submodules.extend(self._find_submodules(module_name, subpackage_path, directories))
 
         return submodules
 
+    def _load_manifest(self, filename):
+        """Load the tasks modules from a manifest, unless it's missing
+        or out of date.
+        """
+        try:
+            with open(filename) as f:
+                manifest = json.load(f)
+
+            if manifest.get("version") != MANIFEST_VERSION or \
+                    manifest["apps"] != [conf.name for conf in apps.get_app_configs()]:
+                return None
+
+            # Adding, removing or renaming a module changes the mtime of its directory.
+            for directory, mtime in manifest["directories"].items():
+                if os.stat(directory).st_mtime_ns != mtime:
+                    return None
+
+            return [(module, submodules) for module, submodules in manifest["modules"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _save_manifest(self, filename, found, directories):
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "apps": [conf.name for conf in apps.get_app_configs()],
+            "directories": {directory: os.stat(directory).st_mtime_ns for directory in directories},
+            "modules": found,
+        }
+
+        # The manifest is replaced atomically since many processes may start at once.
+        try:
+            fd, temp_filename = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(manifest, f)
+                os.replace(temp_filename, filename)
+            except BaseException:
+                os.unlink(temp_filename)
+                raise
+        except OSError as e:
+            self.stderr.write(" * Failed to write the tasks modules manifest: %s" % e)
+
+    def _write_timing(self, verbosity, description, started_at):
+        if verbosity >= 2:
+            self.stdout.write(" * %s in %.3fs" % (description, time.monotonic() - started_at))
+
     def _resolve_executable(self, exec_name):
         bin_dir = os.path.dirname(sys.executable)
         if bin_dir:
@@ -0,0 +1,58 @@
+import os
+import threading
+
+#: The upper bounds, in seconds, of the queue wait histogram buckets.
+QUEUE_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+_lock = threading.Lock()
+_queue_wait_seconds = None
+
+
+def get_queue_wait_seconds():
+    """Get the queue wait histogram, creating it on first use.
+
+    prometheus_client picks its storage when it's first imported, so it
+    isn't imported before dramatiq's Prometheus middleware switched it
+    to multiprocess mode on process boot.  In that mode, the histogram
+    is written to the database its exposition server serves.
+
+    Returns:
+      Histogram: The histogram, or None if prometheus_client isn't
+      installed.
+    """
+    global _queue_wait_seconds
+    if _queue_wait_seconds is not None:
+        return _queue_wait_seconds or None
+
+    with _lock:
+        if _queue_wait_seconds is None:
+            try:
+                import prometheus_client
+            except ImportError:  # pragma: no cover
+                _queue_wait_seconds = False
+                return None
+
+            if "prometheus_multiproc_dir" in os.environ or "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+                # Exported from the database rather than a registry.
+                registry = prometheus_client.CollectorRegistry()
+            else:
+                registry = prometheus_client.REGISTRY
+
+            _queue_wait_seconds = prometheus_client.Histogram(
+                "django_dramatiq_queue_wait_seconds",
+                "The time messages spent waiting in their queue before a worker started processing them.",
+                ["queue_name", "actor_name"],
+                buckets=QUEUE_WAIT_BUCKETS,
+                registry=registry,
+            )
+
+        return _queue_wait_seconds or None
+
+
+def observe_queue_wait(message, queue_wait):
+    """Export the queue wait of a message, if prometheus_client is
+    installed.
+    """
+    queue_wait_seconds = get_queue_wait_seconds()
+    if queue_wait_seconds is not None:
+        queue_wait_seconds.labels(message.queue_name, message.actor_name).observe(queue_wait)
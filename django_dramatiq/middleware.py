@@ -1,6 +1,7 @@
 import datetime
 import json
 import logging
+import os
 import socket
 import threading
 import time
@@ -8,38 +9,152 @@ from decimal import Decimal
 
 from compat import DjangoJSONEncoder
 from django import db
+from django.db.backends.signals import connection_created
+from django.utils.timezone import now
 from dramatiq.middleware import Middleware
 
-from django_dramatiq.utils import DateDecimalJSONEncoder
+from django_dramatiq.apps import DjangoDramatiqConfig
+from django_dramatiq.metrics import observe_queue_wait
+from django_dramatiq.policy import TrackingPolicy
+from django_dramatiq.rollups import RollupAccumulator
+from django_dramatiq.utils import current_rss, datetime_from_timestamp, dumps_arguments
+from django_dramatiq.writers import BufferedTaskWriter, DeferredTaskWriter, TaskWriter
 
 LOGGER = logging.getLogger("django_dramatiq.AdminMiddleware")
 
 # Workers can have multiple threads, but each thread has only one task at a time
 _actor_measurement = threading.local()
 
+# The serialized arguments of the last message each thread recorded
+_serialized_arguments = threading.local()
+
+# Set while django_dramatiq.bulk.send_many publishes messages whose Tasks it has already recorded
+_bulk_enqueue = threading.local()
+
 
 class AdminMiddleware(Middleware):
     """This middleware keeps track of task executions.
+
+    Parameters:
+      buffered(bool): Whether status updates should be buffered in
+        memory and written in bulk by a background thread instead of
+        being written synchronously by the worker thread.
+      buffer_size(int): The maximum number of buffered updates.
+      flush_interval(int): The maximum amount of time, in
+        milliseconds, a buffered update may wait before being written.
+      flush_batch_size(int): The maximum number of updates written in
+        a single batch.
+      enqueue_timeout(int): The maximum amount of time, in
+        milliseconds, to wait for room in a full buffer before an
+        update is dropped.
+      running_grace_period(int): When set, the "running" update is
+        held back for this many milliseconds and only written if the
+        message is still being processed by then, so that short tasks
+        go straight from enqueued to their final status.
+      policy(TrackingPolicy): Decides which messages are recorded.
+        Defaults to a policy built from the DRAMATIQ_TASKS_TRACKING
+        setting.
+      filter_choice_ttl(int): The amount of time, in seconds, this
+        process remembers having stored an actor, queue or hostname
+        as an admin filter choice before storing it again.
+      rollups(bool): Whether to accumulate per actor, queue and minute
+        runtime stats in memory and periodically merge them into the
+        TaskRollup table.  These are counted for sampled out messages
+        as well.
+      rollup_flush_interval(int): The amount of time, in milliseconds,
+        in between rollup flushes.
+      result_previews(bool): Whether to store the serialized results
+        of successful messages on their Tasks for the admin to show,
+        rather than having it query the result backend.
+      result_preview_size(int): The maximum length of a stored result
+        preview.  Longer results are truncated.
     """
 
+    def __init__(self, *, buffered=False, buffer_size=10000, flush_interval=250, flush_batch_size=500,
+                 enqueue_timeout=100, running_grace_period=None, policy=None, filter_choice_ttl=3600,
+                 rollups=False, rollup_flush_interval=10000, result_previews=False, result_preview_size=2000):
+        if policy is None:
+            policy = TrackingPolicy.from_settings(DjangoDramatiqConfig.tasks_tracking_settings())
+        self.policy = policy
+
+        if buffered:
+            self.writer = BufferedTaskWriter(
+                max_size=buffer_size,
+                flush_interval=flush_interval,
+                batch_size=flush_batch_size,
+                enqueue_timeout=enqueue_timeout,
+            )
+        else:
+            self.writer = TaskWriter()
+
+        if running_grace_period:
+            self.writer = DeferredTaskWriter(self.writer, delay=running_grace_period)
+
+        self.filter_choice_ttl = filter_choice_ttl
+        self._filter_choices_lock = threading.Lock()
+        self._filter_choices_seen = {}
+
+        self.rollups = None
+        if rollups:
+            self.rollups = RollupAccumulator(flush_interval=rollup_flush_interval)
+
+        self.result_previews = result_previews
+        self.result_preview_size = result_preview_size
+
     def after_enqueue(self, broker, message, delay):
+        # The Task is only stored once the message is published, so
+        # that failed publishes don't leave Tasks behind.  A worker may
+        # have finished it by then, but enqueue updates never overwrite
+        # its updates.
         from .models import Task
 
+        if getattr(_bulk_enqueue, "active", False) or not self.policy.should_record_enqueue(message, delay):
+            return
+
         LOGGER.debug("Creating Task from message %r.", message.message_id)
         status = Task.STATUS_ENQUEUED
         if delay:
             status = Task.STATUS_DELAYED
 
-        Task.tasks.create_or_update_from_message(message, status=status, actor_name=message.actor_name, queue_name=message.queue_name)
+        self.writer.write(message, **self._message_fields(message, status))
+        self._remember_filter_choices(message)
+
+    def record_enqueued(self, messages, delay=None):
+        """Record the Tasks for many messages that were enqueued
+        using a single bulk upsert.
+        """
+        from .models import Task
+
+        status = Task.STATUS_DELAYED if delay else Task.STATUS_ENQUEUED
+        messages = [message for message in messages if self.policy.should_record_enqueue(message, delay)]
+        Task.tasks.bulk_create_or_update_from_messages(
+            (message, self._message_fields(message, status))
+            for message in messages
+        )
+        for message in messages:
+            self._remember_filter_choices(message)
 
     def before_process_message(self, broker, message):
         from .models import Task
 
-        LOGGER.debug("Updating Task from message %r.", message.message_id)
-        hostname = socket.gethostname()
-        self._create_or_update_from_message(message, status=Task.STATUS_RUNNING, worker_hostname=hostname)
+        # Delayed messages only start waiting for a worker once their eta is up.
+        started_at = time.time() * 1000
+        queue_wait = max(started_at - message.options.get("eta", message.message_timestamp), 0) / 1000
+        observe_queue_wait(message, queue_wait)
+        timings = dict(started_at=datetime_from_timestamp(started_at), queue_wait=queue_wait)
+
+        if self.policy.should_record_processing(message):
+            LOGGER.debug("Updating Task from message %r.", message.message_id)
+            if isinstance(self.writer, DeferredTaskWriter):
+                fields = self._processing_fields(message, status=Task.STATUS_RUNNING, **timings)
+                self.writer.defer(message, **fields)
+                self._remember_filter_choices(message, fields["worker_hostname"])
+            else:
+                self._create_or_update_from_message(message, status=Task.STATUS_RUNNING, **timings)
         _actor_measurement.current_message_id = message.message_id
         _actor_measurement.start = time.monotonic()
+        # Written again with the result, in case the "running" update isn't.
+        _actor_measurement.timings = timings
 
     def after_skip_message(self, broker, message):
         from .models import Task
@@ -57,37 +172,234 @@ class AdminMiddleware(Middleware):
 
             LOGGER.debug("Updating Task from message %r.", message.message_id)
             # Temporary check
-            runtime = None
+            runtime, timings = None, {}
             if _actor_measurement.current_message_id == message.message_id:
                 runtime = time.monotonic() - _actor_measurement.start
+                timings = _actor_measurement.timings
             else:
                 # We can get here if other middlewares failed in before_process_message handler
                 if not exception:
                     LOGGER.error("_actor_measurement.current_message_id (%r) != message.message_id (%r)", _actor_measurement.current_message_id, message.message_id)
-            self._create_or_update_from_message(message, status=status, runtime=runtime)
+            if isinstance(self.writer, DeferredTaskWriter):
+                self.writer.cancel(message.message_id)
+            if self.policy.should_record_result(message, failed=status == Task.STATUS_FAILED):
+                fields = dict(timings, runtime=runtime, finished_at=datetime_from_timestamp(time.time() * 1000))
+                if self.result_previews and status == Task.STATUS_DONE:
+                    fields["result_preview"] = self._preview_result(result)
+                self._create_or_update_from_message(message, status=status, **fields)
+            if self.rollups is not None and runtime is not None and status != Task.STATUS_SKIPPED \
+                    and self.policy.get_sample_rate(message) is not None:
+                self.rollups.add(message.actor_name, message.queue_name, runtime, failed=status == Task.STATUS_FAILED)
         finally:
             _actor_measurement.current_message_id = None
             _actor_measurement.start = None
+            _actor_measurement.timings = None
+
+    def after_worker_shutdown(self, broker, worker):
+        # Worker threads finish their in-flight messages after
+        # before_worker_shutdown, so their final updates are only all
+        # buffered by now.
+        self.writer.close()
+        if self.rollups is not None:
+            self.rollups.close()
 
-    @classmethod
     def _create_or_update_from_message(self, message, status, **kwargs):
-        from .models import Task
-        Task.tasks.create_or_update_from_message(message, status=status,
-                                                 actor_name=message.actor_name,
-                                                 queue_name=message.queue_name,
-                                                 args=json.dumps(message.args, cls=DateDecimalJSONEncoder, separators=(',', ':')) if message.args else None,
-                                                 kwargs=json.dumps(message.kwargs, cls=DateDecimalJSONEncoder, separators=(',', ':')) if message.kwargs else None,
-                                                 **kwargs)
+        fields = self._processing_fields(message, status, **kwargs)
+        self.writer.write(message, **fields)
+        self._remember_filter_choices(message, fields["worker_hostname"])
+
+    def _remember_filter_choices(self, message, worker_hostname=None):
+        """Store the actor, queue and host of a recorded message as
+        admin filter choices, unless this process already did so within
+        the last `filter_choice_ttl` seconds.
+        """
+        from .models import TaskFilterChoice
+
+        choices = [
+            (TaskFilterChoice.KIND_ACTOR_NAME, message.actor_name),
+            (TaskFilterChoice.KIND_QUEUE_NAME, message.queue_name),
+        ]
+        if worker_hostname is not None:
+            choices.append((TaskFilterChoice.KIND_WORKER_HOSTNAME, worker_hostname))
+
+        current_time = time.monotonic()
+        with self._filter_choices_lock:
+            stale = []
+            for choice in choices:
+                seen_at = self._filter_choices_seen.get(choice)
+                if seen_at is None or current_time - seen_at >= self.filter_choice_ttl:
+                    stale.append(choice)
+            for choice in stale:
+                self._filter_choices_seen[choice] = current_time
+
+        if not stale:
+            return
+
+        try:
+            TaskFilterChoice.objects.touch(stale)
+        except Exception:
+            LOGGER.exception("Failed to store Task filter choices.")
+            with self._filter_choices_lock:
+                for choice in stale:
+                    self._filter_choices_seen.pop(choice, None)
+
+    def _processing_fields(self, message, status, **kwargs):
+        # The hostname is written along with every processing update so
+        # that it's stored even when the "running" update is skipped.
+        return self._message_fields(message, status, worker_hostname=socket.gethostname(), **kwargs)
+
+    def _serialize_arguments(self, message):
+        # A message's arguments never change, so the ones serialized
+        # for its "running" update are reused for its result.
+        cached = getattr(_serialized_arguments, "value", None)
+        if cached is not None and cached[0] == message.message_id:
+            return cached[1]
+
+        serialized = (
+            dumps_arguments(message.args) if message.args else None,
+            dumps_arguments(message.kwargs) if message.kwargs else None,
+        )
+        _serialized_arguments.value = (message.message_id, serialized)
+        return serialized
+
+    def _preview_result(self, result):
+        try:
+            preview = dumps_arguments(result)
+        except (TypeError, ValueError):
+            # Results that can't be serialized can't be stored by result
+            # backends either, but they can still be shown.
+            preview = repr(result)
+
+        if len(preview) > self.result_preview_size:
+            preview = preview[:self.result_preview_size - 1] + "\u2026"
+        return preview
+
+    def _message_fields(self, message, status, **kwargs):
+        # Everything the admin changelist shows is stored in its own
+        # column so that it never has to decode message_data.
+        eta = message.options.get("eta")
+        serialized_args, serialized_kwargs = self._serialize_arguments(message)
+        return dict(status=status,
+                    actor_name=message.actor_name,
+                    queue_name=message.queue_name,
+                    args=serialized_args,
+                    kwargs=serialized_kwargs,
+                    eta=datetime_from_timestamp(eta) if eta is not None else None,
+                    enqueued_at=datetime_from_timestamp(message.message_timestamp),
+                    **kwargs)
+
+
+def _open_connections():
+    """Get the database connections the current thread has opened.
+    """
+    return [connection for connection in db.connections.all() if connection.connection is not None]
+
 
 class DbConnectionsMiddleware(Middleware):
     """This middleware cleans up db connections on worker shutdown.
+
+    By default, connections that are unusable or older than their
+    CONN_MAX_AGE are closed before and after every message.
+
+    Parameters:
+      check_interval(int): When set, each worker thread checks its
+        connections at most once per this many milliseconds before
+        processing a message, and after messages only checks the
+        connections a database error occurred on.  Only the connections
+        the thread has opened are checked.
+      ping(bool): Whether periodic checks make sure connections are
+        still alive, rather than only checking the ones a database
+        error occurred on.
+      persistent(bool): Whether connections are kept open past their
+        CONN_MAX_AGE, and only closed once they're unusable.
     """
 
+    def __init__(self, *, check_interval=None, ping=False, persistent=False):
+        self.check_interval = check_interval / 1000 if check_interval is not None else None
+        self.ping = ping
+        self.persistent = persistent
+
+        self._last_check = threading.local()
+        self._closed = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"checks": 0, "closed": 0, "reconnects": 0, "seconds": 0.0}
+        connection_created.connect(self._count_reconnect)
+
+    def stats(self):
+        """Get the number of connection checks, of connections closed
+        by them, of connections opened again after that and the time
+        spent checking, in seconds.
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count_reconnect(self, sender, connection, **kwargs):
+        # Connections are created in the thread that uses them.
+        aliases = getattr(self._closed, "aliases", None)
+        if aliases and connection.alias in aliases:
+            aliases.discard(connection.alias)
+            with self._stats_lock:
+                self._stats["reconnects"] += 1
+
+    def before_process_message(self, broker, message):
+        if self.check_interval is None:
+            return self._close_old_connections()
+
+        current_time = time.monotonic()
+        last_check = getattr(self._last_check, "value", None)
+        if last_check is None or current_time - last_check >= self.check_interval:
+            self._last_check.value = current_time
+            self._check_connections(ping=self.ping)
+
+    def after_process_message(self, broker, message, *, result=None, exception=None):
+        if self.check_interval is None:
+            return self._close_old_connections()
+
+        # Connections are only checked if something went wrong with them.
+        self._check_connections(errors_only=True)
+
     def _close_old_connections(self, *args, **kwargs):
+        started_at = time.monotonic()
+        connections = _open_connections()
         db.close_old_connections()
+        self._record_check(started_at, [connection for connection in connections if connection.connection is None])
+
+    def _check_connections(self, *, ping=False, errors_only=False):
+        started_at, closed = time.monotonic(), []
+        for connection in _open_connections():
+            if errors_only and not connection.errors_occurred:
+                continue
+
+            if self._is_unusable_or_obsolete(connection, ping):
+                connection.close()
+                closed.append(connection)
+
+        self._record_check(started_at, closed)
 
-    before_process_message = _close_old_connections
-    after_process_message = _close_old_connections
+    def _is_unusable_or_obsolete(self, connection, ping):
+        # This follows BaseDatabaseWrapper.close_if_unusable_or_obsolete.
+        if connection.get_autocommit() != connection.settings_dict["AUTOCOMMIT"]:
+            return True
+
+        if connection.errors_occurred or ping:
+            if not connection.is_usable():
+                return True
+            connection.errors_occurred = False
+
+        if not self.persistent and connection.close_at is not None and time.monotonic() >= connection.close_at:
+            return True
+        return False
+
+    def _record_check(self, started_at, closed):
+        if closed:
+            if not hasattr(self._closed, "aliases"):
+                self._closed.aliases = set()
+            self._closed.aliases.update(connection.alias for connection in closed)
+
+        with self._stats_lock:
+            self._stats["checks"] += 1
+            self._stats["closed"] += len(closed)
+            self._stats["seconds"] += time.monotonic() - started_at
 
     def _close_connections(self, *args, **kwargs):
         db.connections.close_all()
@@ -95,3 +407,100 @@ class DbConnectionsMiddleware(Middleware):
     before_consumer_thread_shutdown = _close_connections
     before_worker_thread_shutdown = _close_connections
     before_worker_shutdown = _close_connections
+
+
+class WorkerHeartbeatMiddleware(Middleware):
+    """This middleware periodically publishes a heartbeat for each
+    worker process from a background thread, holding the messages it's
+    processing, how many it processed and failed and its memory usage.
+
+    Parameters:
+      interval(int): The amount of time, in milliseconds, in between
+        heartbeats.
+    """
+
+    def __init__(self, *, interval=10000):
+        self.interval = interval / 1000
+
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._threads = 0
+        self._in_flight = set()
+        self._processed = 0
+        self._failed = 0
+        self._started_at = now()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def after_worker_boot(self, broker, worker):
+        if self._pid != os.getpid():
+            # The process was forked, so its counts start over.
+            self._reset()
+
+        self._threads = worker.worker_threads
+        self._thread = threading.Thread(target=self._run, name="WorkerHeartbeat", daemon=True)
+        self._thread.start()
+
+    def before_process_message(self, broker, message):
+        with self._lock:
+            self._in_flight.add(message.message_id)
+
+    def after_process_message(self, broker, message, *, result=None, exception=None):
+        with self._lock:
+            self._in_flight.discard(message.message_id)
+            self._processed += 1
+            self._failed += exception is not None
+
+    def after_skip_message(self, broker, message):
+        with self._lock:
+            self._in_flight.discard(message.message_id)
+
+    def before_worker_shutdown(self, broker, worker):
+        from .models import DATABASE_LABEL, WorkerHeartbeat
+
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+
+        self._stop.set()
+        thread.join()
+        self._thread = None
+        try:
+            WorkerHeartbeat.objects.using(DATABASE_LABEL).filter(hostname=socket.gethostname(), pid=self._pid).delete()
+        except Exception:
+            LOGGER.exception("Failed to remove the worker heartbeat.")
+
+    def beat(self):
+        """Publish a heartbeat for the current process.
+        """
+        from .models import WorkerHeartbeat
+
+        with self._lock:
+            in_flight = sorted(self._in_flight)
+            processed, failed = self._processed, self._failed
+
+        WorkerHeartbeat.objects.beat(
+            socket.gethostname(), self._pid,
+            started_at=self._started_at,
+            threads=self._threads,
+            in_flight=json.dumps(in_flight),
+            processed=processed,
+            failed=failed,
+            rss=current_rss(),
+        )
+
+    def _run(self):
+        try:
+            while True:
+                db.close_old_connections()
+                try:
+                    self.beat()
+                except Exception:
+                    LOGGER.exception("Failed to publish the worker heartbeat.")
+                if self._stop.wait(self.interval):
+                    break
+        finally:
+            db.connections.close_all()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from django_dramatiq.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are created concurrently on PostgreSQL, which can't happen in a transaction.
+    atomic = False
+
+    dependencies = [
+        ('django_dramatiq', '0005_auto_20200207_1208'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['status', 'updated_at'], name='django_dram_status_7e2e6f_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['queue_name', 'updated_at'], name='django_dram_queue_n_c2764f_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['actor_name', 'updated_at'], name='django_dram_actor_n_75d8b8_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['worker_hostname', 'updated_at'], name='django_dram_worker__876b95_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['created_at'], name='django_dram_created_fd64f6_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_dramatiq', '0006_task_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='eta',
+            field=models.DateTimeField(verbose_name='ETA', null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='message_timestamp',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def populate_filter_choices(apps, schema_editor):
+    Task = apps.get_model('django_dramatiq', 'Task')
+    TaskFilterChoice = apps.get_model('django_dramatiq', 'TaskFilterChoice')
+    db_alias = schema_editor.connection.alias
+    for kind in ('actor_name', 'queue_name', 'worker_hostname'):
+        values = (
+            Task.objects.using(db_alias)
+            .exclude(**{kind: None})
+            .order_by()
+            .values_list(kind, flat=True)
+            .distinct()
+        )
+        TaskFilterChoice.objects.using(db_alias).bulk_create(
+            TaskFilterChoice(kind=kind, value=value) for value in values
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_dramatiq', '0007_task_eta_message_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskFilterChoice',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('actor_name', 'Actor name'), ('queue_name', 'Queue name'), ('worker_hostname', 'Worker hostname')], max_length=15)),
+                ('value', models.CharField(max_length=300)),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['kind', 'value'],
+                'unique_together': {('kind', 'value')},
+            },
+        ),
+        migrations.RunPython(populate_filter_choices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_dramatiq', '0008_taskfilterchoice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actor_name', models.CharField(max_length=300)),
+                ('queue_name', models.CharField(max_length=100)),
+                ('bucket', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('failures', models.PositiveIntegerField(default=0)),
+                ('runtime_sum', models.FloatField(default=0)),
+                ('runtime_min', models.FloatField(null=True)),
+                ('runtime_max', models.FloatField(null=True)),
+                ('histogram', models.TextField(default='[]', help_text='runtime counts per histogram bucket, as JSON')),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'unique_together': {('actor_name', 'queue_name', 'bucket')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='taskrollup',
+            index=models.Index(fields=['bucket'], name='django_dram_bucket_a30610_idx'),
+        ),
+    ]
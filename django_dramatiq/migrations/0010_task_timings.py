@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from django_dramatiq.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are created concurrently on PostgreSQL, which can't happen in a transaction.
+    atomic = False
+
+    dependencies = [
+        ('django_dramatiq', '0009_taskrollup'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='task',
+            old_name='message_timestamp',
+            new_name='enqueued_at',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='started_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='finished_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='queue_wait',
+            field=models.FloatField(help_text='in seconds, from when the message could be processed until it was', null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['enqueued_at'], name='django_dram_enqueue_d7c7c6_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['started_at'], name='django_dram_started_860020_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['finished_at'], name='django_dram_finishe_5c9ae9_idx'),
+        ),
+    ]
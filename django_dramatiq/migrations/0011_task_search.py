@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from django_dramatiq import search
+
+
+def install_search(apps, schema_editor):
+    connection = schema_editor.connection
+    if search.is_enabled() and search.is_supported(connection):
+        Task = apps.get_model('django_dramatiq', 'Task')
+        search.install(connection, Task._meta.db_table)
+
+
+def uninstall_search(apps, schema_editor):
+    connection = schema_editor.connection
+    if search.is_supported(connection):
+        Task = apps.get_model('django_dramatiq', 'Task')
+        search.uninstall(connection, Task._meta.db_table)
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are created concurrently on PostgreSQL, which can't happen in a transaction.
+    atomic = False
+
+    dependencies = [
+        ('django_dramatiq', '0010_task_timings'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
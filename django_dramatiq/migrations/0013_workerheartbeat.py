@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_dramatiq', '0012_task_result_preview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerHeartbeat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hostname', models.CharField(max_length=300)),
+                ('pid', models.PositiveIntegerField()),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('threads', models.PositiveIntegerField(default=0)),
+                ('in_flight', models.TextField(default='[]', help_text='the IDs of the messages being processed, as JSON')),
+                ('processed', models.BigIntegerField(default=0)),
+                ('failed', models.BigIntegerField(default=0)),
+                ('rss', models.BigIntegerField(help_text='in bytes', null=True)),
+            ],
+            options={
+                'ordering': ['hostname', 'pid'],
+                'unique_together': {('hostname', 'pid')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='workerheartbeat',
+            index=models.Index(fields=['last_seen'], name='django_dram_last_se_06a375_idx'),
+        ),
+    ]
@@ -1,31 +1,404 @@
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import timedelta
 
-from django.db import models
+import dramatiq
+from django.db import IntegrityError, connections, models, transaction
 from django.utils.functional import cached_property
 from django.utils.timezone import now
 from dramatiq import Message
 
+from . import partitioning
 from .apps import DjangoDramatiqConfig
+from .compression import compress, decompress
 
 #: The database label to use when storing task metadata.
 DATABASE_LABEL = DjangoDramatiqConfig.tasks_database()
 
+LOGGER = logging.getLogger("django_dramatiq.TaskManager")
+
+
+def _has_native_upsert(connection):
+    """Whether `connection` can run INSERT ... ON CONFLICT DO UPDATE.
+    """
+    if connection.vendor == "postgresql":
+        return True
+    if connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= (3, 24, 0)
+    return False
+
+
+def _supports_upsert(connection):
+    """Whether Tasks can be upserted on `connection`.
+    """
+    if connection.vendor == "postgresql":
+        # Once the table is partitioned by created_at, there is no
+        # unique index on id alone for ON CONFLICT to target.
+        return not _is_partitioned(connection)
+    return _has_native_upsert(connection)
+
+
+def _is_partitioned(connection):
+    """Whether the Task table is partitioned, checked once per
+    database connection.
+    """
+    cached = getattr(connection, "_dramatiq_tasks_partitioned", None)
+    if cached is not None and cached[0] is connection.connection:
+        return cached[1]
+
+    partitioned = partitioning.is_partitioned(connection, Task._meta.db_table)
+    connection._dramatiq_tasks_partitioned = (connection.connection, partitioned)
+    return partitioned
+
+
+@contextmanager
+def _message_lock(connection, message_id):
+    """Serialize the writes for a message that don't go through an
+    upsert.  On PostgreSQL, the Task table is partitioned by then and
+    its primary key includes created_at, so concurrent writes could
+    each find no Task and insert one, in different partitions even.
+    """
+    if connection.vendor != "postgresql":
+        yield
+        return
+
+    with transaction.atomic(using=DATABASE_LABEL):
+        with connection.cursor() as cursor:
+            # Advisory lock keys are signed 64 bit integers.
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [uuid.UUID(str(message_id)).int >> 65])
+        yield
+
+
+def encode_message_data(message):
+    """Encode a message for the message_data column, compressing it
+    as configured by the DRAMATIQ_TASKS_STORAGE setting.
+    """
+    storage_settings = DjangoDramatiqConfig.tasks_storage_settings()
+    data = message.encode()
+    codec = storage_settings.get("COMPRESSION", "zlib")
+    if codec and len(data) >= storage_settings.get("COMPRESSION_MIN_SIZE", 1024):
+        return compress(data, codec, storage_settings.get("COMPRESSION_LEVEL"))
+    return data
+
+
+def _updates_message_data(extra_fields):
+    if DjangoDramatiqConfig.tasks_storage_settings().get("UPDATE_MESSAGE_DATA", True):
+        return True
+    # Failed messages carry their traceback in their options.
+    return extra_fields.get("status") == Task.STATUS_FAILED
+
+
+def _is_first_enqueue(message, extra_fields):
+    """Whether `extra_fields` record a message being enqueued for the
+    first time.  Those updates are written by the sender, unordered
+    with respect to the ones written by the worker that processes the
+    message, so they mustn't overwrite a Task that's further along.
+    Retries are enqueued by that worker, in order.
+    """
+    enqueued = extra_fields.get("status") in (Task.STATUS_ENQUEUED, Task.STATUS_DELAYED)
+    return enqueued and not message.options.get("retries")
+
 
 class TaskManager(models.Manager):
     def create_or_update_from_message(self, message, **extra_fields):
-        task, _ = self.using(DATABASE_LABEL).update_or_create(
-            id=message.message_id,
-            defaults={
-                "message_data": message.encode(),
-                **extra_fields,
-            }
-        )
+        """Create or update the Task for `message` in one statement on
+        backends that support native upserts.
+
+        Only the columns in `extra_fields` (plus `message_data` and
+        `updated_at`) are overwritten when the Task already exists.
+        `message_data` is only overwritten for failed messages when the
+        UPDATE_MESSAGE_DATA storage setting is off.  Messages enqueued
+        for the first time only overwrite Tasks that are still enqueued,
+        delayed or lost.
+        On the native path, the returned Task only has those fields
+        populated.  On partitioned tables, the Task is looked up across
+        partitions while holding a lock on its message before it's
+        inserted, so that it's never stored twice.
+        """
+        connection = connections[DATABASE_LABEL]
+        if not _supports_upsert(connection):
+            with _message_lock(connection, message.message_id):
+                return self._create_or_update_from_message(message, **extra_fields)
+
+        rows = self._upsert(connection, [(message, extra_fields)])
+        task = self.model(id=message.message_id, **rows[message.message_id])
+        task._state.adding = False
+        task._state.db = DATABASE_LABEL
+        return task
+
+    def _create_or_update_from_message(self, message, **extra_fields):
+        defaults = {"message_data": encode_message_data(message), **extra_fields}
+        first_enqueue = _is_first_enqueue(message, extra_fields)
+        if _updates_message_data(extra_fields) and not first_enqueue:
+            task, _ = self.using(DATABASE_LABEL).update_or_create(id=message.message_id, defaults=defaults)
+            return task
+
+        task, created = self.using(DATABASE_LABEL).get_or_create(id=message.message_id, defaults=defaults)
+        if not created:
+            fields = defaults if _updates_message_data(extra_fields) else extra_fields
+            queryset = self.using(DATABASE_LABEL).filter(pk=task.pk)
+            if first_enqueue:
+                queryset = queryset.filter(status__in=Task.ENQUEUEABLE_STATUSES)
+            if queryset.update(updated_at=now(), **fields):
+                for name, value in fields.items():
+                    setattr(task, name, value)
         return task
 
-    def delete_old_tasks(self, max_task_age):
-        self.using(DATABASE_LABEL).filter(
-            created_at__lte=now() - timedelta(seconds=max_task_age)
+    def bulk_create_or_update_from_messages(self, messages):
+        """Create or update the Tasks for many messages at once.
+
+        Parameters:
+          messages(iterable[tuple[Message, dict]]): Pairs of messages
+            and the extra fields to store for them.  Later updates for
+            the same message override earlier ones.
+
+        Returns:
+          int: The number of Tasks written.
+        """
+        connection = connections[DATABASE_LABEL]
+        if _supports_upsert(connection):
+            with transaction.atomic(using=DATABASE_LABEL, savepoint=False):
+                return len(self._upsert(connection, messages))
+
+        if connection.vendor == "postgresql":
+            # Message locks are held until the end of the transaction,
+            # so they're taken in a consistent order.
+            messages = sorted(messages, key=lambda item: item[0].message_id)
+
+        with transaction.atomic(using=DATABASE_LABEL, savepoint=False):
+            ids = set()
+            for message, extra_fields in messages:
+                self.create_or_update_from_message(message, **extra_fields)
+                ids.add(message.message_id)
+            return len(ids)
+
+    def _upsert(self, connection, messages):
+        rows, updates_data, first_enqueues = OrderedDict(), set(), set()
+        for message, extra_fields in messages:
+            fields = rows.pop(message.message_id, {})
+            fields.update(message_data=encode_message_data(message), **extra_fields)
+            rows[message.message_id] = fields
+            if _updates_message_data(extra_fields):
+                updates_data.add(message.message_id)
+            if _is_first_enqueue(message, fields):
+                first_enqueues.add(message.message_id)
+            else:
+                first_enqueues.discard(message.message_id)
+
+        # Rows that update the same columns can share a statement.
+        groups = OrderedDict()
+        for message_id, fields in rows.items():
+            names = tuple(sorted(name for name in fields if name != "message_data" or message_id in updates_data))
+            groups.setdefault((names, message_id in first_enqueues), []).append((message_id, fields))
+
+        # Every column is inserted, the ones that weren't passed in
+        # get their defaults, but only the passed ones are updated.
+        opts = self.model._meta
+        leading = [opts.pk, opts.get_field("created_at"), opts.get_field("updated_at")]
+        fields = leading + [field for field in opts.concrete_fields if field not in leading]
+        defaults = {field.name: field.get_default() for field in fields[len(leading):]}
+        batch_size = max(connection.ops.bulk_batch_size(fields, rows), 1)
+
+        timestamp = now()
+        with connection.cursor() as cursor:
+            for (names, first_enqueue), group in groups.items():
+                sql = None
+                for offset in range(0, len(group), batch_size):
+                    batch = group[offset:offset + batch_size]
+                    params = []
+                    for message_id, row in batch:
+                        row = {**defaults, **row, "id": message_id, "created_at": timestamp, "updated_at": timestamp}
+                        params.extend(field.get_db_prep_save(row[field.name], connection) for field in fields)
+
+                    if sql is None or len(batch) < batch_size:
+                        sql = self._upsert_sql(
+                            connection, fields, ("updated_at", *names), len(batch), first_enqueue=first_enqueue,
+                        )
+                    cursor.execute(sql, params)
+
+        return rows
+
+    def _upsert_sql(self, connection, fields, update_names, count, *, first_enqueue=False):
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        placeholders = "(%s)" % ", ".join(["%s"] * len(fields))
+        updates = ", ".join(
+            "%s = EXCLUDED.%s" % (qn(column), qn(column))
+            for column in (opts.get_field(name).column for name in update_names)
+        )
+        sql = "INSERT INTO %s (%s) VALUES %s ON CONFLICT (%s) DO UPDATE SET %s" % (
+            qn(opts.db_table),
+            ", ".join(qn(field.column) for field in fields),
+            ", ".join([placeholders] * count),
+            qn(opts.pk.column),
+            updates,
+        )
+        if first_enqueue:
+            sql += " WHERE %s.%s IN (%s)" % (
+                qn(opts.db_table),
+                qn(opts.get_field("status").column),
+                ", ".join("'%s'" % status for status in Task.ENQUEUEABLE_STATUSES),
+            )
+        return sql
+
+    def delete_old_tasks(self, max_task_age, *, max_task_age_by_status=None, max_task_age_by_queue=None,
+                         batch_size=10000, sleep=0):
+        """Delete Tasks that are older than `max_task_age` seconds.
+
+        Tasks are deleted by primary key in batches of `batch_size`,
+        sleeping for `sleep` seconds in between batches, so that no
+        single statement holds locks for long.
+
+        Parameters:
+          max_task_age(int): The default maximum age of Tasks, in seconds.
+          max_task_age_by_status(dict[str, int]): Maximum ages for
+            Tasks with particular statuses.
+          max_task_age_by_queue(dict[str, int]): Maximum ages for
+            Tasks on particular queues.  These take precedence over
+            the ones by status.
+
+        Returns:
+          dict: The number of deleted Tasks, the time it took in
+          seconds and the resulting rate of deleted Tasks per second.
+        """
+        by_status = max_task_age_by_status or {}
+        by_queue = max_task_age_by_queue or {}
+
+        current_time = now()
+
+        def older_than(age):
+            return models.Q(created_at__lte=current_time - timedelta(seconds=age))
+
+        rules = [older_than(age) & models.Q(queue_name=queue_name) for queue_name, age in by_queue.items()]
+        other_queues = ~models.Q(queue_name__in=by_queue) if by_queue else models.Q()
+        rules += [older_than(age) & models.Q(status=status) & other_queues for status, age in by_status.items()]
+        other_statuses = ~models.Q(status__in=by_status) if by_status else models.Q()
+        rules.append(older_than(max_task_age) & other_queues & other_statuses)
+
+        tasks = self.using(DATABASE_LABEL).order_by()
+        deleted, started_at = 0, time.monotonic()
+        for rule in rules:
+            while True:
+                pks = list(tasks.filter(rule).values_list("pk", flat=True)[:batch_size])
+                if pks:
+                    deleted += tasks.filter(pk__in=pks).delete()[0]
+                if len(pks) < batch_size:
+                    break
+                if sleep:
+                    time.sleep(sleep)
+
+        # Filter choices outlive the Tasks they were seen in.
+        max_age = max([max_task_age, *by_status.values(), *by_queue.values()])
+        TaskFilterChoice.objects.using(DATABASE_LABEL).filter(
+            last_seen__lte=current_time - timedelta(seconds=max_age),
         ).delete()
+        # So do the heartbeats of workers that were killed.
+        WorkerHeartbeat.objects.stale(max_age).delete()
+
+        elapsed = time.monotonic() - started_at
+        stats = {"deleted": deleted, "elapsed": elapsed, "rate": deleted / elapsed if elapsed else 0}
+        LOGGER.info("Deleted %(deleted)d tasks in %(elapsed).2f seconds (%(rate).1f tasks/s).", stats)
+        return stats
+
+    def reap_orphaned_tasks(self, *, heartbeat_timeout=60, time_limits=None, default_time_limit=None,
+                            requeue=False, requeue_after=600, batch_size=1000):
+        """Mark the Tasks that are stuck running because their worker
+        died as lost.  A running Task is lost if it wasn't updated in
+        the last `heartbeat_timeout` seconds and either:
+
+          * its worker's host publishes heartbeats, none of the live
+            ones listing it as in flight, or
+          * it's been running for longer than its actor's time limit.
+
+        A worker that is only stalled, by a long GC pause or a blocked
+        database for example, looks just like a dead one, so lost Tasks
+        are only requeued once that has been the case for another
+        `requeue_after` seconds: the stale heartbeats of their worker's
+        host are at least that old or, on hosts without heartbeats,
+        they've been running for that much longer than their time
+        limit.  Until then, they're left running when `requeue` is set.
+
+        Candidates are found through the (status, updated_at) index
+        and marked in batches.
+
+        Parameters:
+          heartbeat_timeout(int): The amount of time, in seconds, after
+            which a worker that stopped publishing heartbeats is dead.
+          time_limits(dict[str, int]): Time limits per actor name, in
+            milliseconds.
+          default_time_limit(int): The time limit, in milliseconds, of
+            the actors missing from `time_limits`, or None for no limit.
+          requeue(bool): Whether to enqueue the messages of lost Tasks
+            again.
+          requeue_after(int): The amount of time, in seconds, a Task
+            must have been lost for before it's requeued.
+          batch_size(int): The number of Tasks marked per statement.
+
+        Returns:
+          dict: The number of lost and requeued Tasks.
+        """
+        time_limits = time_limits or {}
+        current_time = now()
+        heartbeats = WorkerHeartbeat.objects.using(DATABASE_LABEL).values_list("hostname", "last_seen", "in_flight")
+        monitored_hosts, stalled_since, in_flight = set(), {}, set()
+        for hostname, last_seen, message_ids in heartbeats:
+            monitored_hosts.add(hostname)
+            if last_seen >= current_time - timedelta(seconds=heartbeat_timeout):
+                in_flight.update(json.loads(message_ids))
+            else:
+                stalled_since[hostname] = max(last_seen, stalled_since.get(hostname, last_seen))
+
+        def lost_since(actor_name, worker_hostname, updated_at):
+            # The time since which the Task may have been lost, or None if it's still running.
+            if worker_hostname in monitored_hosts:
+                return max(stalled_since.get(worker_hostname, updated_at), updated_at)
+
+            time_limit = time_limits.get(actor_name, default_time_limit)
+            if time_limit is None or updated_at > current_time - timedelta(milliseconds=time_limit):
+                return None
+            return updated_at + timedelta(milliseconds=time_limit)
+
+        def is_lost(task_id, actor_name, worker_hostname, updated_at):
+            if str(task_id) in in_flight:
+                return False
+
+            since = lost_since(actor_name, worker_hostname, updated_at)
+            if since is None:
+                return False
+            return not requeue or since <= current_time - timedelta(seconds=requeue_after)
+
+        candidates = (
+            self.using(DATABASE_LABEL)
+            .filter(status=Task.STATUS_RUNNING, updated_at__lte=current_time - timedelta(seconds=heartbeat_timeout))
+            .order_by("pk")
+            .values_list("id", "actor_name", "worker_hostname", "updated_at")
+        )
+        queryset = self.using(DATABASE_LABEL).filter(status=Task.STATUS_RUNNING)
+        stats, last_pk = {"lost": 0, "requeued": 0}, None
+        while True:
+            # Candidates that aren't lost stay running, so they're paged
+            # through by primary key rather than selected again.
+            page = candidates if last_pk is None else candidates.filter(pk__gt=last_pk)
+            rows = list(page[:batch_size])
+            pks = [row[0] for row in rows if is_lost(*row)]
+            if pks:
+                stats["lost"] += queryset.filter(pk__in=pks).update(status=Task.STATUS_LOST, updated_at=now())
+                if requeue:
+                    # The admin middleware marks them as enqueued again.
+                    for task in self.using(DATABASE_LABEL).filter(pk__in=pks, status=Task.STATUS_LOST):
+                        dramatiq.get_broker().enqueue(task.message)
+                        stats["requeued"] += 1
+
+            if len(rows) < batch_size:
+                break
+            last_pk = rows[-1][0]
+
+        LOGGER.info("Found %(lost)d lost tasks and requeued %(requeued)d of them.", stats)
+        return stats
 
 
 class Task(models.Model):
@@ -35,6 +408,7 @@ class Task(models.Model):
     STATUS_FAILED = "failed"
     STATUS_DONE = "done"
     STATUS_SKIPPED = "skipped"
+    STATUS_LOST = "lost"
     STATUSES = [
         (STATUS_ENQUEUED, "Enqueued"),
         (STATUS_DELAYED, "Delayed"),
@@ -42,8 +416,13 @@ class Task(models.Model):
         (STATUS_FAILED, "Failed"),
         (STATUS_DONE, "Done"),
         (STATUS_SKIPPED, "Skipped"),
+        (STATUS_LOST, "Lost"),
     ]
 
+    #: The statuses of the Tasks a message being enqueued for the first
+    #: time may overwrite.  Lost Tasks are enqueued again on purpose.
+    ENQUEUEABLE_STATUSES = (STATUS_ENQUEUED, STATUS_DELAYED, STATUS_LOST)
+
     id = models.UUIDField(primary_key=True, editable=False)
     status = models.CharField(max_length=8, choices=STATUSES, default=STATUS_ENQUEUED)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -56,17 +435,312 @@ class Task(models.Model):
     worker_hostname = models.CharField(max_length=300, null=True)
     args = models.TextField(verbose_name='Arguments', null=True)
     kwargs = models.TextField(verbose_name='Keyword arguments', null=True)
+    eta = models.DateTimeField(verbose_name='ETA', null=True)
+    enqueued_at = models.DateTimeField(null=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    queue_wait = models.FloatField(
+        null=True, help_text='in seconds, from when the message could be processed until it was',
+    )
+    result_preview = models.TextField(null=True, help_text='the serialized result, truncated')
 
     tasks = TaskManager()
 
     class Meta:
         ordering = ["-updated_at"]
+        indexes = [
+            # The admin changelist filters by these and orders by -updated_at.
+            models.Index(fields=["status", "updated_at"]),
+            models.Index(fields=["queue_name", "updated_at"]),
+            models.Index(fields=["actor_name", "updated_at"]),
+            models.Index(fields=["worker_hostname", "updated_at"]),
+            # Used when deleting old tasks.
+            models.Index(fields=["created_at"]),
+            # Used to look into latencies over time.
+            models.Index(fields=["enqueued_at"]),
+            models.Index(fields=["started_at"]),
+            models.Index(fields=["finished_at"]),
+        ]
 
     @cached_property
     def message(self):
-        return Message.decode(bytes(self.message_data))
+        return Message.decode(decompress(self.message_data))
 
     def __str__(self):
-        msg_str = str(self.message)
+        if self.actor_name is None:
+            # Tasks stored before actor names were recorded fall back
+            # to the message, unless the changelist deferred it.
+            if "message_data" in self.get_deferred_fields():
+                return str(self.id)
+            msg_str = str(self.message)
+        else:
+            msg_str = "%s(%s)" % (self.actor_name, self._params_display())
         return (msg_str[:150] + '..') if len(msg_str) > 150 else msg_str
 
+    def _params_display(self):
+        # Mirrors dramatiq.Message.__str__ using the stored JSON
+        # arguments, without decoding the message.
+        params = ", ".join(repr(arg) for arg in json.loads(self.args)) if self.args else ""
+        if self.kwargs:
+            params += ", " if params else ""
+            params += ", ".join("%s=%r" % (name, value) for name, value in json.loads(self.kwargs).items())
+        return params
+
+
+class TaskFilterChoiceManager(models.Manager):
+    def touch(self, choices):
+        """Record that the given choices were seen just now.
+
+        Parameters:
+          choices(iterable[tuple[str, str]]): Pairs of kinds and values.
+        """
+        timestamp = now()
+        queryset = self.using(DATABASE_LABEL)
+        for kind, value in choices:
+            if queryset.filter(kind=kind, value=value).update(last_seen=timestamp):
+                continue
+
+            try:
+                with transaction.atomic(using=DATABASE_LABEL):
+                    queryset.create(kind=kind, value=value, last_seen=timestamp)
+            except IntegrityError:
+                # Another worker saw it first.
+                pass
+
+
+class TaskFilterChoice(models.Model):
+    """A value the Task admin can filter by.  Kept up to date by the
+    admin middleware so that the filter sidebar doesn't have to scan
+    the Task table for distinct values.
+    """
+
+    KIND_ACTOR_NAME = "actor_name"
+    KIND_QUEUE_NAME = "queue_name"
+    KIND_WORKER_HOSTNAME = "worker_hostname"
+    KINDS = [
+        (KIND_ACTOR_NAME, "Actor name"),
+        (KIND_QUEUE_NAME, "Queue name"),
+        (KIND_WORKER_HOSTNAME, "Worker hostname"),
+    ]
+
+    kind = models.CharField(max_length=15, choices=KINDS)
+    value = models.CharField(max_length=300)
+    last_seen = models.DateTimeField(default=now)
+
+    objects = TaskFilterChoiceManager()
+
+    class Meta:
+        ordering = ["kind", "value"]
+        unique_together = [("kind", "value")]
+
+    def __str__(self):
+        return "%s=%s" % (self.kind, self.value)
+
+
+class TaskRollupManager(models.Manager):
+    def merge(self, rollups):
+        """Add runtime stats to the stored rollups.  On backends that
+        support native upserts, every rollup is added to in a single
+        INSERT ... ON CONFLICT DO UPDATE statement per batch.
+
+        Parameters:
+          rollups(dict[tuple[str, str, datetime], RuntimeStats]): Stats
+            keyed by actor name, queue name and minute.
+        """
+        # Rows are written in a consistent order so that concurrent
+        # flushes from different workers can't deadlock.
+        rollups = sorted(rollups.items(), key=lambda item: item[0])
+        connection = connections[DATABASE_LABEL]
+        if _has_native_upsert(connection):
+            self._upsert(connection, rollups)
+            return
+
+        queryset = self.using(DATABASE_LABEL)
+        with transaction.atomic(using=DATABASE_LABEL):
+            for (actor_name, queue_name, bucket), stats in rollups:
+                key = dict(actor_name=actor_name, queue_name=queue_name, bucket=bucket)
+                rollup = queryset.select_for_update().filter(**key).first()
+                if rollup is None:
+                    try:
+                        with transaction.atomic(using=DATABASE_LABEL):
+                            queryset.create(**key, **TaskRollup.fields_from_stats(stats))
+                        continue
+                    except IntegrityError:
+                        # Another worker created it first.
+                        rollup = queryset.select_for_update().get(**key)
+
+                merged = rollup.stats
+                merged.merge(stats)
+                for name, value in TaskRollup.fields_from_stats(merged).items():
+                    setattr(rollup, name, value)
+                rollup.save(using=DATABASE_LABEL)
+
+    def _upsert(self, connection, rollups):
+        opts = self.model._meta
+        fields = [field for field in opts.concrete_fields if field is not opts.pk]
+        batch_size = max(connection.ops.bulk_batch_size(fields, rollups), 1)
+        with transaction.atomic(using=DATABASE_LABEL, savepoint=False), connection.cursor() as cursor:
+            sql = None
+            for offset in range(0, len(rollups), batch_size):
+                batch = rollups[offset:offset + batch_size]
+                params = []
+                for (actor_name, queue_name, bucket), stats in batch:
+                    row = dict(
+                        actor_name=actor_name, queue_name=queue_name, bucket=bucket,
+                        **TaskRollup.fields_from_stats(stats),
+                    )
+                    params.extend(field.get_db_prep_save(row[field.name], connection) for field in fields)
+
+                if sql is None or len(batch) < batch_size:
+                    sql = self._upsert_sql(connection, fields, len(batch))
+                cursor.execute(sql, params)
+
+    def _upsert_sql(self, connection, fields, count):
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+
+        def column(name, table=opts.db_table):
+            return "%s.%s" % (qn(table), qn(opts.get_field(name).column))
+
+        def excluded(name):
+            return column(name, "excluded")
+
+        updates = {name: "%s + %s" % (column(name), excluded(name)) for name in ("count", "failures", "runtime_sum")}
+        for name, comparison in (("runtime_min", "<"), ("runtime_max", ">")):
+            updates[name] = "CASE WHEN %s IS NULL OR %s %s %s THEN %s ELSE %s END" % (
+                column(name), excluded(name), comparison, column(name), excluded(name), column(name),
+            )
+
+        # The histograms are added up bucket by bucket.  Stored ones
+        # may be shorter if buckets were added since.
+        if connection.vendor == "postgresql":
+            updates["histogram"] = (
+                "(SELECT json_agg(a.value::bigint + COALESCE(b.value::bigint, 0) ORDER BY a.i)::text "
+                "FROM json_array_elements_text(%s::json) WITH ORDINALITY AS a(value, i) "
+                "LEFT JOIN json_array_elements_text(%s::json) WITH ORDINALITY AS b(value, i) "
+                "ON b.i = a.i)" % (excluded("histogram"), column("histogram"))
+            )
+        else:
+            updates["histogram"] = (
+                "(SELECT json_group_array(a.value + COALESCE(b.value, 0)) "
+                "FROM json_each(%s) AS a LEFT JOIN json_each(%s) AS b ON b.key = a.key)" % (
+                    excluded("histogram"), column("histogram"),
+                )
+            )
+
+        placeholders = "(%s)" % ", ".join(["%s"] * len(fields))
+        return "INSERT INTO %s (%s) VALUES %s ON CONFLICT (%s) DO UPDATE SET %s" % (
+            qn(opts.db_table),
+            ", ".join(qn(field.column) for field in fields),
+            ", ".join([placeholders] * count),
+            ", ".join(qn(opts.get_field(name).column) for name in ("actor_name", "queue_name", "bucket")),
+            ", ".join("%s = %s" % (qn(opts.get_field(name).column), value) for name, value in updates.items()),
+        )
+
+
+class TaskRollup(models.Model):
+    """Execution counts and runtimes of an actor on a queue over one
+    minute, accumulated by the admin middleware.
+    """
+
+    actor_name = models.CharField(max_length=300)
+    queue_name = models.CharField(max_length=100)
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+    runtime_sum = models.FloatField(default=0)
+    runtime_min = models.FloatField(null=True)
+    runtime_max = models.FloatField(null=True)
+    histogram = models.TextField(default="[]", help_text="runtime counts per histogram bucket, as JSON")
+
+    objects = TaskRollupManager()
+
+    class Meta:
+        ordering = ["-bucket"]
+        unique_together = [("actor_name", "queue_name", "bucket")]
+        indexes = [
+            models.Index(fields=["bucket"]),
+        ]
+
+    @staticmethod
+    def fields_from_stats(stats):
+        return dict(
+            count=stats.count,
+            failures=stats.failures,
+            runtime_sum=stats.runtime_sum,
+            runtime_min=stats.runtime_min,
+            runtime_max=stats.runtime_max,
+            histogram=json.dumps(stats.histogram),
+        )
+
+    @property
+    def stats(self):
+        from .rollups import RuntimeStats
+
+        stats = RuntimeStats()
+        stats.count = self.count
+        stats.failures = self.failures
+        stats.runtime_sum = self.runtime_sum
+        stats.runtime_min = self.runtime_min
+        stats.runtime_max = self.runtime_max
+        histogram = json.loads(self.histogram)
+        stats.histogram[:len(histogram)] = histogram
+        return stats
+
+    def __str__(self):
+        return "%s on %s at %s" % (self.actor_name, self.queue_name, self.bucket)
+
+
+class WorkerHeartbeatManager(models.Manager):
+    def beat(self, hostname, pid, **fields):
+        """Record that the worker process `pid` on `hostname` is alive,
+        along with what it's doing.
+        """
+        queryset = self.using(DATABASE_LABEL)
+        fields["last_seen"] = now()
+        if queryset.filter(hostname=hostname, pid=pid).update(**fields):
+            return
+
+        try:
+            with transaction.atomic(using=DATABASE_LABEL):
+                queryset.create(hostname=hostname, pid=pid, **fields)
+        except IntegrityError:
+            queryset.filter(hostname=hostname, pid=pid).update(**fields)
+
+    def stale(self, max_age):
+        """Get the heartbeats that weren't updated in the last
+        `max_age` seconds.
+        """
+        return self.using(DATABASE_LABEL).filter(last_seen__lt=now() - timedelta(seconds=max_age))
+
+
+class WorkerHeartbeat(models.Model):
+    """The last heartbeat of a worker process, published periodically
+    by the heartbeat middleware.
+    """
+
+    hostname = models.CharField(max_length=300)
+    pid = models.PositiveIntegerField()
+    started_at = models.DateTimeField(default=now)
+    last_seen = models.DateTimeField(default=now)
+    threads = models.PositiveIntegerField(default=0)
+    in_flight = models.TextField(default="[]", help_text="the IDs of the messages being processed, as JSON")
+    processed = models.BigIntegerField(default=0)
+    failed = models.BigIntegerField(default=0)
+    rss = models.BigIntegerField(null=True, help_text="in bytes")
+
+    objects = WorkerHeartbeatManager()
+
+    class Meta:
+        ordering = ["hostname", "pid"]
+        unique_together = [("hostname", "pid")]
+        indexes = [
+            models.Index(fields=["last_seen"]),
+        ]
+
+    @property
+    def in_flight_message_ids(self):
+        return json.loads(self.in_flight)
+
+    def __str__(self):
+        return "%s:%d" % (self.hostname, self.pid)
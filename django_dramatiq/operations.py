@@ -0,0 +1,69 @@
+from django.db.migrations.operations import AddIndex
+
+
+def _is_partitioned(schema_editor, model):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [model._meta.db_table])
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def _is_index_valid(schema_editor, name):
+    """Get whether an index is valid, or None if there is no index
+    with the given name.  A concurrent build that failed leaves an
+    invalid index behind, which is maintained but never used.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", [name])
+        row = cursor.fetchone()
+    return None if row is None else row[0]
+
+
+class AddIndexConcurrently(AddIndex):
+    """Adds an index without blocking writes to the table on
+    PostgreSQL.  Other backends, and partitioned tables, which can't
+    be indexed concurrently, get a regular index.
+
+    An invalid index left behind by a failed concurrent build is
+    dropped and built again.
+
+    Migrations using this operation must set ``atomic = False``.
+    """
+
+    def _is_concurrent(self, schema_editor, model):
+        return schema_editor.connection.vendor == "postgresql" and not _is_partitioned(schema_editor, model)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+
+        if not self._is_concurrent(schema_editor, model):
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+        name = schema_editor.quote_name(self.index.name)
+        valid = _is_index_valid(schema_editor, name)
+        if valid:
+            return
+        elif valid is not None:
+            schema_editor.execute("DROP INDEX CONCURRENTLY %s" % name)
+
+        sql = str(self.index.create_sql(model, schema_editor))
+        schema_editor.execute(sql.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+
+        if not self._is_concurrent(schema_editor, model):
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+        schema_editor.execute("DROP INDEX CONCURRENTLY IF EXISTS %s" % schema_editor.quote_name(self.index.name))
+
+    def describe(self):
+        return "Concurrently create index %s on field(s) %s of model %s" % (
+            self.index.name,
+            ", ".join(self.index.fields),
+            self.model_name,
+        )
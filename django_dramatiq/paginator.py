@@ -0,0 +1,95 @@
+from django.core.paginator import Paginator
+from django.db import OperationalError, connections, transaction
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """A paginator that avoids counting every row of large tables.
+
+    Unfiltered querysets are counted using the database's own estimate
+    of the table size, which is cheap to look up, falling back to an
+    exact count when the estimate is small or unavailable.  On SQLite,
+    the estimate is only available once the table has been analyzed.  Filtered
+    querysets are counted up to `max_count` rows only and, on
+    PostgreSQL, the count gives up after `count_timeout` milliseconds.
+    Either way, the count is at most `max_count` unless it's estimated.
+    """
+
+    #: The maximum number of rows counted exactly.
+    max_count = 10000
+
+    #: The maximum amount of time, in milliseconds, spent counting.
+    count_timeout = 200
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, "query"):
+            return super().count
+
+        if not queryset.query.where:
+            estimate = self._estimate(queryset)
+            if estimate is not None and estimate > self.max_count:
+                return estimate
+
+        return self._capped_count(queryset)
+
+    def _estimate(self, queryset):
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Partitioned tables have no statistics of their own.
+                cursor.execute(
+                    "SELECT SUM(GREATEST(reltuples, 0))::bigint FROM pg_class "
+                    "WHERE oid = to_regclass(%s) "
+                    "   OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))",
+                    [table, table],
+                )
+                row = cursor.fetchone()
+                return int(row[0]) if row and row[0] is not None else None
+            elif connection.vendor == "sqlite":
+                return self._sqlite_estimate(connection, cursor, table)
+            else:
+                return None
+
+    def _sqlite_estimate(self, connection, cursor, table):
+        # The row counts stored by ANALYZE, if it ever ran, are the
+        # only estimate SQLite keeps.
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        if not cursor.fetchone()[0]:
+            return None
+
+        cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+        stats = [int(stat.split()[0]) for stat, in cursor.fetchall() if stat]
+        if not stats:
+            return None
+
+        # Old Tasks may have been deleted since, so the estimate is
+        # capped by the range of rowids, looked up in the table's b-tree.
+        cursor.execute("SELECT MAX(rowid) - MIN(rowid) + 1 FROM %s" % connection.ops.quote_name(table))
+        return min(max(stats), cursor.fetchone()[0] or 0)
+
+    def _capped_count(self, queryset):
+        queryset = queryset.order_by()[:self.max_count]
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return queryset.count()
+
+        try:
+            with transaction.atomic(using=queryset.db):
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT current_setting('statement_timeout')")
+                    previous_timeout = cursor.fetchone()[0]
+                    cursor.execute("SELECT set_config('statement_timeout', %s, true)", [str(self.count_timeout)])
+                count = queryset.count()
+                # Releasing the savepoint keeps the timeout for the rest
+                # of the enclosing transaction, like the whole request
+                # with ATOMIC_REQUESTS.
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT set_config('statement_timeout', %s, true)", [previous_timeout])
+                return count
+        except OperationalError:
+            # The statement timed out, rolling back to the savepoint
+            # restored the timeout.
+            return self.max_count
@@ -0,0 +1,188 @@
+import logging
+from datetime import timedelta
+
+from django.utils.timezone import now
+
+LOGGER = logging.getLogger("django_dramatiq.partitioning")
+
+PERIOD_DAILY = "daily"
+PERIOD_HOURLY = "hourly"
+PERIODS = {
+    PERIOD_DAILY: (timedelta(days=1), "%Y%m%d"),
+    PERIOD_HOURLY: (timedelta(hours=1), "%Y%m%d%H"),
+}
+
+#: The suffix of the partition holding the rows from before the table was partitioned.
+LEGACY_SUFFIX = "legacy"
+
+#: The suffix of the partition catching rows outside of every other partition.
+DEFAULT_SUFFIX = "default"
+
+
+def _check_period(period):
+    if period not in PERIODS:
+        raise ValueError("Unknown partitioning period %r, expected one of %s." % (period, ", ".join(PERIODS)))
+
+
+def _check_vendor(connection):
+    if connection.vendor != "postgresql":
+        raise RuntimeError("Task table partitioning requires PostgreSQL, not %s." % connection.vendor)
+
+
+def period_start(moment, period):
+    """Get the start of the partitioning period `moment` falls in.
+    """
+    _check_period(period)
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    if period == PERIOD_DAILY:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def partition_name(table, start, period):
+    _check_period(period)
+    _, name_format = PERIODS[period]
+    return "%s_p%s" % (table, start.strftime(name_format))
+
+
+def is_partitioned(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def list_partitions(connection, table):
+    """Get the names and upper bounds of a table's partitions.  The
+    default partition has no upper bound.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, "
+            "       substring(pg_get_expr(c.relpartbound, c.oid) FROM $$TO \\('([^']+)'\\)$$)::timestamptz "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) "
+            "ORDER BY 2",
+            [table],
+        )
+        return cursor.fetchall()
+
+
+def convert_to_partitioned(connection, table, period, *, premake=7):
+    """Turn a regular Task table into one that is range partitioned
+    by `created_at`, so that old tasks can be removed by dropping
+    whole partitions.  The existing table becomes the first partition,
+    so no rows are copied.
+    """
+    _check_vendor(connection)
+    _check_period(period)
+    if is_partitioned(connection, table):
+        return
+
+    qn = connection.ops.quote_name
+    legacy = "%s_%s" % (table, LEGACY_SUFFIX)
+    boundary = period_start(now(), period)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT i.relname, pg_get_indexdef(i.oid) "
+            "FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+            "WHERE x.indrelid = to_regclass(%s) AND NOT x.indisprimary",
+            [table],
+        )
+        indexes = cursor.fetchall()
+
+        cursor.execute("ALTER TABLE %s RENAME TO %s" % (qn(table), qn(legacy)))
+        cursor.execute(
+            "CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (created_at)" % (
+                qn(table), qn(legacy),
+            )
+        )
+        # Unique constraints on partitioned tables have to include the partition key.
+        cursor.execute("ALTER TABLE %s ADD PRIMARY KEY (id, created_at)" % qn(table))
+
+        # Recreate the secondary indexes on the parent under their
+        # original names, so that migrations can keep managing them.
+        for index_name, definition in indexes:
+            legacy_index_name = "%s_%s" % (index_name[:52], LEGACY_SUFFIX)
+            cursor.execute("ALTER INDEX %s RENAME TO %s" % (qn(index_name), qn(legacy_index_name)))
+            head, _, tail = definition.partition(" USING ")
+            head = head.rsplit(" ON ", 1)[0].replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1)
+            cursor.execute("%s ON %s USING %s" % (head, qn(table), tail))
+
+        cursor.execute("ALTER TABLE %s ATTACH PARTITION %s FOR VALUES FROM (MINVALUE) TO (%%s)" % (
+            qn(table), qn(legacy),
+        ), [boundary])
+        cursor.execute("CREATE TABLE %s PARTITION OF %s DEFAULT" % (
+            qn("%s_%s" % (table, DEFAULT_SUFFIX)), qn(table),
+        ))
+
+    # Forget that the table wasn't partitioned, see models._is_partitioned.
+    connection.__dict__.pop("_dramatiq_tasks_partitioned", None)
+    create_partitions(connection, table, period, premake=premake, start=boundary)
+
+
+def create_partitions(connection, table, period, *, premake=7, start=None):
+    """Create the partitions for the current period and the `premake`
+    periods after it, if they don't exist yet.
+
+    Future periods are created first.  Periods that already have rows
+    in the default partition, because partitions weren't created in
+    time, are skipped since Postgres refuses to create them.
+
+    Returns:
+      list[str]: The names of the partitions that were created.
+    """
+    _check_vendor(connection)
+    _check_period(period)
+    step, _ = PERIODS[period]
+    start = period_start(start or now(), period)
+
+    qn = connection.ops.quote_name
+    partitions = {name for name, _ in list_partitions(connection, table)}
+    default = "%s_%s" % (table, DEFAULT_SUFFIX)
+    created = []
+    with connection.cursor() as cursor:
+        for i in reversed(range(premake + 1)):
+            lower = start + step * i
+            name = partition_name(table, lower, period)
+            if name in partitions:
+                continue
+
+            if default in partitions:
+                cursor.execute("SELECT 1 FROM %s WHERE created_at >= %%s AND created_at < %%s LIMIT 1" % (
+                    qn(default),
+                ), [lower, lower + step])
+                if cursor.fetchone() is not None:
+                    LOGGER.warning("Skipping partition %r, the default partition holds rows in its range.", name)
+                    continue
+
+            cursor.execute("CREATE TABLE %s PARTITION OF %s FOR VALUES FROM (%%s) TO (%%s)" % (
+                qn(name), qn(table),
+            ), [lower, lower + step])
+            created.append(name)
+
+    return created[::-1]
+
+
+def drop_old_partitions(connection, table, max_task_age, *, detach_only=False):
+    """Detach, and unless `detach_only` is set drop, the partitions
+    whose rows are all older than `max_task_age` seconds.
+
+    Returns:
+      list[str]: The names of the partitions that were removed.
+    """
+    _check_vendor(connection)
+    qn = connection.ops.quote_name
+    cutoff = now() - timedelta(seconds=max_task_age)
+    removed = []
+    with connection.cursor() as cursor:
+        for name, upper_bound in list_partitions(connection, table):
+            if upper_bound is None or upper_bound > cutoff:
+                continue
+
+            cursor.execute("ALTER TABLE %s DETACH PARTITION %s" % (qn(table), qn(name)))
+            if not detach_only:
+                cursor.execute("DROP TABLE %s" % qn(name))
+            removed.append(name)
+
+    return removed
@@ -0,0 +1,82 @@
+import random
+import threading
+
+from dramatiq.common import q_name
+
+
+class TrackingPolicy:
+    """Decides which messages the admin middleware keeps track of.
+
+    Messages for excluded actors and queues are never recorded.
+    Messages for sampled actors are only recorded when they fail, when
+    they're delayed or, for a `sample_rate` share of them, when they
+    succeed.  Decisions are cached per actor.
+
+    Parameters:
+      exclude_actors(list[str]): Actors that are never recorded.
+      exclude_queues(list[str]): Queues that are never recorded.
+      sample_rate(float): The share of successful executions recorded
+        for every actor, between 0 and 1.
+      sample_rates(dict[str, float]): Per actor sample rates
+        overriding `sample_rate`.
+    """
+
+    def __init__(self, *, exclude_actors=(), exclude_queues=(), sample_rate=1.0, sample_rates=None):
+        self.exclude_actors = set(exclude_actors)
+        self.exclude_queues = {q_name(queue_name) for queue_name in exclude_queues}
+        self.sample_rate = sample_rate
+        self.sample_rates = sample_rates or {}
+
+        self._lock = threading.Lock()
+        self._rates = {}
+
+    @classmethod
+    def from_settings(cls, tracking_settings):
+        return cls(
+            exclude_actors=tracking_settings.get("EXCLUDE_ACTORS", ()),
+            exclude_queues=tracking_settings.get("EXCLUDE_QUEUES", ()),
+            sample_rate=tracking_settings.get("SAMPLE_RATE", 1.0),
+            sample_rates=tracking_settings.get("SAMPLE_RATES"),
+        )
+
+    def get_sample_rate(self, message):
+        """Get the share of successful executions of a message's actor
+        to record, or None if the actor isn't recorded at all.
+        """
+        key = (message.actor_name, message.queue_name)
+        try:
+            return self._rates[key]
+        except KeyError:
+            pass
+
+        if message.actor_name in self.exclude_actors or q_name(message.queue_name) in self.exclude_queues:
+            rate = None
+        else:
+            rate = self.sample_rates.get(message.actor_name, self.sample_rate)
+
+        with self._lock:
+            self._rates[key] = rate
+        return rate
+
+    def should_record_enqueue(self, message, delay=None):
+        rate = self.get_sample_rate(message)
+        if rate is None:
+            return False
+        return rate >= 1 or bool(delay) or self._is_delayed(message)
+
+    def should_record_processing(self, message):
+        rate = self.get_sample_rate(message)
+        if rate is None:
+            return False
+        return rate >= 1 or self._is_delayed(message)
+
+    def should_record_result(self, message, failed=False):
+        rate = self.get_sample_rate(message)
+        if rate is None:
+            return False
+        return rate >= 1 or failed or self._is_delayed(message) or random.random() < rate
+
+    def _is_delayed(self, message):
+        # Delayed messages are recorded as soon as they're enqueued, so
+        # the rest of their lifecycle has to be recorded as well.
+        return "eta" in message.options
@@ -0,0 +1,44 @@
+"""pytest fixtures for testing actors.  Enable them from a conftest.py:
+
+    pytest_plugins = ["django_dramatiq.pytest_plugin"]
+
+Actors tested with `dramatiq_eager` run within the test's transaction,
+so they work with pytest-django's `db` fixture.  Those tested with
+`dramatiq_worker` run in other threads, and need `transactional_db`.
+"""
+import pytest
+
+
+@pytest.fixture
+def dramatiq_broker():
+    """The global broker, flushed after the test.
+    """
+    from dramatiq import get_broker
+
+    broker = get_broker()
+    broker.flush_all()
+    yield broker
+    broker.flush_all()
+
+
+@pytest.fixture
+def dramatiq_worker(dramatiq_broker):
+    """A worker consuming from the global broker.
+    """
+    from dramatiq import Worker
+
+    worker = Worker(dramatiq_broker, worker_timeout=100)
+    worker.start()
+    yield worker
+    worker.stop()
+
+
+@pytest.fixture
+def dramatiq_eager(dramatiq_broker):
+    """The global broker, running actors synchronously when messages
+    are sent to it.
+    """
+    from django_dramatiq.test import eager
+
+    with eager(dramatiq_broker) as broker:
+        yield broker
@@ -0,0 +1,186 @@
+import atexit
+import bisect
+import logging
+import os
+import threading
+
+from django import db
+from django.utils.timezone import now
+
+LOGGER = logging.getLogger("django_dramatiq.rollups")
+
+#: The upper bounds, in seconds, of the runtime histogram buckets.
+#: The last bucket holds every runtime above the last bound.
+HISTOGRAM_BOUNDS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1, 2.5, 5, 10, 30, 60, 300, 900, 3600,
+)
+
+
+def bucket_start(moment):
+    """Get the start of the minute `moment` falls in.
+    """
+    return moment.replace(second=0, microsecond=0)
+
+
+def percentile(histogram, q):
+    """Estimate a runtime percentile from a histogram.
+
+    The estimate is interpolated linearly within the bucket the
+    percentile falls in.  Runtimes above the last bound are reported
+    as the last bound.
+
+    Parameters:
+      histogram(list[int]): The counts per bucket.
+      q(float): The percentile, between 0 and 1.
+
+    Returns:
+      float: The estimated runtime in seconds, or None if the
+      histogram is empty.
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+
+    rank, seen = q * total, 0
+    for i, count in enumerate(histogram):
+        if count and seen + count >= rank:
+            if i >= len(HISTOGRAM_BOUNDS):
+                return HISTOGRAM_BOUNDS[-1]
+
+            lower = HISTOGRAM_BOUNDS[i - 1] if i else 0
+            return lower + (HISTOGRAM_BOUNDS[i] - lower) * (rank - seen) / count
+        seen += count
+    return HISTOGRAM_BOUNDS[-1]
+
+
+class RuntimeStats:
+    """Execution counts and runtimes of one actor over some period.
+    """
+
+    __slots__ = ("count", "failures", "runtime_sum", "runtime_min", "runtime_max", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.runtime_sum = 0.0
+        self.runtime_min = None
+        self.runtime_max = None
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def add(self, runtime, failed=False):
+        self.count += 1
+        self.failures += failed
+        self.runtime_sum += runtime
+        self.runtime_min = runtime if self.runtime_min is None else min(self.runtime_min, runtime)
+        self.runtime_max = runtime if self.runtime_max is None else max(self.runtime_max, runtime)
+        self.histogram[bisect.bisect_left(HISTOGRAM_BOUNDS, runtime)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.failures += other.failures
+        self.runtime_sum += other.runtime_sum
+        for name, pick in (("runtime_min", min), ("runtime_max", max)):
+            value, other_value = getattr(self, name), getattr(other, name)
+            if value is None or other_value is None:
+                setattr(self, name, other_value if value is None else value)
+            else:
+                setattr(self, name, pick(value, other_value))
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def percentile(self, q):
+        value = percentile(self.histogram, q)
+        if value is None or self.runtime_min is None:
+            return value
+        # The interpolation can't know where in a bucket runtimes fell.
+        return min(max(value, self.runtime_min), self.runtime_max)
+
+    @property
+    def runtime_avg(self):
+        return self.runtime_sum / self.count if self.count else None
+
+
+class RollupAccumulator:
+    """Accumulates runtime stats per actor, queue and minute in memory
+    and periodically merges them into the TaskRollup table from a
+    background thread.
+
+    Parameters:
+      flush_interval(int): The amount of time, in milliseconds, in
+        between flushes.
+    """
+
+    def __init__(self, *, flush_interval=10000):
+        self.flush_interval = flush_interval / 1000
+
+        self._lock = threading.Lock()
+        self._reset()
+        atexit.register(self.close)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._pending = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            # The process was forked, the flusher thread didn't survive.
+            self._reset()
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="RollupAccumulator", daemon=True)
+            self._thread.start()
+
+    def add(self, actor_name, queue_name, runtime, failed=False, moment=None):
+        key = (actor_name, queue_name, bucket_start(moment or now()))
+        with self._lock:
+            self._ensure_started()
+            stats = self._pending.get(key)
+            if stats is None:
+                stats = self._pending[key] = RuntimeStats()
+            stats.add(runtime, failed)
+
+    def flush(self):
+        """Merge everything accumulated so far into the database.
+        """
+        from .models import TaskRollup
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return
+
+        try:
+            TaskRollup.objects.merge(pending)
+        except Exception:
+            LOGGER.exception("Failed to write %d Task rollups.", len(pending))
+            # Keep the stats around for the next flush.
+            with self._lock:
+                for key, stats in pending.items():
+                    current = self._pending.get(key)
+                    if current is not None:
+                        stats.merge(current)
+                    self._pending[key] = stats
+
+    def close(self, timeout=None):
+        """Flush the accumulated stats and stop the flusher thread.
+        """
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+
+        self._stop.set()
+        thread.join(timeout)
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.flush_interval):
+                db.close_old_connections()
+                self.flush()
+            self.flush()
+        finally:
+            db.connections.close_all()
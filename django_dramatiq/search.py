@@ -0,0 +1,213 @@
+"""Indexed search over the arguments of Tasks.
+
+On PostgreSQL, the args and kwargs columns get trigram GIN indexes
+matching the ``UPPER(...) LIKE UPPER(...)`` queries Django runs for
+``icontains`` lookups.  On SQLite, they are copied into an FTS5
+table using the trigram tokenizer, kept up to date by triggers.  Its
+rows are keyed by the ids in a table of their own, rather than by
+the Task table's rowids, which VACUUM may renumber.  Other backends
+fall back to the admin's regular ``LIKE`` search.
+"""
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+
+from .apps import DjangoDramatiqConfig
+from .partitioning import is_partitioned
+
+#: The columns that are searched.
+COLUMNS = ("args", "kwargs")
+
+#: The trigram tokenizer can't match anything shorter.
+MIN_TERM_LENGTH = 3
+
+
+def is_enabled():
+    return bool(DjangoDramatiqConfig.tasks_search_settings().get("ENABLED", False))
+
+
+def _index_name(table, column):
+    return "%s_%s_trgm" % (table, column)
+
+
+def _search_table(table):
+    return "%s_search" % table
+
+
+def _ids_table(table):
+    return "%s_search_ids" % table
+
+
+def _trigger_names(table):
+    return ["%s_search_%s" % (table, event) for event in ("insert", "update", "delete")]
+
+
+def is_supported(connection):
+    if connection.vendor == "postgresql":
+        return True
+    if connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= (3, 34, 0)
+    return False
+
+
+def is_installed(connection, table):
+    """Whether the search indexes for `table` exist.
+    """
+    if not is_supported(connection):
+        return False
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT COUNT(*) FROM pg_class WHERE oid IN (%s)" % ", ".join(["to_regclass(%s)"] * len(COLUMNS)),
+                [_index_name(table, column) for column in COLUMNS],
+            )
+            return cursor.fetchone()[0] == len(COLUMNS)
+
+        # The triggers are dropped whenever a migration rebuilds the
+        # table, and the ids table didn't exist in earlier versions.
+        names = _trigger_names(table) + [_ids_table(table)]
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master "
+            "WHERE type IN ('trigger', 'table') AND name IN (%s)" % ", ".join(["%s"] * len(names)),
+            names,
+        )
+        return cursor.fetchone()[0] == len(names)
+
+
+def install(connection, table):
+    """Create the search indexes for `table`, unless they exist.  On
+    PostgreSQL this requires the pg_trgm extension, which is created
+    if it's missing.
+    """
+    qn = connection.ops.quote_name
+    if connection.vendor == "postgresql":
+        concurrently = "" if connection.in_atomic_block or is_partitioned(connection, table) else "CONCURRENTLY "
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for column in COLUMNS:
+                cursor.execute("CREATE INDEX %sIF NOT EXISTS %s ON %s USING gin ((UPPER(%s::text)) gin_trgm_ops)" % (
+                    concurrently, qn(_index_name(table, column)), qn(table), qn(column),
+                ))
+
+    elif connection.vendor == "sqlite":
+        if is_installed(connection, table):
+            return
+
+        search_table, ids_table = _search_table(table), _ids_table(table)
+        insert, update, delete = _trigger_names(table)
+        columns = ", ".join(COLUMNS)
+        new_values = ", ".join("new.%s" % column for column in COLUMNS)
+        changed = " OR ".join("old.%s IS NOT new.%s" % (column, column) for column in COLUMNS)
+        set_values = ", ".join("%s = new.%s" % (column, column) for column in COLUMNS)
+        docid = "(SELECT docid FROM %s WHERE task_id = {row}.id)" % qn(ids_table)
+        # The tables are rebuilt from scratch, whether the triggers were
+        # dropped along with the Task table or they're from a version
+        # that mirrored the Task table by rowid.
+        uninstall(connection, table)
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE %s (docid INTEGER PRIMARY KEY, task_id TEXT NOT NULL UNIQUE)" % (
+                qn(ids_table),
+            ))
+            cursor.execute("CREATE VIRTUAL TABLE %s USING fts5(%s, tokenize='trigram')" % (qn(search_table), columns))
+            cursor.execute(
+                "CREATE TRIGGER %s AFTER INSERT ON %s BEGIN "
+                "INSERT INTO %s (task_id) VALUES (new.id); "
+                "INSERT INTO %s (rowid, %s) VALUES (%s, %s); "
+                "END" % (
+                    qn(insert), qn(table),
+                    qn(ids_table),
+                    qn(search_table), columns, docid.format(row="new"), new_values,
+                )
+            )
+            cursor.execute(
+                "CREATE TRIGGER %s AFTER UPDATE OF %s ON %s WHEN %s BEGIN "
+                "UPDATE %s SET %s WHERE rowid = %s; "
+                "END" % (qn(update), columns, qn(table), changed, qn(search_table), set_values, docid.format(row="old"))
+            )
+            cursor.execute(
+                "CREATE TRIGGER %s AFTER DELETE ON %s BEGIN "
+                "DELETE FROM %s WHERE rowid = %s; "
+                "DELETE FROM %s WHERE task_id = old.id; "
+                "END" % (qn(delete), qn(table), qn(search_table), docid.format(row="old"), qn(ids_table))
+            )
+            # Index the existing rows.
+            cursor.execute("INSERT INTO %s (task_id) SELECT id FROM %s" % (qn(ids_table), qn(table)))
+            cursor.execute(
+                "INSERT INTO {search} (rowid, {columns}) "
+                "SELECT ids.docid, {values} FROM {table} task JOIN {ids} ids ON ids.task_id = task.id".format(
+                    search=qn(search_table), columns=columns, table=qn(table), ids=qn(ids_table),
+                    values=", ".join("task.%s" % column for column in COLUMNS),
+                )
+            )
+
+
+def uninstall(connection, table):
+    """Drop the search indexes for `table`.
+    """
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            for column in COLUMNS:
+                cursor.execute("DROP INDEX IF EXISTS %s" % qn(_index_name(table, column)))
+
+        elif connection.vendor == "sqlite":
+            for trigger in _trigger_names(table):
+                cursor.execute("DROP TRIGGER IF EXISTS %s" % qn(trigger))
+            cursor.execute("DROP TABLE IF EXISTS %s" % qn(_search_table(table)))
+            cursor.execute("DROP TABLE IF EXISTS %s" % qn(_ids_table(table)))
+
+
+def reinstall(sender, using, **kwargs):
+    """Recreate the search indexes after migrations, which drop the
+    SQLite triggers whenever they rebuild the Task table.  Connected to
+    the ``post_migrate`` signal.
+    """
+    from .models import DATABASE_LABEL, Task
+
+    connection = connections[using]
+    if using != DATABASE_LABEL or not is_enabled() or not is_supported(connection):
+        return
+
+    table = Task._meta.db_table
+    if table in connection.introspection.table_names() and not is_installed(connection, table):
+        install(connection, table)
+
+
+class _Subquery(RawSQL):
+    # The in lookup parenthesizes subqueries already, and IN ((...))
+    # only compares against the subquery's first row.
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def search(queryset, term):
+    """Filter a Task queryset down to the Tasks whose actor name or
+    arguments contain `term`, ignoring case, using the search indexes.
+    """
+    from .models import DATABASE_LABEL, TaskFilterChoice
+
+    # Actor names are few, so they're matched against the registry of
+    # known actors and then looked up in the actor_name index.
+    actor_names = (
+        TaskFilterChoice.objects.using(DATABASE_LABEL)
+        .filter(kind=TaskFilterChoice.KIND_ACTOR_NAME, value__icontains=term)
+        .values_list("value", flat=True)
+    )
+    condition = models.Q(actor_name__in=list(actor_names))
+
+    connection = connections[queryset.db]
+    if connection.vendor == "sqlite" and len(term) >= MIN_TERM_LENGTH:
+        qn = connection.ops.quote_name
+        table = queryset.model._meta.db_table
+        condition |= models.Q(pk__in=_Subquery(
+            "SELECT task_id FROM {ids} WHERE docid IN (SELECT rowid FROM {search} WHERE {search} MATCH %s)".format(
+                ids=qn(_ids_table(table)), search=qn(_search_table(table)),
+            ),
+            # A quoted FTS5 string matches as a substring.
+            ['"%s"' % term.replace('"', '""')],
+        ))
+    else:
+        for column in COLUMNS:
+            condition |= models.Q(**{"%s__icontains" % column: term})
+
+    return queryset.filter(condition)
@@ -1,3 +1,11 @@
 import django
+import dramatiq
 
 django.setup()
+
+from django_dramatiq.brokers import LazyBroker  # noqa: E402
+
+# Workers use the broker right away, so there's no point in deferring it.
+broker = dramatiq.get_broker()
+if isinstance(broker, LazyBroker):
+    broker.resolve()
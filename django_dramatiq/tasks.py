@@ -2,9 +2,34 @@ import dramatiq
 
 
 @dramatiq.actor
-def delete_old_tasks(max_task_age=86400):
+def delete_old_tasks(max_task_age=86400, max_task_age_by_status=None, max_task_age_by_queue=None,
+                     batch_size=10000, sleep=0):
     """This task deletes all tasks older than `max_task_age` from the
-    database.
+    database, in batches of `batch_size`.  Statuses and queues can be
+    given their own maximum ages.
     """
     from .models import Task
-    Task.tasks.delete_old_tasks(max_task_age)
+    Task.tasks.delete_old_tasks(
+        max_task_age,
+        max_task_age_by_status=max_task_age_by_status,
+        max_task_age_by_queue=max_task_age_by_queue,
+        batch_size=batch_size,
+        sleep=sleep,
+    )
+
+
+@dramatiq.actor
+def reap_orphaned_tasks(heartbeat_timeout=60, requeue=False, requeue_after=600):
+    """This task marks the tasks whose worker died while running them
+    as lost, and optionally enqueues them again once they've been lost
+    for `requeue_after` seconds.
+    """
+    from .models import Task
+    from .utils import actor_time_limits
+
+    Task.tasks.reap_orphaned_tasks(
+        heartbeat_timeout=heartbeat_timeout,
+        time_limits=actor_time_limits(dramatiq.get_broker()),
+        requeue=requeue,
+        requeue_after=requeue_after,
+    )
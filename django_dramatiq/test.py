@@ -1,8 +1,119 @@
-from django.test import TransactionTestCase
-from dramatiq import Worker, get_broker
+import contextlib
+import logging
+import threading
 
+from django.test import TestCase, TransactionTestCase
+from dramatiq import Message, Worker, get_broker
+from dramatiq.broker import MessageProxy
+from dramatiq.errors import QueueNotFound
+from dramatiq.middleware import SkipMessage
 
-class DramatiqTestCase(TransactionTestCase):
+from .brokers import LazyBroker
+from .middleware import DbConnectionsMiddleware
+
+LOGGER = logging.getLogger("django_dramatiq.test")
+
+# The messages sent by actors running eagerly in each thread, which
+# are processed once the actor returns.
+_eager_state = threading.local()
+
+
+def process_message(broker, message):
+    """Process a message in the current thread the way a worker
+    would, through the broker's middleware.
+
+    Returns:
+      MessageProxy: The processed message, holding the exception its
+      actor raised, if any.
+    """
+    # Workers decode the messages they consume.
+    message = MessageProxy(Message.decode(message.encode()))
+    try:
+        broker.emit_before("process_message", message)
+
+        result = None
+        if not message.failed:
+            actor = broker.get_actor(message.actor_name)
+            result = actor(*message.args, **message.kwargs)
+
+        broker.emit_after("process_message", message, result=result)
+
+    except SkipMessage:
+        LOGGER.warning("Message %s was skipped.", message)
+        broker.emit_after("skip_message", message)
+
+    except BaseException as e:
+        message.stuff_exception(e)
+        LOGGER.error("Failed to process message %s with unhandled exception.", message, exc_info=True)
+        broker.emit_after("process_message", message, exception=e)
+
+    event = "nack" if message.failed else "ack"
+    broker.emit_before(event, message)
+    broker.emit_after(event, message)
+    return message
+
+
+@contextlib.contextmanager
+def eager(broker=None, *, raise_exceptions=False):
+    """Run actors synchronously when messages are sent to `broker`,
+    instead of enqueueing them for a worker.  Messages go through every
+    middleware, like the admin middleware, as they would in a worker,
+    so this works with TestCase's transaction rollbacks.
+
+    Messages sent with a delay, including retries, are enqueued as
+    usual.  Messages sent by an actor are processed once it returns.
+    Like Django's test client, this keeps DbConnectionsMiddleware from
+    closing the connections the test runs in.
+
+    Parameters:
+      broker(Broker): The broker, or the global broker if None.
+      raise_exceptions(bool): Whether exceptions raised by actors are
+        raised again from ``send()``, once the middleware handled them.
+    """
+    broker = broker or get_broker()
+    if isinstance(broker, LazyBroker):
+        broker = broker.resolve()
+
+    enqueue, middleware = broker.enqueue, broker.middleware
+
+    def eager_enqueue(message, *, delay=None):
+        if delay is not None:
+            return enqueue(message, delay=delay)
+
+        if message.queue_name not in broker.get_declared_queues():
+            raise QueueNotFound(message.queue_name)
+
+        broker.emit_before("enqueue", message, delay)
+        broker.emit_after("enqueue", message, delay)
+
+        pending = getattr(_eager_state, "pending", None)
+        if pending is not None:
+            pending.append(message)
+            return message
+
+        _eager_state.pending = pending = [message]
+        try:
+            while pending:
+                processed = process_message(broker, pending.pop(0))
+                if raise_exceptions and processed._exception is not None:
+                    raise processed._exception
+        finally:
+            _eager_state.pending = None
+        return message
+
+    broker.enqueue = eager_enqueue
+    broker.middleware = [m for m in middleware if not isinstance(m, DbConnectionsMiddleware)]
+    try:
+        yield broker
+    finally:
+        del broker.enqueue
+        broker.middleware = middleware
+
+
+class _DramatiqTestMixin:
+    #: Whether actors run synchronously when messages are sent rather
+    #: than in a worker.
+    eager = False
 
     def _pre_setup(self):
         super()._pre_setup()
@@ -10,10 +121,31 @@ class DramatiqTestCase(TransactionTestCase):
         self.broker = get_broker()
         self.broker.flush_all()
 
-        self.worker = Worker(self.broker, worker_timeout=100)
-        self.worker.start()
+        if self.eager:
+            self._eager = eager(self.broker)
+            self._eager.__enter__()
+        else:
+            self.worker = Worker(self.broker, worker_timeout=100)
+            self.worker.start()
 
     def _post_teardown(self):
-        self.worker.stop()
+        if self.eager:
+            self._eager.__exit__(None, None, None)
+        else:
+            self.worker.stop()
 
         super()._post_teardown()
+
+
+class DramatiqTestCase(_DramatiqTestMixin, TransactionTestCase):
+    """Runs a worker for every test.  Set `eager` to run actors
+    synchronously instead.
+    """
+
+
+class EagerDramatiqTestCase(_DramatiqTestMixin, TestCase):
+    """Runs actors synchronously when messages are sent, within each
+    test's transaction.
+    """
+
+    eager = True
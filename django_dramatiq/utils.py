@@ -1,8 +1,29 @@
 import datetime
 import importlib
+import json
+import math
 from decimal import Decimal
 
+import dramatiq
+from django.conf import settings
 from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # Not available on Windows.
+    resource = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
 
 
 def load_class(path):
@@ -21,6 +42,49 @@ def load_middleware(path_or_obj):
         return load_class(path_or_obj)()
     return path_or_obj
 
+
+def current_rss():
+    """Get the resident set size of the current process, in bytes.
+    Where it can't be read from procfs, the peak RSS is used instead.
+    Returns None where neither is available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        if resource is None:
+            return None
+        # ru_maxrss is in kilobytes on Linux, but in bytes on macOS.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def actor_time_limits(broker):
+    """Get the time limit, in milliseconds, of every actor declared on
+    `broker`, falling back to the default of its TimeLimit middleware.
+
+    Returns:
+      dict[str, int]
+    """
+    from dramatiq.middleware import TimeLimit
+
+    default_time_limit = next((m.time_limit for m in broker.middleware if isinstance(m, TimeLimit)), None)
+    time_limits = {}
+    for actor_name in broker.get_declared_actors():
+        time_limit = broker.get_actor(actor_name).options.get("time_limit", default_time_limit)
+        if time_limit is not None:
+            time_limits[actor_name] = time_limit
+    return time_limits
+
+
+def datetime_from_timestamp(timestamp):
+    """Convert a message timestamp, in milliseconds since the epoch,
+    to a datetime that can be stored in a DateTimeField.
+    """
+    # Django expects a timezone-aware datetime if USE_TZ is True, and a naive datetime in localtime otherwise.
+    tz = timezone.utc if settings.USE_TZ else None
+    return datetime.datetime.fromtimestamp(timestamp / 1000, tz=tz)
+
+
 class DateDecimalJSONEncoder(DjangoJSONEncoder):
     def default(self, o):
         if isinstance(o, Decimal):
@@ -28,3 +92,81 @@ class DateDecimalJSONEncoder(DjangoJSONEncoder):
         if isinstance(o, datetime.datetime) or isinstance(o, datetime.date):
             return o.isoformat()
         return super().default(o)
+
+
+_json_encoder = DateDecimalJSONEncoder()
+
+
+if orjson is not None:
+    # Like the json module, convert non-string keys and leave dates to DateDecimalJSONEncoder.
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def _default(o):
+    # The same conversions as DateDecimalJSONEncoder, for the
+    # types orjson and msgpack don't handle the same way natively.
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, (datetime.datetime, datetime.date)):
+        return o.isoformat()
+    return _json_encoder.default(o)
+
+
+def _is_finite(value):
+    # orjson serializes NaN and infinities as null, unlike the json
+    # module, so values containing them are left to the latter.
+    if isinstance(value, float):
+        return math.isfinite(value)
+    if isinstance(value, Decimal):
+        return value.is_finite()
+    if isinstance(value, (list, tuple)):
+        return all(_is_finite(item) for item in value)
+    if isinstance(value, dict):
+        return all(_is_finite(item) for item in value.values())
+    return True
+
+
+def dumps_arguments(value):
+    """Serialize message arguments to JSON the way
+    DateDecimalJSONEncoder does, using orjson when it's installed.
+    Either way, non-ASCII text is stored as is.
+    """
+    if orjson is not None and _is_finite(value):
+        try:
+            return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS).decode("utf-8")
+        except TypeError:
+            # orjson can't serialize integers above 64 bits.
+            pass
+    return json.dumps(value, cls=DateDecimalJSONEncoder, separators=(",", ":"), ensure_ascii=False)
+
+
+class ORJSONEncoder(dramatiq.Encoder):
+    """Encodes messages as JSON using orjson.  Decimals, dates and
+    datetimes are encoded like DateDecimalJSONEncoder does.
+    """
+
+    def __init__(self):
+        if orjson is None:
+            raise RuntimeError("ORJSONEncoder requires the orjson package.")
+
+    def encode(self, data):
+        return orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+
+    def decode(self, data):
+        return orjson.loads(data)
+
+
+class MsgPackEncoder(dramatiq.Encoder):
+    """Encodes messages using msgpack.  Decimals, dates and datetimes
+    are encoded like DateDecimalJSONEncoder does.
+    """
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("MsgPackEncoder requires the msgpack package.")
+
+    def encode(self, data):
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
@@ -0,0 +1,335 @@
+import atexit
+import heapq
+import logging
+import os
+import queue
+import threading
+import time
+
+from django import db
+
+LOGGER = logging.getLogger("django_dramatiq.writers")
+
+#: Marker put on the buffer to make the flusher write what it has.
+_FLUSH = object()
+
+
+class TaskWriter:
+    """Writes Task status updates synchronously, in the calling thread.
+    """
+
+    def write(self, message, **fields):
+        from .models import Task
+        Task.tasks.create_or_update_from_message(message, **fields)
+
+    def flush(self, timeout=None):
+        pass
+
+    def close(self, timeout=None):
+        pass
+
+    def stats(self):
+        return {}
+
+
+class BufferedTaskWriter(TaskWriter):
+    """Buffers Task status updates in a bounded in-process queue and
+    writes them in bulk from a background thread.
+
+    Updates for the same message that land in the same batch are
+    merged, so a message that is enqueued, started and finished in
+    between two flushes costs a single row in a bulk upsert.
+
+    Parameters:
+      max_size(int): The maximum number of updates held in memory.
+      flush_interval(int): The maximum amount of time, in
+        milliseconds, an update may sit in the buffer.
+      batch_size(int): The maximum number of updates written per batch.
+      enqueue_timeout(int): The maximum amount of time, in
+        milliseconds, a caller blocks when the buffer is full before
+        the update is dropped.
+    """
+
+    def __init__(self, *, max_size=10000, flush_interval=250, batch_size=500, enqueue_timeout=100):
+        self.max_size = max_size
+        self.flush_interval = flush_interval / 1000
+        self.batch_size = batch_size
+        self.enqueue_timeout = enqueue_timeout / 1000
+
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(("buffered", "written", "batches", "delayed", "dropped", "errors"), 0)
+        self._reset()
+        atexit.register(self.close)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_size)
+        self._thread = None
+        self._stopping = False
+
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            # The process was forked, the flusher thread didn't survive.
+            self._reset()
+
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                # A flusher that outlived close() stops on its own once
+                # it wrote every update.
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopping = False
+                    self._thread = threading.Thread(target=self._run, name="TaskWriter", daemon=True)
+                    self._thread.start()
+
+    def _incr(self, counter, n=1):
+        with self._lock:
+            self._counters[counter] += n
+            return self._counters[counter]
+
+    def write(self, message, **fields):
+        self._ensure_started()
+        item = (message, fields)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._incr("delayed")
+            try:
+                self._queue.put(item, timeout=self.enqueue_timeout)
+            except queue.Full:
+                dropped = self._incr("dropped")
+                if dropped == 1 or dropped % 1000 == 0:
+                    LOGGER.warning("Task write buffer is full, %d updates dropped so far.", dropped)
+                return
+
+        self._incr("buffered")
+
+    def flush(self, timeout=None):
+        """Block until every update buffered so far has been written.
+        """
+        if self._thread is None or self._pid != os.getpid():
+            return
+
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait(timeout)
+
+    def close(self, timeout=None):
+        """Write out any buffered updates and stop the flusher thread.
+        """
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+
+        self._stopping = True
+        self._queue.put((_FLUSH, threading.Event()))
+        thread.join(timeout)
+        if thread.is_alive():
+            # Starting another flusher could write the same rows
+            # concurrently, so this one is left to finish.
+            LOGGER.warning("Task writer is still writing buffered updates after %s seconds.", timeout)
+            return
+
+        self._thread = None
+        self._stopping = False
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, pending=self._queue.qsize())
+
+    def _run(self):
+        try:
+            while not self._stopping or not self._queue.empty():
+                batch, waiters = self._collect()
+                if batch:
+                    self._write_batch(batch)
+
+                for waiter in waiters:
+                    waiter.set()
+        finally:
+            db.connections.close_all()
+
+    def _collect(self):
+        batch, waiters = [], []
+        try:
+            item = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return batch, waiters
+
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            message, payload = item
+            if message is _FLUSH:
+                waiters.append(payload)
+                break
+
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                break
+
+            try:
+                item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+
+        return batch, waiters
+
+    def _write_batch(self, batch):
+        from .models import Task
+
+        try:
+            db.close_old_connections()
+            written = Task.tasks.bulk_create_or_update_from_messages(batch)
+        except Exception:
+            LOGGER.exception("Failed to write %d Task updates.", len(batch))
+            self._incr("errors", len(batch))
+        else:
+            self._incr("written", written)
+            self._incr("batches")
+
+
+class DeferredTaskWriter(TaskWriter):
+    """Wraps another writer and holds back deferred updates for a
+    grace period, so that they can be dropped if they are superseded
+    before the period runs out.
+
+    Parameters:
+      writer(TaskWriter): The writer updates are passed on to.
+      delay(int): The grace period, in milliseconds.
+    """
+
+    def __init__(self, writer, *, delay):
+        self.writer = writer
+        self.delay = delay / 1000
+
+        self._condition = threading.Condition()
+        self._counters = dict.fromkeys(("deferred", "superseded"), 0)
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._pending = {}
+        self._writing = {}
+        self._deadlines = []
+        self._thread = None
+        self._stopping = False
+
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="DeferredTaskWriter", daemon=True)
+            self._thread.start()
+
+    def write(self, message, **fields):
+        self.writer.write(message, **fields)
+
+    def defer(self, message, **fields):
+        """Write an update once the grace period is over, unless it is
+        cancelled first.
+        """
+        deadline = time.monotonic() + self.delay
+        with self._condition:
+            self._ensure_started()
+            self._pending[message.message_id] = (message, fields)
+            heapq.heappush(self._deadlines, (deadline, message.message_id))
+            self._counters["deferred"] += 1
+            self._condition.notify()
+
+    def cancel(self, message_id):
+        """Drop the deferred update for a message.
+
+        Returns:
+          bool: False if the update had already been written.
+        """
+        with self._condition:
+            if self._pending.pop(message_id, None) is not None:
+                self._counters["superseded"] += 1
+                return True
+
+            written = self._writing.get(message_id)
+
+        if written is not None:
+            # The update that supersedes it must be written after it.
+            written.wait()
+        return False
+
+    def flush(self, timeout=None):
+        self.writer.flush(timeout)
+
+    def close(self, timeout=None):
+        with self._condition:
+            if self._thread is not None and self._pid == os.getpid():
+                self._stopping = True
+                self._condition.notify()
+                thread = self._thread
+            else:
+                thread = None
+
+        if thread is not None:
+            thread.join(timeout)
+            self._thread = None
+            self._stopping = False
+
+        self.writer.close(timeout)
+
+    def stats(self):
+        with self._condition:
+            return dict(self.writer.stats(), **self._counters)
+
+    def _run(self):
+        try:
+            self._process_deadlines()
+        finally:
+            db.connections.close_all()
+
+    def _process_deadlines(self):
+        while True:
+            with self._condition:
+                message_id = self._next_deadline()
+                if message_id is None:
+                    return
+
+                pending = self._pending.pop(message_id, None)
+                if pending is None:
+                    continue
+
+                # Writes happen outside of the lock so that worker
+                # threads don't wait on them, cancel() waits on this
+                # event instead.
+                written = self._writing[message_id] = threading.Event()
+
+            try:
+                self._write_pending(message_id, *pending)
+            finally:
+                with self._condition:
+                    del self._writing[message_id]
+                written.set()
+
+    def _next_deadline(self):
+        """Wait for the next deadline to pass and pop its message ID.
+        Must be called with the lock held.
+
+        Returns:
+          str: The message ID, or None once the writer stopped and every
+          deadline was popped.
+        """
+        while not self._stopping:
+            timeout = self._deadlines[0][0] - time.monotonic() if self._deadlines else None
+            if timeout is None or timeout > 0:
+                self._condition.wait(timeout)
+                continue
+
+            return heapq.heappop(self._deadlines)[1]
+
+        # Messages that are still in flight on shutdown are running.
+        if self._deadlines:
+            return heapq.heappop(self._deadlines)[1]
+        return None
+
+    def _write_pending(self, message_id, message, fields):
+        try:
+            db.close_old_connections()
+            self.writer.write(message, **fields)
+        except Exception:
+            LOGGER.exception("Failed to write deferred update for message %r.", message_id)
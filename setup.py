@@ -47,11 +47,26 @@ setup(
         'Programming Language :: Python :: 3.7',
     ],
     extras_require={
+        "prometheus": [
+            "prometheus-client",
+        ],
+        "zstd": [
+            "zstandard",
+        ],
+        "orjson": [
+            "orjson",
+        ],
+        "msgpack": [
+            "msgpack",
+        ],
         "dev": [
             "bumpversion",
             "flake8",
             "flake8-quotes",
             "isort",
+            "msgpack",
+            "orjson",
+            "prometheus-client",
             "pytest",
             "pytest-cov",
             "pytest-django",
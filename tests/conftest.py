@@ -2,6 +2,8 @@ import dramatiq
 import pytest
 from dramatiq import Worker
 
+pytest_plugins = ["django_dramatiq.pytest_plugin"]
+
 
 @pytest.fixture
 def broker():
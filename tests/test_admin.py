@@ -0,0 +1,171 @@
+from unittest import mock
+
+import dramatiq
+import pytest
+from django.contrib import admin
+from django.contrib.admin.templatetags.admin_list import items_for_result
+from django.db import connection, transaction
+
+from django_dramatiq.admin import QueueNameListFilter
+from django_dramatiq.middleware import AdminMiddleware
+from django_dramatiq.models import Task, TaskFilterChoice
+from django_dramatiq.paginator import EstimatedCountPaginator
+
+
+def test_task_admin_changelist_does_not_decode_messages(transactional_db, broker, rf, admin_user):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x, y=None):
+        pass
+
+    # And a couple of enqueued and delayed messages
+    do_work.send(1, y="a")
+    do_work.send_with_options(args=(2,), delay=60000)
+
+    # When I render the rows of the Task changelist
+    request = rf.get("/admin/django_dramatiq/task/")
+    request.user = admin_user
+    model_admin = admin.site._registry[Task]
+    changelist = model_admin.get_changelist_instance(request)
+    with mock.patch("dramatiq.Message.decode", side_effect=AssertionError("message decoded")):
+        rows = [list(items_for_result(changelist, task, None)) for task in changelist.result_list]
+
+    # Then the messages are never loaded or decoded
+    assert len(rows) == 2
+    assert all("message_data" in task.get_deferred_fields() for task in changelist.result_list)
+
+    # And the tasks are described by their stored columns
+    assert {str(task) for task in changelist.result_list} == {"do_work(1, y='a')", "do_work(2)"}
+
+
+def analyze():
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE %s" % connection.ops.quote_name(Task._meta.db_table))
+
+
+def test_task_admin_estimates_the_count_of_unfiltered_changelists(transactional_db, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # And a few Tasks whose table was analyzed
+    for _ in range(3):
+        do_work.send()
+    analyze()
+
+    # When I paginate all Tasks with a paginator that counts at most 2 rows
+    paginator = EstimatedCountPaginator(Task.tasks.all(), 100)
+    paginator.max_count = 2
+
+    # Then the count is the database's estimate
+    assert paginator.count == 3
+
+    # When I paginate a filtered queryset
+    paginator = EstimatedCountPaginator(Task.tasks.filter(actor_name="do_work"), 100)
+    paginator.max_count = 2
+
+    # Then the count is capped
+    assert paginator.count == 2
+
+    # When the paginator can count every row
+    paginator = EstimatedCountPaginator(Task.tasks.all(), 100)
+
+    # Then the count is exact
+    assert paginator.count == 3
+
+
+def test_task_admin_estimate_excludes_deleted_tasks(transactional_db, broker):
+    if connection.vendor != "sqlite":
+        pytest.skip("Only SQLite's estimate is adjusted for deleted rows.")
+
+    # Given an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # And Tasks whose table was analyzed before the oldest ones were deleted
+    for _ in range(30):
+        do_work.send()
+    analyze()
+    Task.tasks.filter(pk__in=Task.tasks.order_by("created_at").values("pk")[:20]).delete()
+
+    # When I paginate all Tasks with a paginator that counts at most 2 rows
+    paginator = EstimatedCountPaginator(Task.tasks.all(), 5)
+    paginator.max_count = 2
+
+    # Then the last page still has Tasks
+    assert paginator.count == 10
+    assert len(paginator.page(paginator.num_pages).object_list) == 5
+
+
+def test_task_admin_count_timeout_only_applies_to_the_count(db):
+    if connection.vendor != "postgresql":
+        pytest.skip("Counts are only timed out on PostgreSQL.")
+
+    def statement_timeout():
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW statement_timeout")
+            return cursor.fetchone()[0]
+
+    # Given a request running in a transaction
+    with transaction.atomic():
+        timeout = statement_timeout()
+
+        # When a filtered changelist is counted
+        assert EstimatedCountPaginator(Task.tasks.filter(actor_name="do_work"), 100).count == 0
+
+        # Then the rest of the transaction runs without the count's timeout
+        assert statement_timeout() == timeout
+
+
+def test_task_admin_filter_choices_come_from_the_registry(transactional_db, broker, rf, admin_user):
+    # Given an actor on a custom queue
+    @dramatiq.actor(queue_name="filtered")
+    def do_work():
+        pass
+
+    # And an admin middleware that hasn't stored any filter choices yet
+    middleware = next(m for m in broker.middleware if isinstance(m, AdminMiddleware))
+    middleware._filter_choices_seen.clear()
+
+    # When I send it a couple of messages
+    do_work.send()
+    do_work.send()
+
+    # Then its actor and queue are stored as filter choices once
+    assert set(TaskFilterChoice.objects.values_list("kind", "value")) == {
+        (TaskFilterChoice.KIND_ACTOR_NAME, "do_work"),
+        (TaskFilterChoice.KIND_QUEUE_NAME, "filtered"),
+    }
+
+    # When I open the Task changelist filtered by that queue
+    request = rf.get("/admin/django_dramatiq/task/", {"queue_name": "filtered"})
+    request.user = admin_user
+    changelist = admin.site._registry[Task].get_changelist_instance(request)
+
+    # Then the filter choices are read from the registry
+    queue_filter = next(f for f in changelist.filter_specs if isinstance(f, QueueNameListFilter))
+    assert queue_filter.lookup_choices == [("filtered", "filtered")]
+
+    # And the Tasks are filtered
+    assert changelist.result_count == 2
+
+
+def test_task_admin_shows_stored_result_previews(transactional_db, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # And a Task whose result preview was stored
+    message = do_work.send()
+    Task.tasks.filter(id=message.message_id).update(status=Task.STATUS_DONE, result_preview='"<b>done</b>"')
+
+    # When I display its result
+    model_admin = admin.site._registry[Task]
+    with mock.patch("dramatiq.Message.get_result", side_effect=AssertionError("result backend queried")):
+        result = model_admin.result(Task.tasks.get())
+
+    # Then the preview is shown without querying the result backend
+    assert result == "<pre>&quot;&lt;b&gt;done&lt;/b&gt;&quot;</pre>"
@@ -1,6 +1,18 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from unittest import mock
+
 import dramatiq
+import pytest
+from dramatiq import Worker
+from dramatiq.brokers.stub import StubBroker
 
+from django_dramatiq.middleware import AdminMiddleware
 from django_dramatiq.models import Task
+from django_dramatiq.writers import BufferedTaskWriter, DeferredTaskWriter
 
 
 def test_admin_middleware_keeps_track_of_tasks(transactional_db, broker, worker):
@@ -45,3 +57,364 @@ def test_admin_middleware_keeps_track_of_failed_tasks(transactional_db, broker,
     task = Task.tasks.get()
     assert task
     assert task.status == Task.STATUS_FAILED
+
+
+def test_admin_middleware_can_buffer_task_updates(transactional_db, broker):
+    # Given a buffered admin middleware
+    middleware = AdminMiddleware(buffered=True, flush_interval=60000)
+
+    # And a message
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    message = do_work.message()
+
+    # When the message goes through its whole lifecycle
+    middleware.after_enqueue(broker, message, None)
+    middleware.before_process_message(broker, message)
+    middleware.after_process_message(broker, message)
+
+    # Then nothing should be written until the buffer is flushed
+    assert Task.tasks.count() == 0
+    middleware.writer.flush()
+
+    # And the updates should have been merged into a single write
+    task = Task.tasks.get()
+    assert task.status == Task.STATUS_DONE
+    assert task.worker_hostname
+    assert middleware.writer.stats()["written"] == 1
+
+    middleware.writer.close()
+
+
+def test_admin_middleware_writes_messages_finished_during_worker_shutdown(transactional_db):
+    # Given a broker with a buffered admin middleware
+    broker = StubBroker(middleware=[AdminMiddleware(buffered=True, flush_interval=60000)])
+    started = threading.Event()
+
+    # And an actor that's still running when its worker is asked to stop
+    @dramatiq.actor(broker=broker)
+    def do_work():
+        started.set()
+        time.sleep(0.2)
+
+    worker = Worker(broker, worker_timeout=100)
+    worker.start()
+    do_work.send()
+    assert started.wait(5)
+
+    # When the worker stops
+    worker.stop()
+
+    # Then the message's final status was written
+    assert Task.tasks.get().status == Task.STATUS_DONE
+    broker.close()
+
+
+def test_buffered_task_writer_drops_updates_when_full():
+    # Given a buffered writer whose flusher isn't running
+    writer = BufferedTaskWriter(max_size=1, enqueue_timeout=0)
+    writer._ensure_started = mock.Mock()
+
+    # When I write more updates than it can hold
+    message = mock.Mock(message_id="a")
+    writer.write(message, status=Task.STATUS_ENQUEUED)
+    writer.write(message, status=Task.STATUS_RUNNING)
+
+    # Then the extra update should be counted as delayed and dropped
+    stats = writer.stats()
+    assert stats["buffered"] == 1
+    assert stats["delayed"] == 1
+    assert stats["dropped"] == 1
+
+
+def test_buffered_task_writer_keeps_a_single_flusher_when_closing_times_out(caplog):
+    # Given a buffered writer whose writes block
+    writing, release, written = threading.Event(), threading.Event(), []
+    writer = BufferedTaskWriter(flush_interval=10)
+
+    def write_batch(batch):
+        writing.set()
+        release.wait(5)
+        written.extend(message.message_id for message, fields in batch)
+
+    writer._write_batch = write_batch
+    writer.write(mock.Mock(message_id="a"), status=Task.STATUS_ENQUEUED)
+    assert writing.wait(5)
+    thread = writer._thread
+
+    # When closing it times out
+    writer.close(timeout=0.05)
+
+    # Then a warning is logged and the flusher is left running
+    assert "still writing buffered updates" in caplog.text
+    assert writer._thread is thread and thread.is_alive()
+
+    # When another update is written
+    writer.write(mock.Mock(message_id="b"), status=Task.STATUS_ENQUEUED)
+
+    # Then no other flusher is started
+    assert writer._thread is thread
+
+    # And the flusher writes every update before it stops
+    release.set()
+    thread.join(5)
+    assert written == ["a", "b"]
+    assert not thread.is_alive()
+
+
+def test_admin_middleware_skips_running_updates_for_fast_tasks(transactional_db, broker):
+    # Given an admin middleware with a long running grace period
+    middleware = AdminMiddleware(running_grace_period=60000)
+
+    # And a message
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    message = do_work.message()
+    middleware.after_enqueue(broker, message, None)
+
+    # When the message is processed within the grace period
+    middleware.before_process_message(broker, message)
+    assert Task.tasks.get().status == Task.STATUS_ENQUEUED
+    middleware.after_process_message(broker, message)
+
+    # Then the running update should've been superseded by the final one
+    task = Task.tasks.get()
+    assert task.status == Task.STATUS_DONE
+    assert task.worker_hostname
+    assert task.runtime is not None
+    assert middleware.writer.stats()["superseded"] == 1
+
+    middleware.writer.close()
+
+
+def test_admin_middleware_writes_running_updates_for_slow_tasks(transactional_db, broker):
+    # Given an admin middleware with a short running grace period
+    middleware = AdminMiddleware(running_grace_period=10)
+
+    # And a message
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    message = do_work.message()
+    middleware.after_enqueue(broker, message, None)
+
+    # When the message takes longer than the grace period to process
+    middleware.before_process_message(broker, message)
+    for _ in range(100):
+        if Task.tasks.get().status == Task.STATUS_RUNNING:
+            break
+        time.sleep(0.01)
+
+    # Then the task should be shown as running
+    task = Task.tasks.get()
+    assert task.status == Task.STATUS_RUNNING
+    assert task.worker_hostname
+
+    # And be marked as done once processed
+    middleware.after_process_message(broker, message)
+    assert Task.tasks.get().status == Task.STATUS_DONE
+
+    middleware.writer.close()
+
+
+def test_deferred_task_writer_writes_outside_of_its_lock():
+    # Given a deferred writer whose underlying writes block
+    writing, release = threading.Event(), threading.Event()
+    writer = mock.Mock()
+    writer.write.side_effect = lambda message, **fields: writing.set() or release.wait(5)
+    deferred = DeferredTaskWriter(writer, delay=0)
+
+    # When an update is being written
+    deferred.defer(mock.Mock(message_id="a"), status=Task.STATUS_RUNNING)
+    assert writing.wait(5)
+
+    # Then other updates can still be deferred and cancelled
+    deferred.defer(mock.Mock(message_id="b"), status=Task.STATUS_RUNNING)
+    assert deferred.cancel("b")
+
+    # But cancelling the update being written waits for it to be written
+    cancelled = []
+    canceller = threading.Thread(target=lambda: cancelled.append(deferred.cancel("a")))
+    canceller.start()
+    canceller.join(0.1)
+    assert canceller.is_alive()
+
+    release.set()
+    canceller.join(5)
+    assert cancelled == [False]
+    deferred.close()
+
+
+def test_admin_middleware_does_not_record_messages_that_failed_to_publish(transactional_db, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # When publishing a message to its queue fails
+    with mock.patch.object(broker.queues[do_work.queue_name], "put", side_effect=ConnectionError):
+        with pytest.raises(ConnectionError):
+            do_work.send()
+
+    # Then no Task is recorded
+    assert not Task.tasks.exists()
+
+
+def test_admin_middleware_does_not_keep_track_of_excluded_actors(db, broker, settings):
+    # Given an admin middleware that excludes an actor
+    settings.DRAMATIQ_TASKS_TRACKING = {"EXCLUDE_ACTORS": ["do_work"]}
+    middleware = AdminMiddleware()
+
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # When a message for that actor goes through its lifecycle
+    message = do_work.message()
+    middleware.after_enqueue(broker, message, None)
+    middleware.before_process_message(broker, message)
+    middleware.after_process_message(broker, message)
+
+    # Then no Task should be stored
+    assert Task.tasks.count() == 0
+
+
+def test_admin_middleware_stores_message_timestamps(transactional_db, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # When I send it a delayed message
+    message = do_work.send_with_options(delay=60000)
+
+    # Then its timestamp and eta are stored in their own columns
+    task = Task.tasks.get()
+    assert round(task.enqueued_at.timestamp() * 1000) == message.message_timestamp
+    assert round(task.eta.timestamp() * 1000) >= message.message_timestamp + 60000
+
+
+def test_admin_middleware_records_queue_wait_and_timings(transactional_db, broker, worker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work():
+        time.sleep(0.05)
+
+    # And a message that waited in its queue for a second
+    message = do_work.message()
+    message = message.copy(message_timestamp=message.message_timestamp - 1000)
+
+    # When I process it
+    broker.enqueue(message)
+    broker.join(do_work.queue_name)
+    worker.join()
+
+    # Then its phase timestamps are stored
+    task = Task.tasks.get()
+    assert task.enqueued_at < task.started_at < task.finished_at
+    assert (task.finished_at - task.started_at).total_seconds() >= 0.05
+
+    # And so is its queue wait
+    assert 1 <= task.queue_wait < 5
+
+
+def test_admin_middleware_exports_queue_wait(transactional_db, broker, worker):
+    prometheus_client = pytest.importorskip("prometheus_client")
+
+    # Given an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    labels = {"queue_name": do_work.queue_name, "actor_name": do_work.actor_name}
+    samples_before = prometheus_client.REGISTRY.get_sample_value(
+        "django_dramatiq_queue_wait_seconds_count", labels,
+    ) or 0
+
+    # When I process a message
+    do_work.send()
+    broker.join(do_work.queue_name)
+    worker.join()
+
+    # Then its queue wait is exported as a metric
+    samples = prometheus_client.REGISTRY.get_sample_value("django_dramatiq_queue_wait_seconds_count", labels)
+    assert samples == samples_before + 1
+
+
+PROMETHEUS_SCRIPT = """\
+import sys
+import django
+django.setup()
+
+import dramatiq
+from dramatiq.brokers.stub import StubBroker
+from dramatiq.middleware.prometheus import DB_PATH, Prometheus
+
+from django_dramatiq.metrics import observe_queue_wait
+
+assert "prometheus_client" not in sys.modules
+
+broker = StubBroker(middleware=[Prometheus()])
+broker.emit_after("process_boot")
+
+@dramatiq.actor(broker=broker)
+def do_work():
+    pass
+
+message = do_work.message()
+broker.emit_before("process_message", message)
+observe_queue_wait(message, 1.5)
+broker.emit_after("process_message", message)
+
+from prometheus_client import CollectorRegistry, multiprocess
+registry = CollectorRegistry()
+multiprocess.MultiProcessCollector(registry, path=DB_PATH)
+labels = {"queue_name": "default", "actor_name": "do_work"}
+print(registry.get_sample_value("dramatiq_messages_total", labels))
+print(registry.get_sample_value("django_dramatiq_queue_wait_seconds_sum", labels))
+"""
+
+
+def test_queue_wait_is_exported_with_the_prometheus_middleware(tmp_path):
+    pytest.importorskip("prometheus_client")
+
+    # Given a worker process that set up Django and runs dramatiq's Prometheus middleware
+    env = dict(
+        os.environ, DJANGO_SETTINGS_MODULE="tests.settings", dramatiq_prom_db=str(tmp_path),
+        PYTHONPATH=os.getcwd(),
+    )
+    env.pop("prometheus_multiproc_dir", None)
+
+    # When it processes a message
+    output = subprocess.check_output([sys.executable, "-c", PROMETHEUS_SCRIPT], env=env)
+
+    # Then both dramatiq's metrics and the queue wait are exported from its database
+    assert output.split() == [b"1.0", b"1.5"]
+
+
+def test_admin_middleware_can_store_result_previews(transactional_db, broker):
+    # Given an admin middleware that stores short result previews
+    middleware = AdminMiddleware(result_previews=True, result_preview_size=10)
+
+    # And a couple of messages
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    short_message, long_message = do_work.message(), do_work.message()
+
+    # When they're processed
+    for message, result in ((short_message, [1, "a"]), (long_message, list(range(100)))):
+        middleware.before_process_message(broker, message)
+        middleware.after_process_message(broker, message, result=result)
+
+    # Then their serialized results are stored, truncated to the maximum size
+    assert Task.tasks.get(id=short_message.message_id).result_preview == '[1,"a"]'
+    assert Task.tasks.get(id=long_message.message_id).result_preview == "[0,1,2,3,…"
+
+    middleware.writer.close()
@@ -0,0 +1,73 @@
+from unittest import mock
+
+import dramatiq
+import pytest
+from dramatiq.brokers.stub import StubBroker
+from dramatiq.middleware import TimeLimit
+
+from django_dramatiq.apps import DjangoDramatiqConfig
+from django_dramatiq.brokers import LazyBroker
+
+
+@pytest.fixture
+def global_broker():
+    broker = dramatiq.get_broker()
+    yield
+    dramatiq.set_broker(broker)
+
+
+def test_lazy_broker_is_built_on_first_use(global_broker):
+    # Given a lazy global broker
+    broker = StubBroker(middleware=[TimeLimit()])
+    factory = mock.Mock(return_value=broker)
+    lazy_broker = LazyBroker(factory)
+    dramatiq.set_broker(lazy_broker)
+
+    # When I declare an actor
+    @dramatiq.actor(time_limit=1000)
+    def do_work():
+        pass
+
+    # Then the broker isn't built
+    assert not factory.called
+
+    # When I send the actor a message
+    do_work.send()
+
+    # Then the broker is built once, with the actor declared on it
+    assert factory.call_count == 1
+    assert broker.get_actor(do_work.actor_name) is do_work
+    assert broker.queues[do_work.queue_name].qsize() == 1
+
+    # And it replaces the lazy broker as the global broker
+    assert dramatiq.get_broker() is broker
+
+
+def test_lazy_broker_validates_actor_options_once_built(global_broker):
+    # Given a lazy broker without any middleware
+    lazy_broker = LazyBroker(lambda: StubBroker(middleware=[]))
+
+    # And an actor declared with an option no middleware defines
+    dramatiq.actor(lambda: None, actor_name="do_work", broker=lazy_broker, time_limit=1000)
+
+    # When the broker is built
+    # Then the option is rejected
+    with pytest.raises(ValueError):
+        lazy_broker.resolve()
+
+
+def test_initialize_can_defer_building_the_broker(global_broker, settings):
+    # Given that the broker is lazy
+    settings.DRAMATIQ_LAZY_BROKER = True
+
+    # When the app is initialized
+    with mock.patch.object(DjangoDramatiqConfig, "build_broker") as build_broker:
+        DjangoDramatiqConfig.initialize()
+
+        # Then the broker isn't built
+        assert isinstance(dramatiq.get_broker(), LazyBroker)
+        assert not build_broker.called
+
+        # Until it's used
+        dramatiq.get_broker().flush_all()
+        assert build_broker.call_count == 1
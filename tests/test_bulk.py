@@ -0,0 +1,93 @@
+from unittest import mock
+
+import dramatiq
+import pytest
+
+from django_dramatiq.bulk import send_many
+from django_dramatiq.middleware import AdminMiddleware, _bulk_enqueue
+from django_dramatiq.models import Task
+
+
+def test_send_many_records_tasks_in_bulk(db, broker, django_assert_num_queries):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x):
+        pass
+
+    # Whose filter choices the admin middleware has already stored
+    messages = [do_work.message(x) for x in range(25)]
+    admin = next(m for m in broker.middleware if isinstance(m, AdminMiddleware))
+    admin._remember_filter_choices(messages[0])
+
+    # When I send it many messages in chunks
+    with django_assert_num_queries(3):
+        enqueued = send_many(messages, chunk_size=10)
+
+    # Then every message should be enqueued
+    assert len(enqueued) == 25
+    assert broker.queues[do_work.queue_name].qsize() == 25
+
+    # And a Task should be stored for each one of them
+    assert Task.tasks.filter(status=Task.STATUS_ENQUEUED).count() == 25
+
+
+def test_send_many_can_delay_messages(db, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x):
+        pass
+
+    # When I send it many delayed messages
+    send_many([do_work.message(x) for x in range(3)], delay=10000)
+
+    # Then their Tasks should be stored as delayed
+    tasks = Task.tasks.all()
+    assert len(tasks) == 3
+    for task in tasks:
+        assert task.status == Task.STATUS_DELAYED
+        assert task.message.options["eta"]
+
+
+def test_send_many_only_records_the_messages_that_were_published(transactional_db, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x):
+        pass
+
+    # When publishing fails partway through a chunk
+    queue = broker.queues[do_work.queue_name]
+    messages = [do_work.message(x) for x in range(5)]
+    with mock.patch.object(queue, "put", side_effect=[None, None, ConnectionError]):
+        with pytest.raises(ConnectionError):
+            send_many(messages, chunk_size=10)
+
+    # Then only the messages that were published should have a Task
+    assert {str(pk) for pk in Task.tasks.values_list("id", flat=True)} == {m.message_id for m in messages[:2]}
+
+
+def test_send_many_restores_per_message_recording_of_outer_chunks(transactional_db, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x):
+        pass
+
+    # And a chunk that sends another chunk while it's being published
+    enqueue_message, recording = broker.enqueue, []
+
+    def enqueue(message, *, delay=None):
+        if not recording:
+            recording.append(_bulk_enqueue.active)
+            send_many([do_work.message(x) for x in range(2)])
+        recording.append(_bulk_enqueue.active)
+        return enqueue_message(message, delay=delay)
+
+    # When I send the outer chunk
+    with mock.patch.object(broker, "enqueue", side_effect=enqueue):
+        send_many([do_work.message(x) for x in range(3)])
+
+    # Then per-message recording should stay disabled until the outer chunk was sent
+    assert all(recording)
+    assert not _bulk_enqueue.active
+
+    # And every message should have a Task
+    assert Task.tasks.count() == 5
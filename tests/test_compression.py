@@ -0,0 +1,34 @@
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from django_dramatiq import compression
+
+
+def test_compressed_message_data_can_be_decompressed():
+    # Given some encoded message data
+    data = b'{"args": ["' + b"x" * 10000 + b'"]}'
+
+    # When I compress it
+    compressed = compression.compress(data)
+
+    # Then it should be smaller and carry a header
+    assert len(compressed) < len(data)
+    assert compressed.startswith(compression.MAGIC)
+
+    # And it should decompress to the original data
+    assert compression.decompress(memoryview(compressed)) == data
+
+
+def test_uncompressed_message_data_is_decompressed_as_is():
+    assert compression.decompress(b'{"args": []}') == b'{"args": []}'
+
+
+def test_compressing_with_unknown_codecs_fails():
+    with pytest.raises(ImproperlyConfigured):
+        compression.compress(b"{}", codec="lz4")
+
+
+def test_decompressing_unknown_versions_fails():
+    data = compression._HEADER.pack(compression.MAGIC, compression.VERSION + 1, compression.CODEC_ZLIB)
+    with pytest.raises(ValueError):
+        compression.decompress(data)
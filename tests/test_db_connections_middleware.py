@@ -0,0 +1,101 @@
+import time
+from unittest import mock
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from django_dramatiq.middleware import DbConnectionsMiddleware
+
+
+def test_db_connections_middleware_checks_connections_on_an_interval(transactional_db):
+    # Given a middleware that checks connections at most once a minute and pings them
+    middleware = DbConnectionsMiddleware(check_interval=60000, ping=True)
+
+    # And an open connection
+    connection = db_connection()
+
+    # When a couple of messages are processed
+    with mock.patch.object(connection, "is_usable", return_value=True) as is_usable:
+        for _ in range(2):
+            middleware.before_process_message(None, None)
+            middleware.after_process_message(None, None)
+
+    # Then the connection is only checked once
+    assert is_usable.call_count == 1
+    assert middleware.stats()["checks"] == 3
+
+    # When the interval elapses and the connection died
+    middleware._last_check.value -= 60
+    with mock.patch.object(connection, "is_usable", return_value=False), \
+            mock.patch.object(connection, "close") as close:
+        middleware.before_process_message(None, None)
+
+    # Then it's closed
+    assert close.call_count == 1
+    assert middleware.stats()["closed"] == 1
+
+
+def test_db_connections_middleware_checks_connections_with_errors_after_messages(transactional_db):
+    # Given a middleware that checks connections on an interval
+    middleware = DbConnectionsMiddleware(check_interval=60000)
+
+    # And an open connection a database error occurred on
+    connection = db_connection()
+    connection.errors_occurred = True
+
+    # When a message is processed and the connection is unusable
+    with mock.patch.object(connection, "is_usable", return_value=False), \
+            mock.patch.object(connection, "close") as close:
+        middleware.after_process_message(None, None)
+
+    # Then it's closed
+    assert close.call_count == 1
+    connection.errors_occurred = False
+
+
+def test_db_connections_middleware_can_keep_connections_past_their_max_age(transactional_db):
+    # Given a middleware that keeps connections open
+    middleware = DbConnectionsMiddleware(check_interval=0, persistent=True)
+
+    # And an open connection past its max age
+    connection = db_connection()
+    connection.close_at = time.monotonic() - 1
+
+    # When a message is processed
+    with mock.patch.object(connection, "close") as close:
+        middleware.before_process_message(None, None)
+
+    # Then the connection isn't closed
+    assert not close.called
+    connection.close_at = None
+
+
+def db_connection():
+    connection = connections["default"]
+    connection.ensure_connection()
+    return connection
+
+
+def test_db_connections_middleware_counts_reconnects(transactional_db):
+    # Given a middleware that checks connections on an interval
+    middleware = DbConnectionsMiddleware(check_interval=0)
+
+    # And an open connection past its max age
+    connection = db_connection()
+    connection.close_at = time.monotonic() - 1
+
+    # When a message is processed
+    with mock.patch.object(connection, "close"):
+        middleware.before_process_message(None, None)
+
+    # Then the connection is closed, but not reconnected yet
+    assert middleware.stats()["closed"] == 1
+    assert middleware.stats()["reconnects"] == 0
+
+    # When it's opened again, and another connection to it is opened later
+    for _ in range(2):
+        connection_created.send(sender=connection.__class__, connection=connection)
+
+    # Then a single reconnect is counted
+    assert middleware.stats()["reconnects"] == 1
+    connection.close_at = None
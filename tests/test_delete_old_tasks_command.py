@@ -0,0 +1,29 @@
+import uuid
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from django_dramatiq.models import Task
+
+
+def test_delete_old_tasks_command_deletes_old_tasks(db):
+    # Given a done and a failed Task that are two days old
+    for status in (Task.STATUS_DONE, Task.STATUS_FAILED):
+        task = Task(id=uuid.uuid4(), message_data=b"", status=status)
+        task.save()
+        task.created_at = now() - timedelta(days=2)
+        task.save()
+
+    # And an output buffer
+    buff = StringIO()
+
+    # When I call the delete_old_tasks command, keeping failed tasks for three days
+    call_command("delete_old_tasks", "--status-max-age", "failed=259200", "--batch-size", "1", stdout=buff)
+
+    # Then only the failed Task should be left
+    assert Task.tasks.get().status == Task.STATUS_FAILED
+
+    # And stdout should contain a report about the deleted tasks
+    assert "Deleted 1 tasks" in buff.getvalue()
@@ -0,0 +1,115 @@
+import datetime
+import json
+from decimal import Decimal
+from unittest import mock
+
+import dramatiq
+import pytest
+
+from django_dramatiq.apps import DjangoDramatiqConfig
+from django_dramatiq.models import Task
+from django_dramatiq.utils import DateDecimalJSONEncoder, MsgPackEncoder, ORJSONEncoder, dumps_arguments
+
+ARGUMENTS = [
+    1, "é", Decimal("1.5"), None, [1, 2], {"a": {"b": 1}, 2: "c"},
+    datetime.datetime(2020, 1, 1, 12, 30, tzinfo=datetime.timezone.utc),
+    datetime.date(2020, 1, 2),
+    datetime.timedelta(seconds=3),
+]
+
+
+def test_arguments_are_serialized_like_date_decimal_json_encoder():
+    expected = json.loads(json.dumps(ARGUMENTS, cls=DateDecimalJSONEncoder))
+    assert json.loads(dumps_arguments(ARGUMENTS)) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ([2 ** 70, -2 ** 70], "[1180591620717411303424,-1180591620717411303424]"),
+    ([float("nan"), float("inf"), -float("inf"), None], "[NaN,Infinity,-Infinity,null]"),
+    ({"price": Decimal("NaN")}, '{"price":NaN}'),
+])
+def test_arguments_orjson_cant_serialize_are_serialized_by_json(value, expected):
+    assert dumps_arguments(value) == expected
+
+
+@pytest.mark.parametrize("value", [
+    ["José"],
+    ["José", None],
+    ["José", 2 ** 70],
+    ["José", float("nan")],
+    {"name": "null", "city": "Zürich"},
+])
+def test_arguments_are_serialized_the_same_with_and_without_orjson(value):
+    # Given the arguments serialized with orjson
+    serialized = dumps_arguments(value)
+
+    # When I serialize them without orjson
+    with mock.patch("django_dramatiq.utils.orjson", None):
+        # Then they should be serialized the same way
+        assert dumps_arguments(value) == serialized
+
+
+@mock.patch("django_dramatiq.utils.json.dumps", wraps=json.dumps)
+def test_arguments_with_none_are_serialized_by_orjson(dumps):
+    # Given arguments with None and a string containing null
+    value = ["null", None]
+
+    # When I serialize them
+    serialized = dumps_arguments(value)
+
+    # Then orjson should have serialized them
+    assert serialized == '["null",null]'
+    assert not dumps.called
+
+
+def test_admin_middleware_records_messages_with_big_integers(transactional_db, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x):
+        pass
+
+    # When I send it an integer above 64 bits
+    do_work.send(2 ** 70)
+
+    # Then its Task is recorded
+    assert Task.tasks.get().args == "[1180591620717411303424]"
+
+
+@pytest.mark.parametrize("encoder_class", [ORJSONEncoder, MsgPackEncoder])
+def test_encoders_can_round_trip_messages(encoder_class):
+    encoder = encoder_class()
+
+    # Given a message with arguments json can't encode natively
+    message = dramatiq.Message(
+        queue_name="default", actor_name="do_work", args=(Decimal("1.5"), datetime.date(2020, 1, 2)),
+        kwargs={"when": datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)}, options={},
+    )
+
+    # When I encode and decode it
+    decoded = encoder.decode(encoder.encode(message._asdict()))
+
+    # Then its arguments should be converted like DateDecimalJSONEncoder does
+    assert decoded["args"] == [1.5, "2020-01-02"]
+    assert decoded["kwargs"] == {"when": "2020-01-01T00:00:00+00:00"}
+    assert decoded["message_id"] == message.message_id
+
+
+def test_encoders_can_be_selected_by_setting(settings):
+    settings.DRAMATIQ_ENCODER = "django_dramatiq.utils.ORJSONEncoder"
+    assert isinstance(DjangoDramatiqConfig.select_encoder(), ORJSONEncoder)
+
+
+def test_admin_middleware_serializes_arguments_once_per_message(transactional_db, broker, worker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x, y):
+        pass
+
+    # When I process a message
+    with mock.patch("django_dramatiq.middleware.dumps_arguments", wraps=dumps_arguments) as dumps:
+        do_work.send(1, y=2)
+        broker.join(do_work.queue_name)
+        worker.join()
+
+    # Then its args and kwargs are serialized once when it's enqueued and once by the worker
+    assert dumps.call_count == 4
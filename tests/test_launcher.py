@@ -0,0 +1,150 @@
+import os
+import signal
+import threading
+import time
+from unittest import mock
+
+import dramatiq
+import pytest
+from dramatiq.brokers.stub import StubBroker
+
+from django_dramatiq.launcher import RET_RECYCLE, STOP_SIGNALS, PreforkLauncher, RecycleMiddleware
+
+
+@pytest.fixture
+def stub_broker():
+    broker = StubBroker(middleware=[])
+    yield broker
+    broker.close()
+
+
+@pytest.fixture
+def signal_handlers():
+    signums = (signal.SIGINT, signal.SIGTERM, signal.SIGHUP)
+    handlers = {signum: signal.getsignal(signum) for signum in signums}
+    yield
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+
+
+def test_recycle_middleware_recycles_after_max_messages():
+    # Given a middleware that recycles processes after 2 messages
+    middleware = RecycleMiddleware(max_messages=2)
+
+    # When a message is processed
+    middleware.after_process_message(None, None)
+
+    # Then the process isn't recycled
+    assert not middleware.recycle.is_set()
+
+    # When another one is skipped
+    middleware.after_skip_message(None, None)
+
+    # Then the process is recycled
+    assert middleware.recycle.is_set()
+
+
+def test_recycle_middleware_recycles_processes_using_too_much_memory():
+    # Given a middleware that recycles processes using more than 100MB
+    middleware = RecycleMiddleware(max_memory=100 * 1024 * 1024)
+
+    # When a message is processed while the process uses less
+    with mock.patch("django_dramatiq.launcher.current_rss", return_value=50 * 1024 * 1024):
+        middleware.after_process_message(None, None)
+
+    # Then the process isn't recycled
+    assert not middleware.recycle.is_set()
+
+    # When a message is processed while the process uses more
+    with mock.patch("django_dramatiq.launcher.current_rss", return_value=150 * 1024 * 1024):
+        middleware.after_process_message(None, None)
+
+    # Then the process is recycled
+    assert middleware.recycle.is_set()
+
+
+def test_prefork_launcher_workers_stop_to_be_recycled(stub_broker):
+    # Given an actor
+    processed = []
+
+    @dramatiq.actor(broker=stub_broker)
+    def do_work(x):
+        processed.append(x)
+
+    # And a few messages
+    for i in range(3):
+        do_work.send(i)
+
+    # When a worker that's recycled after 2 messages runs
+    launcher = PreforkLauncher(stub_broker, processes=1, threads=1, max_messages=2, worker_timeout=100)
+    exit_code = launcher.run_worker(threading.Event())
+
+    # Then it stops to be recycled once it processed them
+    assert exit_code == RET_RECYCLE
+    assert len(processed) >= 2
+
+
+def test_prefork_launcher_runs_workers_in_forked_processes(stub_broker, signal_handlers, tmp_path):
+    # Given an actor that records the process it ran in
+    @dramatiq.actor(broker=stub_broker)
+    def do_work(x):
+        with open(str(tmp_path / str(x)), "w") as f:
+            f.write(str(os.getpid()))
+
+    # And a message
+    do_work.send(1)
+
+    # When the launcher runs a worker process until the message is processed
+    launcher = PreforkLauncher(stub_broker, processes=1, threads=1, worker_timeout=100)
+
+    def stop_when_processed():
+        deadline = time.monotonic() + 10
+        while not (tmp_path / "1").exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        launcher.stop()
+
+    threading.Thread(target=stop_when_processed, daemon=True).start()
+    launcher.run()
+
+    # Then the message was processed in a child process
+    assert (tmp_path / "1").read_text() != str(os.getpid())
+    assert not launcher.children
+
+
+def test_prefork_launcher_children_only_stop_themselves(stub_broker, signal_handlers):
+    # Given a launcher running a worker process
+    launcher = PreforkLauncher(stub_broker, processes=2, threads=1)
+    launcher.running = True
+    launcher.children = {4242: 0}
+    for signum in STOP_SIGNALS:
+        signal.signal(signum, launcher._handle_stop)
+
+    # When it forks another one, which is asked to stop as soon as it starts
+    blocked_during_fork = []
+
+    def fork():
+        blocked_during_fork.extend(signal.pthread_sigmask(signal.SIG_BLOCK, []))
+        return 0
+
+    def run_worker(stopped):
+        assert not launcher.children
+        os.kill(os.getpid(), signal.SIGTERM)
+        return 0 if stopped.wait(1) else 1
+
+    with mock.patch("django_dramatiq.launcher.os.fork", side_effect=fork), \
+            mock.patch("django_dramatiq.launcher.os._exit", side_effect=SystemExit) as exit_, \
+            mock.patch("django_dramatiq.launcher.logging.shutdown"), \
+            mock.patch.object(launcher, "run_worker", side_effect=run_worker), \
+            mock.patch.object(launcher, "stop") as stop:
+        with pytest.raises(SystemExit):
+            launcher._spawn(1)
+
+    # Then stop signals were held while it forked
+    assert set(STOP_SIGNALS) <= set(blocked_during_fork)
+
+    # And the child stopped itself rather than its siblings
+    exit_.assert_called_once_with(0)
+    assert not stop.called
+
+    # And stop signals aren't held anymore
+    assert not set(STOP_SIGNALS) & set(signal.pthread_sigmask(signal.SIG_BLOCK, []))
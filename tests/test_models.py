@@ -1,6 +1,9 @@
 import uuid
 from unittest import mock
 
+import dramatiq
+import pytest
+
 from django_dramatiq.models import Task
 
 
@@ -25,3 +28,138 @@ def test_task_create_or_update_from_message(transactional_db, broker, worker):
     message.encode.assert_called_once_with()
     assert Task.tasks.count() == 1
     assert t.message_data == message.encode.return_value
+
+
+def test_task_create_or_update_from_message_uses_a_single_statement(db, django_assert_num_queries):
+    message = mock.Mock()
+    message.encode.return_value = b"{}"
+    message.message_id = uuid.uuid4()
+
+    # Creating and updating a Task should each cost a single query
+    with django_assert_num_queries(1):
+        Task.tasks.create_or_update_from_message(message, status=Task.STATUS_RUNNING, worker_hostname="a")
+
+    with django_assert_num_queries(1):
+        Task.tasks.create_or_update_from_message(message, status=Task.STATUS_DONE, runtime=1.5)
+
+    # And fields that weren't passed on update should be preserved
+    task = Task.tasks.get(pk=message.message_id)
+    assert task.status == Task.STATUS_DONE
+    assert task.worker_hostname == "a"
+    assert task.runtime == 1.5
+
+
+def test_task_create_or_update_from_message_falls_back_to_update_or_create(db):
+    message = mock.Mock()
+    message.encode.return_value = b"{}"
+    message.message_id = uuid.uuid4()
+
+    with mock.patch("django_dramatiq.models._supports_upsert", return_value=False):
+        Task.tasks.create_or_update_from_message(message, status=Task.STATUS_RUNNING)
+        Task.tasks.create_or_update_from_message(message, status=Task.STATUS_DONE)
+
+    assert Task.tasks.get(pk=message.message_id).status == Task.STATUS_DONE
+
+
+def test_task_bulk_create_or_update_from_messages(db, django_assert_num_queries):
+    messages = []
+    for _ in range(3):
+        message = mock.Mock()
+        message.encode.return_value = b"{}"
+        message.message_id = uuid.uuid4()
+        messages.append(message)
+
+    # Upserting many messages with the same fields should cost a single query
+    with django_assert_num_queries(1):
+        written = Task.tasks.bulk_create_or_update_from_messages([
+            *((message, {"status": Task.STATUS_ENQUEUED}) for message in messages),
+            (messages[0], {"status": Task.STATUS_RUNNING}),
+        ])
+
+    # And later updates for the same message should win
+    assert written == 3
+    assert Task.tasks.count() == 3
+    assert Task.tasks.get(pk=messages[0].message_id).status == Task.STATUS_RUNNING
+
+
+def test_task_message_data_is_compressed(db, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(payload):
+        pass
+
+    # When I store a Task for a message with large arguments
+    message = do_work.message("x" * 10000)
+    Task.tasks.create_or_update_from_message(message)
+
+    # Then its message data should be compressed
+    task = Task.tasks.get()
+    assert len(task.message_data) < len(message.encode())
+
+    # And it should still be decoded transparently
+    assert task.message.args == ("x" * 10000,)
+
+
+@pytest.mark.parametrize("supports_upsert", [True, False])
+def test_task_message_data_can_be_written_on_insert_only(db, broker, settings, supports_upsert):
+    # Given that message data should only be written when Tasks are created
+    settings.DRAMATIQ_TASKS_STORAGE = {"UPDATE_MESSAGE_DATA": False}
+
+    # And an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    message = do_work.message()
+    with mock.patch("django_dramatiq.models._supports_upsert", return_value=supports_upsert):
+        # When I create a Task and update it with a different message
+        Task.tasks.create_or_update_from_message(message, status=Task.STATUS_ENQUEUED)
+        Task.tasks.create_or_update_from_message(
+            message.copy(options={"retries": 1}), status=Task.STATUS_RUNNING,
+        )
+
+        # Then the message data should be the one it was created with
+        task = Task.tasks.get()
+        assert task.status == Task.STATUS_RUNNING
+        assert task.message.options == {}
+
+        # When the message fails
+        Task.tasks.create_or_update_from_message(
+            message.copy(options={"retries": 1, "traceback": "..."}), status=Task.STATUS_FAILED,
+        )
+
+    # Then its message data should be written along with its traceback
+    task = Task.tasks.get()
+    assert task.message.options["traceback"] == "..."
+
+
+@pytest.mark.parametrize("supports_upsert", [True, False])
+def test_task_enqueue_updates_never_overwrite_later_ones(db, broker, supports_upsert):
+    # Given an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    message = do_work.message()
+    with mock.patch("django_dramatiq.models._supports_upsert", return_value=supports_upsert):
+        # When a worker records that it processed a message before its sender records it was enqueued
+        Task.tasks.create_or_update_from_message(message, status=Task.STATUS_RUNNING)
+        Task.tasks.create_or_update_from_message(message, status=Task.STATUS_DONE)
+        Task.tasks.bulk_create_or_update_from_messages([(message, {"status": Task.STATUS_ENQUEUED})])
+        Task.tasks.create_or_update_from_message(message, status=Task.STATUS_ENQUEUED)
+
+        # Then the Task is still done
+        assert Task.tasks.get().status == Task.STATUS_DONE
+
+        # When the message is retried
+        Task.tasks.create_or_update_from_message(message.copy(options={"retries": 1}), status=Task.STATUS_DELAYED)
+
+        # Then the Task is delayed
+        assert Task.tasks.get().status == Task.STATUS_DELAYED
+
+        # When a lost Task is enqueued again
+        Task.tasks.update(status=Task.STATUS_LOST)
+        Task.tasks.create_or_update_from_message(message, status=Task.STATUS_ENQUEUED)
+
+        # Then it's enqueued
+        assert Task.tasks.get().status == Task.STATUS_ENQUEUED
@@ -0,0 +1,70 @@
+import pytest
+from django.db import connection, models
+from django.db.migrations.loader import MigrationLoader
+
+from django_dramatiq.operations import AddIndexConcurrently
+
+
+def add_index(name):
+    loader = MigrationLoader(connection)
+    from_state = loader.project_state()
+    to_state = from_state.clone()
+    operation = AddIndexConcurrently("task", models.Index(fields=["actor_name", "status"], name=name))
+    operation.state_forwards("django_dramatiq", to_state)
+    return operation, from_state, to_state
+
+
+def index_names():
+    with connection.cursor() as cursor:
+        return set(connection.introspection.get_constraints(cursor, "django_dramatiq_task"))
+
+
+def test_add_index_concurrently_adds_and_removes_the_index(transactional_db):
+    # Given an operation that adds an index to the Task table
+    operation, from_state, to_state = add_index("test_actor_status_idx")
+
+    # When I apply it
+    with connection.schema_editor(atomic=False) as schema_editor:
+        operation.database_forwards("django_dramatiq", schema_editor, from_state, to_state)
+
+    # Then the index should exist
+    assert "test_actor_status_idx" in index_names()
+
+    # When I unapply it
+    with connection.schema_editor(atomic=False) as schema_editor:
+        operation.database_backwards("django_dramatiq", schema_editor, to_state, from_state)
+
+    # Then the index should be gone
+    assert "test_actor_status_idx" not in index_names()
+
+
+def test_add_index_concurrently_rebuilds_invalid_indexes(transactional_db):
+    if connection.vendor != "postgresql":
+        pytest.skip("Concurrent index builds require PostgreSQL.")
+
+    # Given an index left invalid by a failed concurrent build
+    operation, from_state, to_state = add_index("test_actor_status_idx")
+    with connection.schema_editor(atomic=False) as schema_editor:
+        operation.database_forwards("django_dramatiq", schema_editor, from_state, to_state)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE pg_index SET indisvalid = false WHERE indexrelid = to_regclass(%s)",
+            ["test_actor_status_idx"],
+        )
+
+    try:
+        # When I apply the operation again
+        with connection.schema_editor(atomic=False) as schema_editor:
+            operation.database_forwards("django_dramatiq", schema_editor, from_state, to_state)
+
+        # Then the index should have been rebuilt
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)",
+                ["test_actor_status_idx"],
+            )
+            assert cursor.fetchone() == (True,)
+    finally:
+        with connection.schema_editor(atomic=False) as schema_editor:
+            operation.database_backwards("django_dramatiq", schema_editor, to_state, from_state)
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+import dramatiq
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from django_dramatiq import partitioning
+from django_dramatiq.models import Task
+
+
+def test_period_start_truncates_to_the_partitioning_period():
+    moment = datetime(2020, 2, 7, 12, 8, 30, 15, tzinfo=timezone.utc)
+
+    assert partitioning.period_start(moment, "daily") == datetime(2020, 2, 7, tzinfo=timezone.utc)
+    assert partitioning.period_start(moment, "hourly") == datetime(2020, 2, 7, 12, tzinfo=timezone.utc)
+
+    with pytest.raises(ValueError):
+        partitioning.period_start(moment, "weekly")
+
+
+def test_partition_name_includes_the_start_of_the_period():
+    start = datetime(2020, 2, 7, 12, tzinfo=timezone.utc)
+
+    assert partitioning.partition_name("task", start, "daily") == "task_p20200207"
+    assert partitioning.partition_name("task", start, "hourly") == "task_p2020020712"
+
+
+def test_partition_tasks_command_requires_postgresql(db):
+    with pytest.raises(CommandError):
+        call_command("partition_tasks", "--setup")
+
+
+def test_partition_tasks_command_partitions_the_task_table(db, broker):
+    if connection.vendor != "postgresql":
+        pytest.skip("Task table partitioning requires PostgreSQL.")
+
+    table = Task._meta.db_table
+    start = partitioning.period_start(timezone.now(), "daily")
+
+    def partitions():
+        return {name for name, _ in partitioning.list_partitions(connection, table)}
+
+    # Given an actor and a Task
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    old_message = do_work.message()
+    Task.tasks.create_or_update_from_message(old_message, status=Task.STATUS_DONE)
+
+    # When I partition the Task table
+    call_command("partition_tasks", "--setup", "--premake", "2", stdout=StringIO())
+
+    # Then the existing table becomes a partition, along with a default one and the upcoming ones
+    assert partitions() == {
+        "%s_legacy" % table,
+        "%s_default" % table,
+        *(partitioning.partition_name(table, start + timedelta(days=i), "daily") for i in range(3)),
+    }
+
+    # And Tasks can still be written
+    message = do_work.message()
+    Task.tasks.create_or_update_from_message(message, status=Task.STATUS_ENQUEUED)
+    Task.tasks.create_or_update_from_message(message, status=Task.STATUS_DONE)
+    assert Task.tasks.get(pk=message.message_id).status == Task.STATUS_DONE
+
+    # When a Task lands in the default partition because its partition wasn't created in time
+    Task.tasks.filter(pk=message.message_id).update(created_at=start + timedelta(days=5, hours=1))
+
+    # And partitions are created further ahead
+    call_command("partition_tasks", "--premake", "6", stdout=StringIO())
+
+    # Then every other upcoming partition is created
+    assert partitions() - {"%s_legacy" % table, "%s_default" % table} == {
+        partitioning.partition_name(table, start + timedelta(days=i), "daily") for i in range(7) if i != 5
+    }
+
+    # When expired partitions are dropped
+    call_command("partition_tasks", "--max-task-age", "0", stdout=StringIO())
+
+    # Then the Tasks from before the table was partitioned are gone
+    assert "%s_legacy" % table not in partitions()
+    assert not Task.tasks.filter(pk=old_message.message_id).exists()
+
+
+def test_tasks_are_recorded_once_across_partitions(db, broker):
+    if connection.vendor != "postgresql":
+        pytest.skip("Task table partitioning requires PostgreSQL.")
+
+    start = partitioning.period_start(timezone.now(), "daily")
+
+    # Given an actor and a partitioned Task table
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    call_command("partition_tasks", "--setup", "--premake", "2", stdout=StringIO())
+
+    # And a Task that was moved to another partition
+    message = do_work.message()
+    Task.tasks.create_or_update_from_message(message, status=Task.STATUS_ENQUEUED)
+    Task.tasks.filter(pk=message.message_id).update(created_at=start + timedelta(days=1, hours=1))
+
+    # When its message is recorded again
+    with CaptureQueriesContext(connection) as queries:
+        Task.tasks.create_or_update_from_message(message, status=Task.STATUS_RUNNING)
+    Task.tasks.bulk_create_or_update_from_messages([(message, {"status": Task.STATUS_DONE})])
+
+    # Then the write should have held a lock on the message
+    assert any("pg_advisory_xact_lock" in query["sql"] for query in queries.captured_queries)
+
+    # And the Task should have been updated in place
+    assert Task.tasks.filter(pk=message.message_id).count() == 1
+    assert Task.tasks.get(pk=message.message_id).status == Task.STATUS_DONE
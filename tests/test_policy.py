@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django_dramatiq.policy import TrackingPolicy
+
+
+def make_message(actor_name="do_work", queue_name="default", **options):
+    return mock.Mock(actor_name=actor_name, queue_name=queue_name, options=options)
+
+
+def test_tracking_policy_records_everything_by_default():
+    policy = TrackingPolicy()
+    message = make_message()
+
+    assert policy.should_record_enqueue(message)
+    assert policy.should_record_processing(message)
+    assert policy.should_record_result(message)
+
+
+def test_tracking_policy_can_exclude_actors_and_queues():
+    policy = TrackingPolicy(exclude_actors=["housekeeping"], exclude_queues=["low"])
+
+    for message in (make_message(actor_name="housekeeping"), make_message(queue_name="low.DQ", eta=1)):
+        assert not policy.should_record_enqueue(message, delay=1000)
+        assert not policy.should_record_processing(message)
+        assert not policy.should_record_result(message, failed=True)
+
+
+def test_tracking_policy_samples_successful_executions():
+    policy = TrackingPolicy(sample_rate=1.0, sample_rates={"do_work": 0.01})
+    message = make_message()
+
+    # Sampled messages are only recorded once they've been processed
+    assert not policy.should_record_enqueue(message)
+    assert not policy.should_record_processing(message)
+
+    # Failures are always recorded, successes only some of the time
+    assert policy.should_record_result(message, failed=True)
+    with mock.patch("random.random", return_value=0.5):
+        assert not policy.should_record_result(message)
+    with mock.patch("random.random", return_value=0.001):
+        assert policy.should_record_result(message)
+
+    # Delayed messages are always recorded
+    delayed_message = make_message(eta=1)
+    assert policy.should_record_enqueue(delayed_message, delay=1000)
+    assert policy.should_record_processing(delayed_message)
+    assert policy.should_record_result(delayed_message)
+
+    # Other actors use the default rate
+    assert policy.should_record_enqueue(make_message(actor_name="other"))
@@ -0,0 +1,165 @@
+import importlib
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import dramatiq
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from django_dramatiq.models import Task, WorkerHeartbeat
+
+
+def make_running_task(age, worker_hostname="worker-1", **fields):
+    task = Task.tasks.create(
+        id=uuid.uuid4(), message_data=b"", status=Task.STATUS_RUNNING, worker_hostname=worker_hostname, **fields
+    )
+    Task.tasks.filter(pk=task.pk).update(updated_at=now() - age)
+    return task
+
+
+def test_reap_orphaned_tasks_finds_tasks_of_dead_workers(db):
+    # Given a task being run by a live worker on a host that publishes heartbeats
+    in_flight = make_running_task(timedelta(minutes=5))
+    WorkerHeartbeat.objects.create(hostname="worker-1", pid=1, in_flight='["%s"]' % in_flight.id)
+
+    # And a task a dead worker on the same host was running
+    orphan = make_running_task(timedelta(minutes=5))
+
+    # And a task that just started
+    recent = make_running_task(timedelta(seconds=10))
+
+    # And a task that's been running on an unmonitored host for longer than its time limit
+    timed_out = make_running_task(timedelta(minutes=20), worker_hostname="worker-2", actor_name="do_work")
+
+    # And one that's still within its time limit
+    slow = make_running_task(timedelta(minutes=5), worker_hostname="worker-2", actor_name="do_slow_work")
+
+    # When I reap orphaned tasks
+    stats = Task.tasks.reap_orphaned_tasks(
+        heartbeat_timeout=60, time_limits={"do_slow_work": 3600000}, default_time_limit=600000,
+    )
+
+    # Then only the orphaned and timed out tasks are marked as lost
+    assert stats == {"lost": 2, "requeued": 0}
+    statuses = dict(Task.tasks.values_list("id", "status"))
+    assert statuses == {
+        in_flight.id: Task.STATUS_RUNNING,
+        orphan.id: Task.STATUS_LOST,
+        recent.id: Task.STATUS_RUNNING,
+        timed_out.id: Task.STATUS_LOST,
+        slow.id: Task.STATUS_RUNNING,
+    }
+
+
+def test_reap_orphaned_tasks_can_requeue_lost_tasks(transactional_db, broker):
+    # Given an actor with a one minute time limit
+    @dramatiq.actor(time_limit=60000)
+    def do_work():
+        pass
+
+    # And a task that's been running on an unmonitored host for too long
+    message = do_work.send()
+    broker.flush_all()
+    Task.tasks.filter(pk=message.message_id).update(
+        status=Task.STATUS_RUNNING, worker_hostname="worker-1", updated_at=now() - timedelta(hours=1),
+    )
+
+    # When I reap orphaned tasks with the reap_orphaned_tasks command
+    buff = StringIO()
+    call_command("reap_orphaned_tasks", "--requeue", stdout=buff)
+
+    # Then the task is enqueued again
+    assert " * Found 1 lost tasks and requeued 1 of them." in buff.getvalue()
+    assert broker.queues[do_work.queue_name].qsize() == 1
+    assert Task.tasks.get().status == Task.STATUS_ENQUEUED
+
+
+def test_reap_orphaned_tasks_only_requeues_tasks_of_workers_gone_for_a_while(transactional_db, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # And a task running on a worker that stopped publishing heartbeats two minutes ago
+    stalled = do_work.send()
+    WorkerHeartbeat.objects.create(hostname="worker-1", pid=1, last_seen=now() - timedelta(minutes=2))
+
+    # And one running on a worker that stopped publishing heartbeats half an hour ago
+    dead = do_work.send()
+    WorkerHeartbeat.objects.create(hostname="worker-2", pid=1, last_seen=now() - timedelta(minutes=30))
+
+    broker.flush_all()
+    for message, hostname in [(stalled, "worker-1"), (dead, "worker-2")]:
+        Task.tasks.filter(pk=message.message_id).update(
+            status=Task.STATUS_RUNNING, worker_hostname=hostname, updated_at=now() - timedelta(hours=1),
+        )
+
+    # When I reap orphaned tasks, requeueing the ones lost for ten minutes
+    stats = Task.tasks.reap_orphaned_tasks(requeue=True, requeue_after=600)
+
+    # Then only the dead worker's task is requeued
+    assert stats == {"lost": 1, "requeued": 1}
+    assert broker.queues[do_work.queue_name].qsize() == 1
+    statuses = dict(Task.tasks.values_list("id", "status"))
+    assert statuses == {
+        uuid.UUID(stalled.message_id): Task.STATUS_RUNNING,
+        uuid.UUID(dead.message_id): Task.STATUS_ENQUEUED,
+    }
+
+    # When I reap orphaned tasks without requeueing them
+    stats = Task.tasks.reap_orphaned_tasks(requeue_after=600)
+
+    # Then the stalled worker's task is marked as lost
+    assert stats == {"lost": 1, "requeued": 0}
+    assert Task.tasks.get(pk=stalled.message_id).status == Task.STATUS_LOST
+
+
+def test_reap_orphaned_tasks_marks_tasks_in_batches(db):
+    # Given a host that publishes heartbeats
+    WorkerHeartbeat.objects.create(hostname="worker-1", pid=1)
+
+    # And a mix of orphaned tasks and tasks running on unmonitored hosts
+    orphans = [make_running_task(timedelta(minutes=5)) for _ in range(5)]
+    running = [make_running_task(timedelta(minutes=5), worker_hostname="worker-2") for _ in range(5)]
+
+    # When I reap orphaned tasks two at a time
+    stats = Task.tasks.reap_orphaned_tasks(batch_size=2)
+
+    # Then every orphaned task is marked as lost
+    assert stats == {"lost": 5, "requeued": 0}
+    statuses = dict(Task.tasks.values_list("id", "status"))
+    assert statuses == {
+        **{task.id: Task.STATUS_LOST for task in orphans},
+        **{task.id: Task.STATUS_RUNNING for task in running},
+    }
+
+
+def test_reap_orphaned_tasks_command_knows_the_time_limits_of_every_actor(transactional_db):
+    # Given a task of an actor declared by a tasks module that's been running for longer than its time limit
+    declared = make_running_task(timedelta(hours=11), actor_name="example")
+
+    # And one of an actor no tasks module declares
+    undeclared = make_running_task(timedelta(hours=11), actor_name="unknown_actor")
+
+    # When I reap orphaned tasks with the reap_orphaned_tasks command
+    patch = mock.patch(
+        "django_dramatiq.management.commands.reap_orphaned_tasks.importlib.import_module",
+        wraps=importlib.import_module,
+    )
+    with patch as import_module:
+        call_command("reap_orphaned_tasks", stdout=StringIO())
+
+    # Then the tasks modules were imported
+    import_module.assert_any_call("tests.testapp1.tasks")
+
+    # And only the undeclared actor's task is left running
+    statuses = dict(Task.tasks.values_list("id", "status"))
+    assert statuses == {declared.id: Task.STATUS_LOST, undeclared.id: Task.STATUS_RUNNING}
+
+    # When I reap them with a time limit for undeclared actors
+    call_command("reap_orphaned_tasks", "--time-limit", "60000", stdout=StringIO())
+
+    # Then its task is lost too
+    assert Task.tasks.get(pk=undeclared.id).status == Task.STATUS_LOST
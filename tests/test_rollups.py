@@ -0,0 +1,121 @@
+from datetime import timedelta
+
+import dramatiq
+from django.contrib import admin
+from django.utils.timezone import now
+
+from django_dramatiq.middleware import AdminMiddleware
+from django_dramatiq.models import Task, TaskRollup
+from django_dramatiq.rollups import HISTOGRAM_BOUNDS, RollupAccumulator, RuntimeStats, bucket_start, percentile
+
+
+def test_percentiles_are_estimated_from_histograms():
+    # Given runtime stats for 100 executions spread over two buckets
+    stats = RuntimeStats()
+    for _ in range(90):
+        stats.add(0.002)
+    for _ in range(10):
+        stats.add(0.5)
+
+    # Then the percentiles fall within the buckets they belong to
+    assert 0 < stats.percentile(0.5) <= HISTOGRAM_BOUNDS[0]
+    assert HISTOGRAM_BOUNDS[5] < stats.percentile(0.95) <= HISTOGRAM_BOUNDS[6]
+    assert stats.runtime_min == 0.002
+    assert stats.runtime_max == 0.5
+
+    # And an empty histogram has no percentiles
+    assert percentile([0] * (len(HISTOGRAM_BOUNDS) + 1), 0.5) is None
+
+
+def test_rollups_are_merged_into_the_database(transactional_db):
+    # Given a rollup accumulator
+    accumulator = RollupAccumulator(flush_interval=60000)
+    moment = now()
+
+    # When I add a few executions and flush twice
+    accumulator.add("do_work", "default", 0.1, moment=moment)
+    accumulator.add("do_work", "default", 0.3, failed=True, moment=moment)
+    accumulator.flush()
+    accumulator.add("do_work", "default", 0.2, moment=moment)
+    accumulator.add("do_work", "default", 5, moment=moment - timedelta(minutes=1))
+    accumulator.close()
+
+    # Then a rollup is stored per minute
+    current, previous = TaskRollup.objects.all()
+    assert previous.count == 1
+    assert previous.bucket == bucket_start(moment - timedelta(minutes=1))
+
+    # And the stats of each minute are merged
+    assert current.bucket == bucket_start(moment)
+    assert current.count == 3
+    assert current.failures == 1
+    assert round(current.runtime_sum, 6) == 0.6
+    assert current.runtime_min == 0.1
+    assert current.runtime_max == 0.3
+    assert sum(current.stats.histogram) == 3
+
+
+def test_rollups_are_added_to_in_a_single_statement(db, django_assert_num_queries):
+    # Given a stored rollup, whose histogram has fewer buckets than there are now
+    moment = bucket_start(now())
+    TaskRollup.objects.create(
+        actor_name="do_work", queue_name="default", bucket=moment,
+        count=1, runtime_sum=2, runtime_min=2, runtime_max=2, histogram="[1]",
+    )
+
+    # When I merge stats for that rollup and a new one
+    first, second = RuntimeStats(), RuntimeStats()
+    first.add(0.001)
+    first.add(4000, failed=True)
+    second.add(1)
+    with django_assert_num_queries(1):
+        TaskRollup.objects.merge({
+            ("do_work", "default", moment): first,
+            ("do_work", "default", moment - timedelta(minutes=1)): second,
+        })
+
+    # Then the stats are added to the stored rollup
+    current, previous = TaskRollup.objects.all()
+    assert (current.count, current.failures, current.runtime_sum) == (3, 1, 4002.001)
+    assert (current.runtime_min, current.runtime_max) == (0.001, 4000)
+    assert current.stats.histogram == [2] + [0] * (len(HISTOGRAM_BOUNDS) - 1) + [1]
+
+    # And the new rollup is stored as is
+    assert (previous.count, previous.runtime_min, previous.runtime_max) == (1, 1, 1)
+
+
+def test_admin_middleware_accumulates_rollups(transactional_db, broker, worker, rf, admin_user):
+    # Given an admin middleware that accumulates rollups
+    middleware = next(m for m in broker.middleware if isinstance(m, AdminMiddleware))
+    middleware.rollups = RollupAccumulator(flush_interval=60000)
+
+    # And an actor that fails every other time
+    @dramatiq.actor(max_retries=0)
+    def do_work(fail):
+        if fail:
+            raise RuntimeError("failed")
+
+    try:
+        # When I send it a few messages
+        for i in range(4):
+            do_work.send(i % 2 == 1)
+
+        broker.join(do_work.queue_name)
+        worker.join()
+        middleware.rollups.flush()
+    finally:
+        middleware.rollups.close()
+        middleware.rollups = None
+
+    # Then the executions are rolled up
+    rollup = TaskRollup.objects.get()
+    assert (rollup.actor_name, rollup.queue_name) == ("do_work", "default")
+    assert (rollup.count, rollup.failures) == (4, 2)
+
+    # And they show up on the dashboard
+    request = rf.get("/admin/django_dramatiq/task/dashboard/")
+    request.user = admin_user
+    response = admin.site._registry[Task].dashboard_view(request)
+    actor, = response.context_data["actors"]
+    assert (actor["actor_name"], actor["count"], actor["failure_rate"]) == ("do_work", 4, 50)
+    assert sum(row["count"] for row in response.context_data["throughput"]) == 4
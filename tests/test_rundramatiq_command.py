@@ -3,7 +3,9 @@ import sys
 from io import StringIO
 from unittest.mock import patch
 
+import pytest
 from django.core.management import call_command
+from django.core.management.base import CommandError
 
 from django_dramatiq.management.commands import rundramatiq
 
@@ -19,6 +21,51 @@ def test_rundramatiq_command_autodiscovers_modules():
     ]
 
 
+def test_rundramatiq_command_discovers_modules_without_importing_them():
+    # When I discover the tasks modules while imports are disallowed
+    with patch("importlib.import_module", side_effect=AssertionError("module imported")):
+        tasks_modules = rundramatiq.Command().discover_tasks_modules()
+
+    # Then every tasks module is found
+    assert "tests.testapp3.tasks.tasks" in tasks_modules
+
+
+def test_rundramatiq_command_caches_discovered_modules_in_a_manifest(tmp_path):
+    # Given a manifest file
+    manifest = str(tmp_path / "manifest.json")
+
+    # When I discover the tasks modules with it
+    buff = StringIO()
+    tasks_modules = rundramatiq.Command(stdout=buff).discover_tasks_modules(manifest=manifest, verbosity=2)
+
+    # Then the modules are discovered, timed and written to the manifest
+    assert " * Discovered tasks modules in " in buff.getvalue()
+    assert " * Wrote tasks modules to %r in " % manifest in buff.getvalue()
+
+    # When I discover the tasks modules again
+    buff = StringIO()
+    with patch.object(rundramatiq.Command, "_find_tasks_modules", side_effect=AssertionError("modules discovered")):
+        cached_tasks_modules = rundramatiq.Command(stdout=buff).discover_tasks_modules(manifest=manifest, verbosity=2)
+
+    # Then the same modules are loaded from the manifest, with the same output
+    assert cached_tasks_modules == tasks_modules
+    assert " * Loaded tasks modules from %r in " % manifest in buff.getvalue()
+    assert "Discovered tasks module: 'tests.testapp3.tasks.tasks'" in buff.getvalue()
+
+    # When one of the tasks packages changes
+    package_path = os.path.join(os.path.dirname(__file__), "testapp3", "tasks")
+    mtime = os.stat(package_path).st_mtime_ns
+    try:
+        os.utime(package_path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+        # Then the manifest is out of date and the modules are discovered again
+        buff = StringIO()
+        rundramatiq.Command(stdout=buff).discover_tasks_modules(manifest=manifest, verbosity=2)
+        assert " * Discovered tasks modules in " in buff.getvalue()
+    finally:
+        os.utime(package_path, ns=(mtime, mtime))
+
+
 @patch("os.execvp")
 def test_rundramatiq_can_run_dramatiq(execvp_mock):
     # Given an output buffer
@@ -229,3 +276,34 @@ def test_rundramatiq_can_ignore_modules(execvp_mock, settings):
         "tests.testapp1.tasks",
         "tests.testapp3.tasks.tasks",
     ])
+
+
+@patch("django_dramatiq.launcher.PreforkLauncher.run")
+@patch("os.execvp")
+def test_rundramatiq_can_prefork_workers(execvp_mock, run_mock):
+    # Given an output buffer
+    buff = StringIO()
+
+    # When I call the rundramatiq command with --prefork and recycling options
+    with patch("django_dramatiq.launcher.PreforkLauncher.__init__", return_value=None) as init_mock:
+        call_command("rundramatiq", "--prefork", "--processes", "2", "--max-messages", "100",
+                     "--max-memory", "512", stdout=buff)
+
+    # Then the tasks modules are imported and the launcher runs instead of dramatiq
+    assert "tests.testapp3.tasks.tasks" in sys.modules
+    assert not execvp_mock.called
+    assert run_mock.call_count == 1
+    assert init_mock.call_args[1] == {
+        "processes": 2,
+        "threads": rundramatiq.CPU_COUNT,
+        "queues": None,
+        "max_messages": 100,
+        "max_memory": 512 * 1024 * 1024,
+    }
+
+
+def test_rundramatiq_requires_prefork_to_recycle_workers():
+    # When I call the rundramatiq command with --max-messages but without --prefork
+    # Then it fails
+    with pytest.raises(CommandError):
+        call_command("rundramatiq", "--max-messages", "100", stdout=StringIO())
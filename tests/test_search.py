@@ -0,0 +1,149 @@
+import dramatiq
+import pytest
+from django.contrib import admin
+from django.db import connection
+
+from django_dramatiq import search
+from django_dramatiq.models import Task, TaskFilterChoice
+
+
+@pytest.fixture
+def task_search(transactional_db, settings):
+    settings.DRAMATIQ_TASKS_SEARCH = {"ENABLED": True}
+    table = Task._meta.db_table
+    search.install(connection, table)
+    yield
+    search.uninstall(connection, table)
+
+
+def test_search_matches_task_arguments(task_search, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x, y=None):
+        pass
+
+    # And a few enqueued messages
+    first = do_work.send("Apples", y="pears")
+    second = do_work.send("bananas")
+
+    # When I search for part of an argument, ignoring case
+    tasks = search.search(Task.tasks.all(), "APPLE")
+
+    # Then only the task with that argument is found
+    assert [str(task.id) for task in tasks] == [first.message_id]
+
+    # When I search for part of the actor name
+    # Then every task is found
+    TaskFilterChoice.objects.touch([(TaskFilterChoice.KIND_ACTOR_NAME, "do_work")])
+    assert search.search(Task.tasks.all(), "do_wo").count() == 2
+
+    # When a task is updated and another one is deleted
+    Task.tasks.filter(id=second.message_id).update(args='["apples"]')
+    Task.tasks.filter(id=first.message_id).delete()
+
+    # Then searching reflects the changes
+    assert [str(task.id) for task in search.search(Task.tasks.all(), "apple")] == [second.message_id]
+    assert not search.search(Task.tasks.all(), "pears").exists()
+
+
+def test_search_finds_every_matching_task(task_search, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x):
+        pass
+
+    # And a few enqueued messages with the same argument
+    messages = [do_work.send("apples") for _ in range(3)]
+
+    # When I search for that argument
+    tasks = search.search(Task.tasks.all(), "apple")
+
+    # Then every task is found
+    assert {str(task.id) for task in tasks} == {message.message_id for message in messages}
+
+
+def test_search_falls_back_to_like_for_short_terms(task_search, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x):
+        pass
+
+    # And an enqueued message
+    message = do_work.send("ab")
+
+    # When I search for a term shorter than a trigram
+    tasks = search.search(Task.tasks.all(), "AB")
+
+    # Then the task is still found
+    assert [str(task.id) for task in tasks] == [message.message_id]
+
+
+def test_search_survives_the_database_being_vacuumed(task_search, broker):
+    if connection.vendor != "sqlite":
+        pytest.skip("Only SQLite renumbers rows when it's vacuumed.")
+
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x):
+        pass
+
+    # And a few enqueued messages, the oldest of which were deleted
+    messages = [do_work.send(fruit) for fruit in ("apples", "pears", "bananas", "cherries")]
+    Task.tasks.filter(id__in=[message.message_id for message in messages[:2]]).delete()
+
+    # When the database is vacuumed, which may renumber the rows of the Task table
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE %s SET rowid = rowid - 2" % Task._meta.db_table)
+        cursor.execute("VACUUM")
+
+    # Then searching still finds the right tasks
+    assert [str(task.id) for task in search.search(Task.tasks.all(), "banana")] == [messages[2].message_id]
+    assert [str(task.id) for task in search.search(Task.tasks.all(), "cherr")] == [messages[3].message_id]
+    assert not search.search(Task.tasks.all(), "apple").exists()
+
+    # And deleting a task after that only removes it from the results
+    Task.tasks.filter(id=messages[2].message_id).delete()
+    assert not search.search(Task.tasks.all(), "banana").exists()
+    assert [str(task.id) for task in search.search(Task.tasks.all(), "cherr")] == [messages[3].message_id]
+
+
+def test_search_survives_the_table_being_rebuilt(task_search, broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x):
+        pass
+
+    # And an enqueued message
+    message = do_work.send("apples")
+
+    # When the search triggers are dropped, as when SQLite rebuilds the table
+    with connection.cursor() as cursor:
+        for trigger in search._trigger_names(Task._meta.db_table):
+            cursor.execute("DROP TRIGGER %s" % trigger)
+    assert not search.is_installed(connection, Task._meta.db_table)
+
+    # And migrations run
+    search.reinstall(sender=None, using="default")
+
+    # Then search is installed again and finds the task
+    assert search.is_installed(connection, Task._meta.db_table)
+    assert [str(task.id) for task in search.search(Task.tasks.all(), "apple")] == [message.message_id]
+
+
+def test_task_admin_uses_the_search_index(task_search, broker, rf, admin_user):
+    # Given an actor
+    @dramatiq.actor
+    def do_work(x):
+        pass
+
+    # And a few enqueued messages
+    message = do_work.send("apples and pears")
+    do_work.send("apples")
+
+    # When I search the Task changelist for several terms
+    request = rf.get("/admin/django_dramatiq/task/", {"q": "apple pear"})
+    request.user = admin_user
+    changelist = admin.site._registry[Task].get_changelist_instance(request)
+
+    # Then only the tasks matching every term are listed
+    assert [str(task.id) for task in changelist.result_list] == [message.message_id]
@@ -4,7 +4,7 @@ from datetime import timedelta
 import pytest
 from django.utils.timezone import now
 
-from django_dramatiq.models import Task
+from django_dramatiq.models import Task, TaskFilterChoice
 from django_dramatiq.tasks import delete_old_tasks
 
 
@@ -24,3 +24,57 @@ def test_can_delete_old_tasks(db):
     # Then my task should be deleted
     with pytest.raises(Task.DoesNotExist):
         task.refresh_from_db()
+
+
+def make_task(age, **fields):
+    task = Task(id=uuid.uuid4(), message_data=b"", **fields)
+    task.save()
+    task.created_at = now() - age
+    task.save()
+    return task
+
+
+def test_can_delete_old_tasks_in_batches(db):
+    # Given a few Tasks that were created more than a day ago
+    for _ in range(5):
+        make_task(timedelta(days=2))
+
+    # And one that was created recently
+    make_task(timedelta(hours=1))
+
+    # When I call the delete_old_tasks task with a small batch size
+    delete_old_tasks(batch_size=2)
+
+    # Then only the recent Task should be left
+    assert Task.tasks.count() == 1
+
+
+def test_can_delete_old_tasks_by_status_and_queue(db):
+    # Given Tasks with different statuses and queues that are three days old
+    failed = make_task(timedelta(days=3), status=Task.STATUS_FAILED)
+    make_task(timedelta(days=3), status=Task.STATUS_DONE)
+    important = make_task(timedelta(days=3), status=Task.STATUS_DONE, queue_name="important")
+
+    # When I delete old tasks, keeping failed ones and the ones on the important queue for a week
+    stats = Task.tasks.delete_old_tasks(
+        86400,
+        max_task_age_by_status={Task.STATUS_FAILED: 7 * 86400},
+        max_task_age_by_queue={"important": 7 * 86400},
+    )
+
+    # Then only the done Task on the default queue should be deleted
+    assert stats["deleted"] == 1
+    assert set(Task.tasks.values_list("pk", flat=True)) == {failed.pk, important.pk}
+
+
+def test_deleting_old_tasks_deletes_stale_filter_choices(db):
+    # Given a filter choice that hasn't been seen in days and one that was just seen
+    TaskFilterChoice.objects.create(kind=TaskFilterChoice.KIND_WORKER_HOSTNAME, value="gone",
+                                    last_seen=now() - timedelta(days=2))
+    TaskFilterChoice.objects.create(kind=TaskFilterChoice.KIND_WORKER_HOSTNAME, value="alive")
+
+    # When I delete old tasks
+    delete_old_tasks()
+
+    # Then only the stale choice should be deleted
+    assert list(TaskFilterChoice.objects.values_list("value", flat=True)) == ["alive"]
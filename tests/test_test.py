@@ -1,7 +1,9 @@
 import dramatiq
+import pytest
+from dramatiq.common import dq_name
 
 from django_dramatiq.models import Task
-from django_dramatiq.test import DramatiqTestCase
+from django_dramatiq.test import DramatiqTestCase, EagerDramatiqTestCase, eager
 
 
 class TestDramatiqTestCase(DramatiqTestCase):
@@ -23,3 +25,70 @@ class TestDramatiqTestCase(DramatiqTestCase):
         task = Task.tasks.get()
         self.assertIsNotNone(task)
         self.assertEqual(task.status, Task.STATUS_DONE)
+
+
+class TestEagerDramatiqTestCase(EagerDramatiqTestCase):
+
+    def test_actors_run_when_messages_are_sent(self):
+        # Given an actor that sends a message to another one
+        calls = []
+
+        @dramatiq.actor(max_retries=0)
+        def do_more_work():
+            calls.append("do_more_work")
+
+        @dramatiq.actor(max_retries=0)
+        def do_work():
+            do_more_work.send()
+            calls.append("do_work")
+
+        # When I send it a message
+        message = do_work.send()
+
+        # Then both actors ran, in the order their messages were sent
+        self.assertEqual(calls, ["do_work", "do_more_work"])
+
+        # And finished Tasks were stored to the database
+        self.assertEqual(Task.tasks.get(pk=message.message_id).status, Task.STATUS_DONE)
+        self.assertEqual(Task.tasks.filter(status=Task.STATUS_DONE).count(), 2)
+
+    def test_failed_actors_are_retried_later(self):
+        # Given an actor that fails
+        @dramatiq.actor(max_retries=1)
+        def do_work():
+            raise RuntimeError("failed")
+
+        # When I send it a message
+        message = do_work.send()
+
+        # Then its retry is enqueued
+        self.assertEqual(self.broker.queues[dq_name(do_work.queue_name)].qsize(), 1)
+        self.assertEqual(Task.tasks.get(pk=message.message_id).status, Task.STATUS_DELAYED)
+
+
+def test_eager_can_raise_exceptions(db, dramatiq_broker):
+    # Given an actor that fails
+    @dramatiq.actor(max_retries=0)
+    def do_work():
+        raise RuntimeError("failed")
+
+    # When I send it a message while actors run eagerly and raise exceptions
+    with eager(dramatiq_broker, raise_exceptions=True):
+        with pytest.raises(RuntimeError):
+            do_work.send()
+
+    # Then its Task failed
+    assert Task.tasks.get().status == Task.STATUS_FAILED
+
+
+def test_dramatiq_eager_fixture_runs_actors(db, dramatiq_eager):
+    # Given an actor
+    @dramatiq.actor(max_retries=0)
+    def do_work(x):
+        return x
+
+    # When I send it a message
+    message = do_work.send(1)
+
+    # Then a finished Task is stored within the test's transaction
+    assert Task.tasks.get(pk=message.message_id).status == Task.STATUS_DONE
@@ -0,0 +1,109 @@
+import socket
+import time
+from datetime import timedelta
+
+import dramatiq
+import pytest
+from django.contrib import admin
+from django.utils import timezone
+from dramatiq import Worker
+from dramatiq.brokers.stub import StubBroker
+
+from django_dramatiq.middleware import WorkerHeartbeatMiddleware
+from django_dramatiq.models import Task, WorkerHeartbeat
+
+
+@pytest.fixture
+def heartbeat_broker():
+    middleware = WorkerHeartbeatMiddleware(interval=60000)
+    broker = StubBroker(middleware=[middleware])
+    broker.emit_after("process_boot")
+    yield broker, middleware
+    broker.close()
+
+
+def test_worker_heartbeat_middleware_publishes_heartbeats(transactional_db, heartbeat_broker):
+    broker, middleware = heartbeat_broker
+
+    # Given an actor that fails for some messages
+    @dramatiq.actor(broker=broker)
+    def do_work(fail):
+        if fail:
+            raise RuntimeError("failed")
+
+    # And a worker that published its first heartbeat
+    worker = Worker(broker, worker_threads=2, worker_timeout=100)
+    worker.start()
+    deadline = time.monotonic() + 5
+    while not WorkerHeartbeat.objects.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # When it processes a few messages
+    for fail in (False, False, True):
+        do_work.send(fail)
+    broker.join(do_work.queue_name)
+    worker.join()
+
+    # And publishes a heartbeat
+    middleware.beat()
+
+    # Then the heartbeat holds its counts
+    heartbeat = WorkerHeartbeat.objects.get(hostname=socket.gethostname())
+    assert heartbeat.threads == 2
+    assert heartbeat.processed == 3
+    assert heartbeat.failed == 1
+    assert heartbeat.in_flight_message_ids == []
+    assert heartbeat.rss > 0
+
+    # When the worker stops
+    worker.stop()
+
+    # Then its heartbeat is removed
+    assert not WorkerHeartbeat.objects.exists()
+
+
+def test_worker_heartbeat_middleware_publishes_in_flight_messages(transactional_db, heartbeat_broker):
+    broker, middleware = heartbeat_broker
+
+    # Given an actor
+    @dramatiq.actor(broker=broker)
+    def do_work():
+        pass
+
+    # When a message is being processed while a heartbeat is published
+    message = do_work.message()
+    middleware.before_process_message(broker, message)
+    middleware.beat()
+
+    # Then the heartbeat holds its ID
+    assert WorkerHeartbeat.objects.get().in_flight_message_ids == [message.message_id]
+
+    # When it's processed
+    middleware.after_process_message(broker, message)
+    middleware.beat()
+
+    # Then the heartbeat is updated
+    heartbeat = WorkerHeartbeat.objects.get()
+    assert heartbeat.in_flight_message_ids == []
+    assert heartbeat.processed == 1
+
+
+def test_worker_heartbeat_admin_shows_live_workers(transactional_db):
+    # Given a live worker and a dead one
+    live = WorkerHeartbeat.objects.create(hostname="a", pid=1, threads=4, in_flight='["%s"]' % ("0" * 32))
+    dead = WorkerHeartbeat.objects.create(hostname="b", pid=2, last_seen=timezone.now() - timedelta(hours=1))
+
+    # When I look at them in the admin
+    model_admin = admin.site._registry[WorkerHeartbeat]
+
+    # Then their liveness and load are shown
+    assert model_admin.is_alive(live)
+    assert not model_admin.is_alive(dead)
+    assert model_admin.busy_display(live) == "1 / 4"
+    assert "/admin/django_dramatiq/task/%s/" % ("0" * 32) in model_admin.in_flight_display(live)
+
+    # When old tasks are deleted
+    Task.tasks.delete_old_tasks(max_task_age=60)
+
+    # Then so is the dead worker's heartbeat
+    assert list(WorkerHeartbeat.objects.all()) == [live]